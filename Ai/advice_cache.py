@@ -0,0 +1,182 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict, defaultdict
+
+_PUNCT  = re.compile(r"[^\w\s₹]")
+_SPACES = re.compile(r"\s+")
+_TOKENS = re.compile(r"\S+\s*|\s+")
+
+
+def normalize_question(question):
+    """'  Full report?? ' -> 'full report'."""
+    text = _PUNCT.sub(" ", str(question).casefold())
+    return _SPACES.sub(" ", text).strip()
+
+
+PERSONAS = ("tenant", "owner")
+
+
+def normalize_persona(persona):
+    """' Owner ' -> 'owner'; anything but a known persona -> 'tenant'. The one
+    value both the prompt and the cache key (and its stats) use."""
+    persona = str(persona or "").strip().lower()
+    return persona if persona in PERSONAS else "tenant"
+
+
+class AdviceCache:
+    """Bounded, thread-safe LRU + TTL cache of complete advisor answers.
+
+    Keys are the system-prompt inputs (persona first, so personas never share
+    an entry) with rent, rent range and area snapped to buckets, plus the
+    normalized question and the market evidence the prompt quotes. Only streams that finish cleanly are stored; hits are replayed
+    word by word so callers see the same token stream as a live answer.
+    """
+
+    def __init__(self, maxsize=512, ttl=6 * 3600, rent_bucket=500, area_bucket=50):
+        self.maxsize     = maxsize
+        self.ttl         = ttl
+        self.rent_bucket = rent_bucket
+        self.area_bucket = area_bucket
+
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self._persona  = defaultdict(lambda: {"hits": 0, "misses": 0, "bypasses": 0})
+
+    @classmethod
+    def from_env(cls):
+        return cls(maxsize=int(os.getenv("ADVICE_CACHE_SIZE", "512")),
+                   ttl=float(os.getenv("ADVICE_CACHE_TTL", str(6 * 3600))),
+                   rent_bucket=float(os.getenv("ADVICE_CACHE_RENT_BUCKET", "500")),
+                   area_bucket=float(os.getenv("ADVICE_CACHE_AREA_BUCKET", "50")))
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    @staticmethod
+    def _snap(value, bucket):
+        value = float(value)
+        return int(round(value / bucket) * bucket) if bucket > 0 else value
+
+    def key(self, bhk, locality, city, area, furnishing, predicted_rent, persona, question,
+            market=None):
+        """`market` evidence is part of the key as the prompt quotes it: the
+        fair-rent range snapped like the rent, and the comparable listings and
+        nearby localities."""
+        market = market or {}
+        rent_range = market.get('fair_rent_range')
+        evidence = (
+            tuple((c['locality'], c['bhk'], round(c['area']), c['furnishing'], c['distance_km'],
+                   round(c['rent'])) for c in market.get('comparables') or ()),
+            tuple((n['locality'], n['distance_km'], round(n['median_rent']), n['listings'])
+                  for n in market.get('nearby_localities') or ()))
+        return (normalize_persona(persona), str(city).strip(), str(locality).strip(),
+                int(bhk), self._snap(area, self.area_bucket), str(furnishing).strip(),
+                self._snap(predicted_rent, self.rent_bucket), normalize_question(question),
+                tuple(self._snap(v, self.rent_bucket) for v in rent_range) if rent_range else None,
+                evidence)
+
+    def _lookup(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self._data.move_to_end(key)
+                self._persona[key[0]]["hits"] += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self._persona[key[0]]["misses"] += 1
+            return None
+
+    def _store(self, key, text):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, text)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def peek(self, key):
+        """Whether `key` has a live entry; unlike a lookup, not counted."""
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[0] > time.monotonic()
+
+    def record_bypass(self, persona):
+        with self._lock:
+            self._persona[normalize_persona(persona)]["bypasses"] += 1
+
+    def stream(self, key, produce):
+        """Yields the cached answer for `key`, or tees `produce()` into the cache."""
+        if not self.enabled:
+            yield from produce()
+            return
+
+        text = self._lookup(key)
+        if text is not None:
+            yield from _TOKENS.findall(text)
+            return
+
+        parts = []
+        for token in produce():
+            parts.append(token)
+            yield token
+        if parts:
+            self._store(key, "".join(parts))
+
+    async def astream(self, key, produce):
+        """Async twin of `stream`; `produce()` returns an async iterator."""
+        if not self.enabled:
+            async for token in produce():
+                yield token
+            return
+
+        text = self._lookup(key)
+        if text is not None:
+            for token in _TOKENS.findall(text):
+                yield token
+            return
+
+        parts = []
+        async for token in produce():
+            parts.append(token)
+            yield token
+        if parts:
+            self._store(key, "".join(parts))
+
+    def get_or_compute(self, key, compute):
+        if not self.enabled:
+            return compute()
+        text = self._lookup(key)
+        if text is None:
+            text = compute()
+            if text:
+                self._store(key, text)
+        return text
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            per_persona = {}
+            hits = misses = bypasses = 0
+            for persona, c in self._persona.items():
+                lookups = c["hits"] + c["misses"]
+                per_persona[persona] = {**c, "hit_rate": round(c["hits"] / lookups, 4) if lookups else 0.0}
+                hits += c["hits"]
+                misses += c["misses"]
+                bypasses += c["bypasses"]
+            lookups = hits + misses
+            return {
+                "size": len(self._data), "maxsize": self.maxsize, "ttl": self.ttl,
+                "hits": hits, "misses": misses, "bypasses": bypasses,
+                "evictions": self.evictions,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "personas": per_persona,
+            }
@@ -1,15 +1,79 @@
 import os
-from openai import OpenAI
+import json
+import time
+import asyncio
+import hashlib
+import threading
+import weakref
 from dotenv import load_dotenv
 
+from Ai.advice_cache import AdviceCache, normalize_persona
+from Ai.single_flight import StreamFlights
+
 load_dotenv()
 
-client = OpenAI(
-    api_key=os.getenv("GEMINI_API_KEY"),
-    base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-)
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://generativelanguage.googleapis.com/v1beta/openai/")
+LLM_MODEL    = os.getenv("LLM_MODEL", "gemini-2.5-flash")
+
+# Upstream streaming limits: pool size, concurrent streams + wait queue, timeouts (seconds)
+LLM_MAX_CONNECTIONS     = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+LLM_MAX_STREAMS         = int(os.getenv("LLM_MAX_STREAMS", "16"))
+LLM_MAX_WAITING         = int(os.getenv("LLM_MAX_WAITING", "64"))
+LLM_QUEUE_TIMEOUT       = float(os.getenv("LLM_QUEUE_TIMEOUT", "10"))
+LLM_CONNECT_TIMEOUT     = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_FIRST_TOKEN_TIMEOUT = float(os.getenv("LLM_FIRST_TOKEN_TIMEOUT", "20"))
+LLM_TOTAL_TIMEOUT       = float(os.getenv("LLM_TOTAL_TIMEOUT", "120"))
+LLM_STREAM_BUFFER       = int(os.getenv("LLM_STREAM_BUFFER", "32"))
+# Identical prompts in flight at once share one upstream stream
+LLM_COALESCE            = os.getenv("LLM_COALESCE", "1") == "1"
+
+# The openai/httpx stack takes ~0.4 s to import; clients are built on first use.
+_client      = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The shared blocking OpenAI client (summaries and non-streaming advice)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+                _client = OpenAI(api_key=os.getenv("GEMINI_API_KEY"), base_url=LLM_BASE_URL)
+    return _client
+
+
+advice_cache = AdviceCache.from_env()
+
+
+class AdvisorBusyError(RuntimeError):
+    """No upstream stream slot became free within LLM_QUEUE_TIMEOUT."""
 
-def _build_system_prompt(bhk, locality, city, area, furnishing, predicted_rent, persona):
+
+class AdvisorTimeoutError(TimeoutError):
+    """The upstream missed the first-token or total deadline."""
+
+def _market_section(market):
+    """Real comparables / nearby-locality medians for the prompt (see ml.comparables)."""
+    lines = ["## MARKET EVIDENCE (actual listings — cite these, do not invent others)"]
+    if market.get('comparables'):
+        lines.append("Nearest comparable listings:")
+        lines += [f"- {c['bhk']} BHK, {c['area']:.0f} sqft, {c['furnishing']} in {c['locality']} "
+                  f"({c['distance_km']} km): ₹{c['rent']:,.0f}/month"
+                  for c in market['comparables']]
+    if market.get('nearby_localities'):
+        lines.append("Nearby localities (median asking rent, all sizes):")
+        lines += [f"- {n['locality']} ({n['distance_km']} km): ₹{n['median_rent']:,.0f} "
+                  f"across {n['listings']} listings"
+                  for n in market['nearby_localities']]
+    return "\n".join(lines) if len(lines) > 1 else ""
+
+
+def _build_system_prompt(bhk, locality, city, area, furnishing, predicted_rent, persona, market=None):
+    market_context = _market_section(market) if market else ""
+    rent_range = (market or {}).get('fair_rent_range')
+    band = (f"likely range ₹{int(rent_range[0]):,} – ₹{int(rent_range[1]):,}" if rent_range
+            else "±5% confidence band")
     persona_context = ""
     if persona == "owner":
         persona_context = """
@@ -38,10 +102,11 @@ Tone: Sophisticated, Direct, Data-driven.
 ## PROPERTY PROFILE (IMMUTABLE)
 - **Configuration:** {bhk} BHK | {area} sqft | {furnishing}
 - **Location:** {locality}, {city}
-- **ML Fair Rent:** ₹{int(predicted_rent):,}/month (±5% confidence band)
+- **ML Fair Rent:** ₹{int(predicted_rent):,}/month ({band})
   This is your anchor. Always defend it with micro-market data.
 
 {persona_context}
+{market_context}
 
 ## RESPONSE STYLE
 - Use ₹ for all currency. Bold key numbers and locations.
@@ -54,15 +119,18 @@ Tone: Sophisticated, Direct, Data-driven.
   4. 30-Day Outlook
 """
 
-def stream_real_estate_advice(bhk, locality, city, area, furnishing, predicted_rent,
-                                user_question, chat_history="", persona="tenant"):
-
-    system_prompt = _build_system_prompt(bhk, locality, city, area, furnishing, predicted_rent, persona)
+def _build_messages(bhk, locality, city, area, furnishing, predicted_rent,
+                    user_question, chat_history, persona, market=None):
+    system_prompt = _build_system_prompt(bhk, locality, city, area, furnishing, predicted_rent,
+                                         persona, market)
 
     messages = [{"role": "system", "content": system_prompt}]
 
-    # Inject chat history as conversation turns
-    if chat_history:
+    # Inject chat history as conversation turns: a list of role/content
+    # messages (server-side history) or the legacy "user: / ai:" text
+    if isinstance(chat_history, list):
+        messages.extend(chat_history)
+    elif chat_history:
         for line in chat_history.strip().split("\n"):
             if line.startswith("user:"):
                 messages.append({"role": "user", "content": line[5:].strip()})
@@ -70,31 +138,369 @@ def stream_real_estate_advice(bhk, locality, city, area, furnishing, predicted_r
                 messages.append({"role": "assistant", "content": line[3:].strip()})
 
     messages.append({"role": "user", "content": user_question})
+    return messages
 
-    stream = client.chat.completions.create(
-        model="gemini-2.5-flash",
-        messages=messages,
-        temperature=0.7,
-        stream=True,
-        # web_search_options=True
-    )
 
-    for chunk in stream:
-        delta = chunk.choices[0].delta
-        if delta and delta.content:
-            yield delta.content
+# ── ASYNC STREAMING ───────────────────────────────────────────────────────────
 
+class AsyncLLMPool:
+    """One pooled AsyncOpenAI client per event loop, plus a cap on open streams.
 
-# Non-streaming fallback (kept for compare endpoint)
-def get_real_estate_advice(bhk, locality, city, area, furnishing,
-                            predicted_rent, user_question, chat_history="", persona="tenant"):
-    system_prompt = _build_system_prompt(bhk, locality, city, area, furnishing, predicted_rent, persona)
-    response = client.chat.completions.create(
-        model="gemini-2.5-flash",
+    Streams beyond LLM_MAX_STREAMS wait (at most LLM_MAX_WAITING of them, for
+    at most LLM_QUEUE_TIMEOUT) instead of opening more upstream connections.
+    Identical prompts share a stream through `flights` (see Ai.single_flight),
+    so they hold one slot between them.
+    """
+
+    def __init__(self):
+        self._client   = None
+        self.slots     = asyncio.Semaphore(LLM_MAX_STREAMS)
+        self.flights   = StreamFlights()
+        self.slot_wait = 0.0
+        self.active    = 0
+        self.waiting   = 0
+        self.started   = 0
+        self.completed = 0
+        self.rejected  = 0
+        self.timeouts  = 0
+        self.cancelled = 0
+        self.errors    = 0
+
+    @property
+    def client(self):
+        # Built by the pool's first stream, not at import time.
+        if self._client is None:
+            import httpx
+            from openai import AsyncOpenAI
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS,
+                                    max_keepalive_connections=LLM_MAX_CONNECTIONS),
+                # `read` bounds the gap between chunks; the overall deadline is enforced per stream
+                timeout=httpx.Timeout(LLM_TOTAL_TIMEOUT, connect=LLM_CONNECT_TIMEOUT,
+                                      read=LLM_FIRST_TOKEN_TIMEOUT),
+            )
+            self._client = AsyncOpenAI(api_key=os.getenv("GEMINI_API_KEY"), base_url=LLM_BASE_URL,
+                                       http_client=http_client, max_retries=0)
+        return self._client
+
+    async def acquire(self):
+        if self.waiting >= LLM_MAX_WAITING:
+            self.rejected += 1
+            raise AdvisorBusyError("Advisor is at capacity, please retry shortly.")
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.slots.acquire(), LLM_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise AdvisorBusyError("Advisor is at capacity, please retry shortly.") from None
+        finally:
+            self.waiting -= 1
+            self.slot_wait += time.perf_counter() - start
+        self.active  += 1
+        self.started += 1
+
+    def release(self):
+        self.active -= 1
+        self.slots.release()
+
+    def stats(self):
+        return {
+            'active': self.active,
+            'waiting': self.waiting,
+            'max_streams': LLM_MAX_STREAMS,
+            'started': self.started,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+            'cancelled': self.cancelled,
+            'errors': self.errors,
+            'slot_wait_seconds': self.slot_wait,
+            **self.flights.stats(),
+        }
+
+
+_pools = weakref.WeakKeyDictionary()
+
+
+def get_async_pool(loop=None):
+    """The AsyncLLMPool bound to `loop` (default: the running event loop)."""
+    loop = loop or asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = _pools[loop] = AsyncLLMPool()
+    return pool
+
+
+async def _within(awaitable, deadline, what):
+    # already loaded by the pool's client
+    from httpx import TimeoutException
+    from openai import APITimeoutError
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(awaitable, max(deadline - loop.time(), 0))
+    # httpx's read timeout (the first-token deadline) can fire mid-stream, unwrapped by openai
+    except (asyncio.TimeoutError, APITimeoutError, TimeoutException):
+        raise AdvisorTimeoutError(f"Advisor {what} timed out.") from None
+
+
+def _prompt_key(messages):
+    return hashlib.sha256(json.dumps([LLM_MODEL, messages], sort_keys=True,
+                                     ensure_ascii=False).encode()).hexdigest()
+
+
+async def astream_real_estate_advice(bhk, locality, city, area, furnishing, predicted_rent,
+                                     user_question, chat_history="", persona="tenant", market=None):
+    """Async token stream from the upstream model.
+
+    Joins the stream already running for an identical prompt on this loop, if
+    any. Cancelling the consuming task (or closing the generator) leaves the
+    stream; the last subscriber to leave closes the upstream response and
+    frees its slot.
+    """
+    messages = _build_messages(bhk, locality, city, area, furnishing, predicted_rent,
+                               user_question, chat_history, persona, market)
+    pool = get_async_pool()
+    upstream = lambda: _upstream_stream(pool, messages)
+    tokens = pool.flights.subscribe(_prompt_key(messages), upstream) if LLM_COALESCE else upstream()
+    try:
+        async for token in tokens:
+            yield token
+    finally:
+        await tokens.aclose()
+
+
+async def _upstream_stream(pool, messages):
+    """One upstream stream, holding a pool slot for its lifetime."""
+    await pool.acquire()
+    try:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + LLM_TOTAL_TIMEOUT
+        first_deadline = min(loop.time() + LLM_FIRST_TOKEN_TIMEOUT, deadline)
+
+        stream = await _within(pool.client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=messages,
+            temperature=0.7,
+            stream=True,
+        ), first_deadline, "connection")
+        try:
+            chunks = stream.__aiter__()
+            got_first = False
+            while True:
+                try:
+                    chunk = await _within(chunks.__anext__(),
+                                          deadline if got_first else first_deadline,
+                                          "response" if got_first else "first token")
+                except StopAsyncIteration:
+                    break
+                delta = chunk.choices[0].delta if chunk.choices else None
+                if delta and delta.content:
+                    got_first = True
+                    yield delta.content
+        finally:
+            await stream.close()
+        pool.completed += 1
+    except AdvisorTimeoutError:
+        pool.timeouts += 1
+        raise
+    except (asyncio.CancelledError, GeneratorExit):
+        pool.cancelled += 1
+        raise
+    except Exception:
+        pool.errors += 1
+        raise
+    finally:
+        pool.release()
+
+
+# ── SYNC BRIDGE ───────────────────────────────────────────────────────────────
+# WSGI views run the async stream on one background event loop per process,
+# so every worker thread shares the connection pool and stream cap.
+
+_loop      = None
+_loop_pid  = None
+_loop_lock = threading.Lock()
+_END       = object()
+
+
+def _background_loop():
+    global _loop, _loop_pid
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-loop", daemon=True).start()
+            _loop_pid = os.getpid()
+    return _loop
+
+
+def stream_stats():
+    """Upstream stream counters summed over every event loop in this process
+    (the WSGI bridge's and, under ASGI, the server's); zeros before the first
+    LLM call, without starting the bridge's loop."""
+    pools = list(_pools.values()) or [AsyncLLMPool()]
+    totals = {}
+    for pool in pools:
+        for name, value in pool.stats().items():
+            totals[name] = totals.get(name, 0) + value
+    return totals
+
+
+def _bridge_stream(bhk, locality, city, area, furnishing, predicted_rent,
+                   user_question, chat_history, persona, market=None):
+    """Blocking iterator over the async stream.
+
+    Tokens pass through a bounded queue, so a slow client pauses the upstream
+    read; closing the iterator (client disconnected) cancels the upstream call.
+    """
+    loop = _background_loop()
+    buffer = asyncio.Queue(maxsize=LLM_STREAM_BUFFER)
+
+    async def pump():
+        tokens = astream_real_estate_advice(bhk, locality, city, area, furnishing, predicted_rent,
+                                            user_question, chat_history, persona, market)
+        try:
+            async for token in tokens:
+                await buffer.put(token)
+        except Exception as e:
+            await buffer.put(e)
+        else:
+            await buffer.put(_END)
+        finally:
+            await tokens.aclose()
+
+    task = asyncio.run_coroutine_threadsafe(pump(), loop)
+    try:
+        while True:
+            item = asyncio.run_coroutine_threadsafe(buffer.get(), loop).result()
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        task.cancel()
+
+
+def _cached_inputs(key, market):
+    """(area, predicted_rent, market) as snapped in `key`: the prompt a cached
+    answer is generated from matches every request that key serves."""
+    if key[8] is not None:
+        market = {**(market or {}), 'fair_rent_range': key[8]}
+    return key[4], key[6], market
+
+
+def _cache_key(bhk, locality, city, area, furnishing, predicted_rent, user_question,
+               chat_history, persona, use_cache, market=None, record=True):
+    """None when the call must go upstream (follow-ups carry chat_history)."""
+    if not use_cache or chat_history or not advice_cache.enabled:
+        if record:
+            advice_cache.record_bypass(persona)
+        return None
+    return advice_cache.key(bhk, locality, city, area, furnishing, predicted_rent,
+                            persona, user_question, market)
+
+
+def stream_real_estate_advice(bhk, locality, city, area, furnishing, predicted_rent,
+                                user_question, chat_history="", persona="tenant", use_cache=True,
+                                market=None):
+    """`market` (comparables / nearby localities, fair-rent range) is quoted
+    in the prompt, so it is part of the advice-cache key."""
+    persona = normalize_persona(persona)
+    key = _cache_key(bhk, locality, city, area, furnishing, predicted_rent, user_question,
+                     chat_history, persona, use_cache, market)
+    if key is None:
+        yield from _bridge_stream(bhk, locality, city, area, furnishing, predicted_rent,
+                                  user_question, chat_history, persona, market)
+        return
+    # Prompt from the snapped values so a cached answer matches every input it serves.
+    area, predicted_rent, market = _cached_inputs(key, market)
+    yield from advice_cache.stream(key, lambda: _bridge_stream(
+        bhk, locality, city, area, furnishing, predicted_rent, user_question, "", persona, market))
+
+
+async def astream_advice(bhk, locality, city, area, furnishing, predicted_rent,
+                         user_question, chat_history="", persona="tenant", use_cache=True,
+                         market=None):
+    """`stream_real_estate_advice` for code already on an event loop (ASGI):
+    same advice cache, but the stream runs on the caller's loop and pool."""
+    persona = normalize_persona(persona)
+    key = _cache_key(bhk, locality, city, area, furnishing, predicted_rent, user_question,
+                     chat_history, persona, use_cache, market)
+    if key is None:
+        async for token in astream_real_estate_advice(bhk, locality, city, area, furnishing,
+                                                      predicted_rent, user_question, chat_history,
+                                                      persona, market):
+            yield token
+        return
+    area, predicted_rent, market = _cached_inputs(key, market)
+    async for token in advice_cache.astream(key, lambda: astream_real_estate_advice(
+            bhk, locality, city, area, furnishing, predicted_rent, user_question, "", persona, market)):
+        yield token
+
+
+def advice_flight(bhk, locality, city, area, furnishing, predicted_rent, user_question,
+                  chat_history="", persona="tenant", use_cache=True, market=None):
+    """The single-flight key a stream with these arguments would run under:
+    None when the answer cache has it, a key no other request shares when
+    LLM_COALESCE is off. Admission control charges the upstream rate limit
+    once per key in flight."""
+    persona = normalize_persona(persona)
+    key = _cache_key(bhk, locality, city, area, furnishing, predicted_rent, user_question,
+                     chat_history, persona, use_cache, market, record=False)
+    if key is not None:
+        if advice_cache.peek(key):
+            return None
+        (area, predicted_rent, market), chat_history = _cached_inputs(key, market), ""
+    if not LLM_COALESCE:
+        return object()
+    return _prompt_key(_build_messages(bhk, locality, city, area, furnishing, predicted_rent,
+                                       user_question, chat_history, persona, market))
+
+
+def summarize_conversation(previous_summary, turns, max_tokens=300):
+    """Rolling summary of advisor turns that no longer fit the history budget."""
+    transcript = "\n\n".join(f"{t['role'].upper()}: {t['content']}" for t in turns)
+    prompt = (f"Existing summary:\n{previous_summary or '(none)'}\n\n"
+              f"New conversation turns:\n{transcript}\n\n"
+              "Update the summary. Keep the user's goals, figures quoted (rents, yields, "
+              "localities) and any decisions or open questions. Plain bullet points, "
+              f"under {max_tokens} tokens.")
+    response = get_client().chat.completions.create(
+        model=LLM_MODEL,
         messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_question}
+            {"role": "system", "content": "You compress real estate advisory chats into brief notes."},
+            {"role": "user", "content": prompt}
         ],
-        temperature=0.7,
+        temperature=0.2,
+        max_tokens=max_tokens,
+        timeout=LLM_TOTAL_TIMEOUT,
     )
     return response.choices[0].message.content
+
+
+# Non-streaming fallback (kept for compare endpoint)
+def get_real_estate_advice(bhk, locality, city, area, furnishing,
+                            predicted_rent, user_question, chat_history="", persona="tenant",
+                            use_cache=True, market=None):
+    persona = normalize_persona(persona)
+    key = _cache_key(bhk, locality, city, area, furnishing, predicted_rent, user_question,
+                     chat_history, persona, use_cache, market)
+    if key is not None:
+        area, predicted_rent, market = _cached_inputs(key, market)
+
+    def complete():
+        system_prompt = _build_system_prompt(bhk, locality, city, area, furnishing, predicted_rent,
+                                             persona, market)
+        response = get_client().chat.completions.create(
+            model=LLM_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_question}
+            ],
+            temperature=0.7,
+            timeout=LLM_TOTAL_TIMEOUT,
+        )
+        return response.choices[0].message.content
+
+    return complete() if key is None else advice_cache.get_or_compute(key, complete)
@@ -0,0 +1,279 @@
+"""Server-side advisor chat history with a token budget.
+
+Each session's conversation lives in one `chat_sessions` document. A prompt
+carries the newest turns that fit in `token_budget`; anything older is folded
+into a rolling summary by a background pass after the answer is stored, so
+the summary is ready before the next question and never delays a stream.
+Those passes share a small thread pool, run only for conversations that went
+over budget, and at most one per chat is queued at a time.
+"""
+import os
+import math
+import time
+import uuid
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pymongo.errors import PyMongoError
+
+log = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN  = 4
+MESSAGE_OVERHEAD = 4  # role/framing tokens per chat message
+CONTEXT_FIELDS   = ('city', 'locality', 'bhk', 'area', 'furnishing')
+
+
+def estimate_tokens(text):
+    """Rough count (~4 chars/token) — only used to budget, never billed."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) + MESSAGE_OVERHEAD
+
+
+def extractive_summary(previous, turns, max_tokens):
+    """Fallback when the summarizer call fails: keep the user's questions."""
+    lines = [previous] if previous else []
+    lines += [f"- User asked: {t['content'][:160]}" for t in turns if t['role'] == 'user']
+    return "\n".join(lines)[-max_tokens * CHARS_PER_TOKEN:]
+
+
+def _percentiles(samples):
+    if not samples:
+        return {"count": 0, "p50_ms": None, "p95_ms": None}
+    ordered = sorted(samples)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+    return {"count": len(ordered), "p50_ms": pick(0.50), "p95_ms": pick(0.95)}
+
+
+class ChatHistoryStore:
+    """Loads, windows, appends and compacts per-session conversations."""
+
+    def __init__(self, collection, token_budget=1500, summary_max_tokens=300, summarize_fn=None,
+                 async_collection=None, compact_threads=2, compact_max_pending=64):
+        self.collection          = collection
+        self.async_collection    = async_collection  # set by the ASGI app for the a* methods
+        self.token_budget        = token_budget
+        self.summary_max_tokens  = summary_max_tokens
+        self.summarize_fn        = summarize_fn
+        self.compact_threads     = compact_threads
+        self.compact_max_pending = compact_max_pending
+
+        self._lock       = threading.Lock()
+        self._pool       = None   # created on the first compaction
+        self._compacting = set()  # chat ids with a queued or running pass
+        self.requests = self.compacted_requests = 0
+        self.history_tokens = self.sent_tokens = 0
+        self.summaries = self.summary_failures = self.compaction_conflicts = 0
+        self.compactions_skipped = 0
+        self._ttft = {"no_history": deque(maxlen=1000), "full": deque(maxlen=1000),
+                      "compacted": deque(maxlen=1000)}
+
+    @classmethod
+    def from_env(cls, collection, summarize_fn=None):
+        return cls(collection,
+                   token_budget=int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500")),
+                   summary_max_tokens=int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "300")),
+                   summarize_fn=summarize_fn,
+                   compact_threads=int(os.getenv("CHAT_COMPACT_THREADS", "2")),
+                   compact_max_pending=int(os.getenv("CHAT_COMPACT_MAX_PENDING", "64")))
+
+    @staticmethod
+    def new_chat_id():
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def context(ml_data):
+        """The property a conversation is about; a new property starts a new conversation."""
+        return {f: str(ml_data.get(f, '')) for f in CONTEXT_FIELDS}
+
+    # ── reads ────────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _checked(doc, chat_id, user_id, context):
+        if doc is None or (context is not None and doc.get('context') != context):
+            return {'_id': chat_id, 'user_id': user_id, 'turns': [], 'summary': '', 'rev': 0}
+        return doc
+
+    def load(self, chat_id, user_id, context=None):
+        """The stored conversation, or an empty one when missing or about another property."""
+        try:
+            doc = self.collection.find_one({'_id': chat_id, 'user_id': user_id})
+        except PyMongoError as e:
+            log.warning("Could not load chat %s: %s", chat_id, e)
+            doc = None
+        return self._checked(doc, chat_id, user_id, context)
+
+    async def aload(self, chat_id, user_id, context=None):
+        try:
+            doc = await self.async_collection.find_one({'_id': chat_id, 'user_id': user_id})
+        except PyMongoError as e:
+            log.warning("Could not load chat %s: %s", chat_id, e)
+            doc = None
+        return self._checked(doc, chat_id, user_id, context)
+
+    def _split(self, turns):
+        """Index of the oldest turn that still fits the budget (newest turn always kept)."""
+        used, start = 0, len(turns)
+        while start > 0:
+            cost = estimate_tokens(turns[start - 1]['content'])
+            if used + cost > self.token_budget and start < len(turns):
+                break
+            used += cost
+            start -= 1
+        return start
+
+    def window(self, doc):
+        """(messages, usage) for the next prompt: summary + newest turns within budget."""
+        turns = doc.get('turns', [])
+        start = self._split(turns)
+        messages = []
+        if doc.get('summary'):
+            messages.append({'role': 'system',
+                             'content': f"Summary of the earlier conversation:\n{doc['summary']}"})
+        messages += [{'role': t['role'], 'content': t['content']} for t in turns[start:]]
+
+        full = doc.get('history_tokens', 0) or sum(estimate_tokens(t['content']) for t in turns)
+        sent = sum(estimate_tokens(m['content']) for m in messages)
+        usage = {'history_tokens': max(full, sent), 'sent_tokens': sent,
+                 'window_tokens': sum(estimate_tokens(t['content']) for t in turns[start:]),
+                 'window_turns': len(turns) - start, 'pending_turns': start,
+                 'compacted': bool(doc.get('summary')) or start > 0}
+        return messages, usage
+
+    # ── writes ───────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _append_update(context, question, answer):
+        new_turns = [{'role': 'user', 'content': question},
+                     {'role': 'assistant', 'content': answer}]
+        added = sum(estimate_tokens(t['content']) for t in new_turns)
+        return {'$push': {'turns': {'$each': new_turns}},
+                '$set': {'context': context, 'updated_at': datetime.utcnow()},
+                '$inc': {'rev': 1, 'history_tokens': added},
+                '$setOnInsert': {'summary': ''}}
+
+    def append(self, chat_id, user_id, context, question, answer):
+        key = {'_id': chat_id, 'user_id': user_id}
+        try:
+            current = self.collection.find_one(key, {'context': 1})
+            if current is not None and current.get('context') != context:
+                self.collection.delete_one(key)
+            self.collection.update_one(key, self._append_update(context, question, answer),
+                                       upsert=True)
+        except PyMongoError as e:
+            log.warning("Could not store chat turn for %s: %s", chat_id, e)
+
+    async def aappend(self, chat_id, user_id, context, question, answer):
+        key = {'_id': chat_id, 'user_id': user_id}
+        try:
+            current = await self.async_collection.find_one(key, {'context': 1})
+            if current is not None and current.get('context') != context:
+                await self.async_collection.delete_one(key)
+            await self.async_collection.update_one(
+                key, self._append_update(context, question, answer), upsert=True)
+        except PyMongoError as e:
+            log.warning("Could not store chat turn for %s: %s", chat_id, e)
+
+    def clear(self, chat_id, user_id):
+        try:
+            self.collection.delete_one({'_id': chat_id, 'user_id': user_id})
+        except PyMongoError as e:
+            log.warning("Could not clear chat %s: %s", chat_id, e)
+
+    async def aclear(self, chat_id, user_id):
+        try:
+            await self.async_collection.delete_one({'_id': chat_id, 'user_id': user_id})
+        except PyMongoError as e:
+            log.warning("Could not clear chat %s: %s", chat_id, e)
+
+    def compact(self, chat_id, user_id):
+        """Folds turns that fell out of the budget window into the rolling summary."""
+        doc = self.load(chat_id, user_id)
+        turns = doc['turns']
+        start = self._split(turns)
+        if start == 0:
+            return False
+
+        folded = turns[:start]
+        try:
+            summary = self.summarize_fn(doc.get('summary', ''), folded, self.summary_max_tokens)
+            summary = (summary or '').strip() or extractive_summary(doc.get('summary', ''), folded,
+                                                                    self.summary_max_tokens)
+            failed = False
+        except Exception as e:
+            log.warning("Chat summary failed for %s (%s); keeping an extractive summary", chat_id, e)
+            summary = extractive_summary(doc.get('summary', ''), folded, self.summary_max_tokens)
+            failed = True
+
+        # Only replace what was read: a turn appended meanwhile bumps `rev` and
+        # this pass is dropped (the next answer triggers another one).
+        try:
+            result = self.collection.update_one(
+                {'_id': chat_id, 'user_id': user_id, 'rev': doc['rev']},
+                {'$set': {'summary': summary, 'turns': turns[start:]}, '$inc': {'rev': 1}})
+            swapped = result.modified_count == 1
+        except PyMongoError as e:
+            log.warning("Could not store chat summary for %s: %s", chat_id, e)
+            swapped = False
+
+        with self._lock:
+            self.summaries += swapped
+            self.summary_failures += failed
+            self.compaction_conflicts += not swapped
+        return swapped
+
+    def over_budget(self, usage, question, answer):
+        """Whether the stored turns, with the new question and answer, no longer fit the window."""
+        added = estimate_tokens(question) + estimate_tokens(answer)
+        return usage['pending_turns'] > 0 or usage['window_tokens'] + added > self.token_budget
+
+    def compact_async(self, chat_id, user_id, usage, question, answer):
+        """Queues a compaction pass when the conversation went over budget; None otherwise."""
+        if self.summarize_fn is None or not self.over_budget(usage, question, answer):
+            return None
+        with self._lock:
+            if chat_id in self._compacting or len(self._compacting) >= self.compact_max_pending:
+                # one pass per chat is enough; a full queue waits for the next answer
+                self.compactions_skipped += 1
+                return None
+            self._compacting.add(chat_id)
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.compact_threads,
+                                                thread_name_prefix="chat-compact")
+        return self._pool.submit(self._compact_queued, chat_id, user_id)
+
+    def _compact_queued(self, chat_id, user_id):
+        try:
+            return self.compact(chat_id, user_id)
+        finally:
+            with self._lock:
+                self._compacting.discard(chat_id)
+
+    # ── metrics ──────────────────────────────────────────────────────────────
+
+    def record(self, usage, ttft):
+        with self._lock:
+            self.requests += 1
+            self.compacted_requests += usage['compacted']
+            self.history_tokens += usage['history_tokens']
+            self.sent_tokens += usage['sent_tokens']
+            if ttft is not None:
+                bucket = ("compacted" if usage['compacted'] else
+                          "full" if usage['history_tokens'] else "no_history")
+                self._ttft[bucket].append(ttft)
+
+    def stats(self):
+        with self._lock:
+            saved = self.history_tokens - self.sent_tokens
+            return {
+                "requests": self.requests, "compacted_requests": self.compacted_requests,
+                "token_budget": self.token_budget,
+                "history_tokens": self.history_tokens, "sent_tokens": self.sent_tokens,
+                "tokens_saved": saved,
+                "saved_ratio": round(saved / self.history_tokens, 4) if self.history_tokens else 0.0,
+                "summaries": self.summaries, "summary_failures": self.summary_failures,
+                "compaction_conflicts": self.compaction_conflicts,
+                "compactions_pending": len(self._compacting),
+                "compactions_skipped": self.compactions_skipped,
+                "ttft": {k: _percentiles(v) for k, v in self._ttft.items()},
+            }
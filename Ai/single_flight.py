@@ -0,0 +1,94 @@
+import asyncio
+
+
+class _Flight:
+    """One upstream token stream and everything it has produced so far."""
+
+    def __init__(self):
+        self.tokens      = []
+        self.done        = False
+        self.error       = None
+        self.subscribers = 0
+        self.task        = None
+        self._wake       = asyncio.Event()
+
+    def publish(self, token=None, error=None, done=False):
+        if token is not None:
+            self.tokens.append(token)
+        self.error = error
+        self.done  = done
+        wake, self._wake = self._wake, asyncio.Event()
+        wake.set()
+
+
+class StreamFlights:
+    """Single-flight token streams on one event loop.
+
+    Subscribers asking for the same key while a stream for it is running
+    share that stream: a late subscriber first replays the tokens already
+    produced, then follows live. The producer runs as its own task and is
+    cancelled when the last subscriber leaves; the key is released once the
+    stream ends, so the next request starts (or hits the answer cache) afresh.
+    """
+
+    def __init__(self):
+        self._flights  = {}
+        self.flights   = 0   # upstream streams started
+        self.coalesced = 0   # subscribers that joined a running stream
+
+    def __contains__(self, key):
+        return key in self._flights
+
+    async def subscribe(self, key, produce):
+        """Yields the tokens of `produce()` (an async iterator), shared by key."""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            flight.task = asyncio.create_task(self._run(key, flight, produce))
+            self.flights += 1
+        else:
+            self.coalesced += 1
+
+        flight.subscribers += 1
+        seen = 0
+        try:
+            while True:
+                wake = flight._wake
+                while seen < len(flight.tokens):
+                    yield flight.tokens[seen]
+                    seen += 1
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await wake.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # released now, so a request arriving before the task unwinds starts afresh
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    async def _run(self, key, flight, produce):
+        tokens = produce()
+        try:
+            async for token in tokens:
+                flight.publish(token)
+            flight.publish(done=True)
+        except asyncio.CancelledError:
+            flight.publish(error=asyncio.CancelledError(), done=True)
+        except Exception as e:
+            flight.publish(error=e, done=True)
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            await tokens.aclose()
+
+    def stats(self):
+        return {
+            'flights': self.flights,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._flights),
+            'subscribers': sum(f.subscribers for f in self._flights.values()),
+        }
@@ -1,38 +1,100 @@
 import os
 import json
-import pickle
+import time
 import numpy as np
-import pandas as pd
 from datetime import datetime
 from functools import wraps
-from flask import (Flask, render_template, request, jsonify,
+from flask import (Flask, render_template, request, jsonify, g,
                    redirect, url_for, session, flash, Response, stream_with_context)
-from flask_pymongo import PyMongo
+from flask_pymongo import PyMongo, BSONProvider
 from werkzeug.security import generate_password_hash, check_password_hash
 from dotenv import load_dotenv
-from Ai.apiCall import stream_real_estate_advice, get_real_estate_advice
+from Ai.apiCall import (stream_real_estate_advice, get_real_estate_advice, advice_cache, advice_flight,
+                        summarize_conversation, stream_stats)
+from Ai.chat_history import ChatHistoryStore
+from ml.registry import ModelRegistry, ModelValidationError
+from ml.surface import SurfaceStore
+from ml.locality_search import LocalityIndexStore
+from ml.comparables import ComparablesStore
+from ml.cache import PredictionCache
+from serving.prediction_log import PredictionLogger
+from serving.db_indexes import ensure_indexes_async
+from serving.mongo import LazyDatabase
+from serving.metrics import REGISTRY, REQUEST_SECONDS, STAGE_SECONDS, ERRORS, CONTENT_TYPE
+from serving.profiler import RequestProfiler
+from serving.http_cache import ResponseCompressor, AssetFingerprints, etag_for, cache_control
+from serving.admission import AdmissionController, AdmissionRejected
+from pymongo.errors import DuplicateKeyError
+from bson import ObjectId
+from bson.errors import InvalidId
 
 load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY")
 app.config["MONGO_URI"] = os.getenv("MONGO_URI")
-mongo = PyMongo(app)
-db = mongo.cx['rent_db']          # ← the one database we work with
+# The MongoClient (and the index check) is created on first use, not at import;
+# the BSON JSON provider PyMongo installs is set up front so every response
+# is encoded the same way.
+mongo = PyMongo()
+app.json = BSONProvider(app)
 
-BASE_DIR   = os.path.dirname(os.path.abspath(__file__))
-MODELS_DIR = os.path.join(BASE_DIR, "models")
 
-with open(os.path.join(MODELS_DIR, "locality_mapping.json"), "r") as f:
-    locality_map = json.load(f)
+def _connect_mongo():
+    mongo.init_app(app)
+    return mongo.cx['rent_db']    # ← the one database we work with
 
-with open(os.path.join(MODELS_DIR, "rent_model_artifacts.pkl"), "rb") as f:
-    artifacts = pickle.load(f)
 
-model              = artifacts['model']
-locality_value_map = artifacts['locality_value_map']
-global_mean_rent   = artifacts['global_mean_rent']
-feature_columns    = artifacts['feature_columns']
+db = LazyDatabase(_connect_mongo,
+                  on_connect=ensure_indexes_async if os.getenv("MONGO_ENSURE_INDEXES", "1") == "1"
+                  else None)
+prediction_logger = PredictionLogger.from_env(db.predictions)
+chat_store = ChatHistoryStore.from_env(db.chat_sessions, summarize_fn=summarize_conversation)
+
+BASE_DIR   = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+DATA_DIR   = os.path.join(BASE_DIR, "data", "processed")
+
+# Opened lazily on first prediction (or warmed by gunicorn --preload); every
+# request takes one `model_registry.current` snapshot and uses only that.
+model_registry   = ModelRegistry(MODELS_DIR,
+                                 watch_interval=float(os.getenv("MODEL_WATCH_INTERVAL", "10")))
+prediction_cache = PredictionCache.from_env(lambda: model_registry.loaded_version)
+surface_store    = SurfaceStore(MODELS_DIR)
+locality_index   = LocalityIndexStore()
+comparables_store = ComparablesStore(os.path.join(DATA_DIR, "cleaned_rent_data.parquet"),
+                                     os.path.join(DATA_DIR, "cleaned_rent_data.csv"))
+ADMIN_TOKEN      = os.getenv("ADMIN_TOKEN")
+profiler         = RequestProfiler.from_env()
+compressor       = ResponseCompressor.from_env()
+chat_admission   = AdmissionController.from_env()
+page_templates   = AssetFingerprints(app.template_folder)
+
+BATCH_MAX_ROWS   = int(os.getenv("BATCH_MAX_ROWS", "10000"))
+BATCH_MAX_BYTES  = int(os.getenv("BATCH_MAX_BYTES", str(16 * 1024 * 1024)))
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "1000"))
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonl')
+
+EXPLORE_MAX_LIMIT = 200
+LOCALITIES_MAX_LIMIT = 50
+# Names offered back when a typed locality does not resolve to one model name.
+LOCALITY_SUGGESTIONS = 5
+COMPARABLES_MAX_K = 50
+# Comparable listings quoted in the advisor prompt (0 = leave the prompt as is).
+ADVISOR_COMPARABLES = int(os.getenv("ADVISOR_COMPARABLES", "3"))
+# Longest admission wait the sync /chat/stream sleeps through; it holds a
+# worker thread, so longer waits get a 429 (the ASGI route waits up to
+# CHAT_QUEUE_TIMEOUT on the event loop).
+CHAT_SYNC_MAX_WAIT = float(os.getenv("CHAT_SYNC_MAX_WAIT", "0.25"))
+
+HISTORY_PAGE_SIZE  = 20
+HISTORY_MAX_PAGE   = 100
+# _id is the cursor tiebreaker for records created in the same millisecond;
+# _history_page strips it from the response.
+HISTORY_SORT       = [('created_at', -1), ('_id', -1)]
+HISTORY_PROJECTION = {'_id': 1, 'city': 1, 'locality': 1, 'bhk': 1, 'area': 1,
+                      'furnishing': 1, 'fair_rent_low': 1, 'fair_rent': 1, 'fair_rent_high': 1,
+                      'timestamp': 1, 'created_at': 1, 'note': 1}
 
 
 def login_required(f):
@@ -44,18 +106,244 @@ def login_required(f):
     return decorated
 
 
-def _run_model(city, locality, bhk, area, furnishing):
-    loc_val  = float(locality_value_map.get(locality, global_mean_rent))
-    input_df = pd.DataFrame(0.0, index=[0], columns=feature_columns)
-    input_df.at[0, 'BHK']            = bhk
-    input_df.at[0, 'Area']           = area
-    input_df.at[0, 'Locality_Value'] = loc_val
-    if f"city_{city}" in feature_columns:
-        input_df.at[0, f"city_{city}"] = 1
-    if f"Furnishing_{furnishing}" in feature_columns:
-        input_df.at[0, f"Furnishing_{furnishing}"] = 1
-    fair_rent = np.expm1(model.predict(input_df)[0])
-    return round(fair_rent * 0.95, 0), round(fair_rent * 1.05, 0)
+def _is_admin():
+    return bool(ADMIN_TOKEN) and request.headers.get('X-Admin-Token') == ADMIN_TOKEN
+
+
+def _score(bundle, city, locality, bhk, area, furnishing):
+    start = time.perf_counter()
+    vec = bundle.predictor.features(city, locality, bhk, area, furnishing)
+    built = time.perf_counter()
+    # One fused walk scores the point model and both band quantiles.
+    low, fair, high = bundle.predictor.rent_range(bundle.predictor.forest.predict_one(vec))
+    STAGE_SECONDS.observe(built - start, stage='features')
+    STAGE_SECONDS.observe(time.perf_counter() - built, stage='model_predict')
+    return round(float(low), 0), round(float(fair), 0), round(float(high), 0)
+
+
+def _run_model(city, locality, bhk, area, furnishing, bundle=None):
+    bundle = bundle or model_registry.current
+    key = prediction_cache.normalize(city, locality, bhk, area, furnishing)
+    return prediction_cache.get_or_compute((bundle.version,) + key,
+                                           lambda: _score(bundle, *key))
+
+
+def _resolve_locality(bundle, city, locality):
+    """(city, locality, extra): the model's spelling of a typed city/locality;
+    `extra` carries the typed locality when it was corrected, or suggestions
+    when it matched no single model name (priced at the global mean)."""
+    city, locality = city.strip(), locality.strip()
+    resolved_city, resolved, how = locality_index.resolve(bundle, city, locality)
+    if how is None and locality:
+        index = locality_index.get(bundle)
+        if resolved_city in index.cities:
+            return resolved_city, resolved, {'locality_suggestions': [
+                s['locality'] for s in index.search(resolved_city, locality, LOCALITY_SUGGESTIONS)]}
+    return resolved_city, resolved, ({'locality_input': locality} if resolved != locality else {})
+
+
+def _parse_property(p):
+    if not isinstance(p, dict):
+        raise ValueError("expected a JSON object")
+    return (str(p.get('city', '')), str(p.get('locality', '')),
+            int(p.get('bhk', 2)), float(p.get('area', 1000)),
+            str(p.get('furnishing', 'Semi-Furnished')))
+
+
+def _score_chunk(chunk, bundle):
+    """Scores [(index, property), ...] with one vectorized model call."""
+    parsed, results = [], []
+    for i, p in chunk:
+        try:
+            parsed.append(_parse_property(p))
+            results.append({'index': i, **p})
+        except (TypeError, ValueError) as e:
+            parsed.append(None)
+            results.append({'index': i, 'error': f'invalid property: {e}'})
+
+    ok = [k for k, row in enumerate(parsed) if row is not None]
+    resolved = {}
+    for k in ok:
+        city, locality = parsed[k][:2]
+        if (city, locality) not in resolved:
+            resolved[city, locality] = _resolve_locality(bundle, city, locality)
+        city, locality, extra = resolved[city, locality]
+        if extra or city != parsed[k][0]:
+            parsed[k] = (city, locality) + parsed[k][2:]
+            results[k].update(city=city, locality=locality, **extra)
+    if ok:
+        columns   = list(zip(*(parsed[k] for k in ok)))
+        with STAGE_SECONDS.time(stage='batch_predict'):
+            low, fair, high = bundle.predictor.rent_range(
+                bundle.predictor.predict_raw_batch(*columns))
+        lows, fairs, highs = (np.round(a, 0).tolist() for a in (low, fair, high))
+        for k, low, fair, high in zip(ok, lows, fairs, highs):
+            results[k].update(fair_rent_low=low, fair_rent=fair, fair_rent_high=high)
+    return results
+
+
+def _ndjson_records(stream):
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+@app.after_request
+def add_model_version(response):
+    version = model_registry.loaded_version
+    if version:
+        response.headers['X-Model-Version'] = version
+    return response
+
+
+# ── METRICS + PROFILING ───────────────────────────────────────────────────────
+
+def _endpoint():
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.profile = profiler.start(forced=request.headers.get('X-Profile') == '1' and _is_admin())
+
+
+@app.after_request
+def record_request_metrics(response):
+    elapsed = time.perf_counter() - g.get('request_start', time.perf_counter())
+    REQUEST_SECONDS.observe(elapsed, endpoint=_endpoint(), method=request.method,
+                            status=response.status_code)
+    profile = g.pop('profile', None)
+    if profile is not None:
+        response.headers['X-Profile-Id'] = profiler.finish(profile, request.method, request.path,
+                                                           response.status_code, elapsed)
+    return response
+
+
+@app.teardown_request
+def count_unhandled_errors(exc):
+    if exc is not None:
+        ERRORS.inc(endpoint=_endpoint(), type=type(exc).__name__)
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profile.disable()
+
+
+@REGISTRY.add_collector
+def _component_stats():
+    """Existing stats() counters, read only when /metrics is scraped."""
+    pc = prediction_cache.stats()
+    yield ('rent_prediction_cache_lookups_total', 'counter', 'Prediction cache lookups.',
+           [({'result': 'hit'}, pc['hits']), ({'result': 'miss'}, pc['misses'])])
+    yield ('rent_prediction_cache_evictions_total', 'counter', 'Prediction cache LRU evictions.',
+           [({}, pc['evictions'])])
+    yield ('rent_prediction_cache_size', 'gauge', 'Entries in the prediction cache.', [({}, pc['size'])])
+    yield ('rent_prediction_cache_backend_errors_total', 'counter',
+           'Shared prediction cache calls that failed and fell back to the local cache.',
+           [({}, pc['backend_errors'])])
+
+    ac = advice_cache.stats()
+    yield ('rent_advice_cache_lookups_total', 'counter', 'Advisor answer cache lookups.',
+           [({'persona': persona, 'result': result}, c[key])
+            for persona, c in sorted(ac['personas'].items())
+            for result, key in (('hit', 'hits'), ('miss', 'misses'), ('bypass', 'bypasses'))])
+    yield ('rent_advice_cache_size', 'gauge', 'Entries in the advisor answer cache.', [({}, ac['size'])])
+
+    pl = prediction_logger.stats()
+    yield ('rent_prediction_log_records_total', 'counter', 'Prediction log records by outcome.',
+           [({'result': r}, pl[r]) for r in ('enqueued', 'written', 'dropped', 'failed')])
+    yield ('rent_prediction_log_queued', 'gauge', 'Records waiting for insert_many.', [({}, pl['queued'])])
+
+    llm = stream_stats()
+    yield ('rent_llm_streams_total', 'counter', 'Upstream advisor streams by outcome.',
+           [({'result': r}, llm[r])
+            for r in ('started', 'completed', 'rejected', 'timeouts', 'cancelled', 'errors')])
+    yield ('rent_llm_streams', 'gauge', 'Upstream advisor streams in flight.',
+           [({'state': 'active'}, llm['active']), ({'state': 'waiting'}, llm['waiting'])])
+    yield ('rent_llm_stream_subscribers', 'gauge', 'Chat streams reading a shared upstream stream.',
+           [({}, llm['subscribers'])])
+    yield ('rent_llm_coalesced_total', 'counter', 'Chat streams that joined an identical stream in flight.',
+           [({}, llm['coalesced'])])
+    yield ('rent_llm_slot_wait_seconds_total', 'counter', 'Time upstream streams waited for a slot.',
+           [({}, llm['slot_wait_seconds'])])
+
+    ad = chat_admission.stats()
+    yield ('rent_chat_admissions_total', 'counter', 'Chat stream admission decisions.',
+           [({'result': 'admitted'}, ad['admitted'] - ad['queued']), ({'result': 'queued'}, ad['queued'])]
+           + [({'result': 'rejected', 'reason': r}, n) for r, n in ad['rejected'].items()])
+    yield ('rent_chat_admission_waiting', 'gauge', 'Chat streams waiting for a rate-limit token.',
+           [({}, ad['waiting'])])
+
+    cs = chat_store.stats()
+    yield ('rent_chat_prompt_tokens_total', 'counter', 'Advisor history tokens, full vs actually sent.',
+           [({'kind': 'history'}, cs['history_tokens']), ({'kind': 'sent'}, cs['sent_tokens'])])
+
+    ms = model_registry.stats()
+    yield ('rent_model_info', 'gauge', 'Loaded model version.',
+           [({'version': ms['version']}, 1)] if ms['version'] else [])
+    yield ('rent_model_reloads_total', 'counter', 'Model hot reloads.',
+           [({'result': 'ok'}, ms['reloads']), ({'result': 'failed'}, ms['failed_reloads'])])
+
+    li = locality_index.stats()
+    yield ('rent_locality_resolutions_total', 'counter', 'Typed localities by how they matched.',
+           [({'match': how}, n) for how, n in li['resolved'].items()])
+
+    hc = compressor.stats()
+    yield ('rent_http_compressed_responses_total', 'counter', 'Responses sent compressed.',
+           [({'encoding': enc}, n) for enc, n in sorted(hc['responses'].items())])
+    yield ('rent_http_compressed_bytes_total', 'counter', 'Compressed response bytes before and after.',
+           [({'stage': 'raw'}, hc['bytes_in']), ({'stage': 'sent'}, hc['bytes_out'])])
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
+@app.route('/admin/profiling', methods=['GET', 'POST'])
+def profiling():
+    """GET lists kept profiles; POST ?rate=0.05 changes the sampling rate at runtime."""
+    if not _is_admin():
+        return jsonify({'error': 'forbidden'}), 403
+    if request.method == 'POST':
+        try:
+            profiler.set_rate(request.args.get('rate', '0'))
+        except ValueError:
+            return jsonify({'error': 'rate must be a number between 0 and 1.'}), 400
+    return jsonify({**profiler.stats(), 'reports': profiler.reports()})
+
+
+@app.route('/admin/profiling/<report_id>', methods=['GET'])
+def profile_report(report_id):
+    if not _is_admin():
+        return jsonify({'error': 'forbidden'}), 403
+    report = profiler.get(report_id)
+    if report is None:
+        return jsonify({'error': 'unknown or expired profile'}), 404
+    return Response(report['stats'], mimetype='text/plain')
+
+
+# ── HTTP CACHING + COMPRESSION ────────────────────────────────────────────────
+
+def _validated(response, etag, immutable=False):
+    # Weak and varying by encoding on the 200 and the 304 alike: the ETag names
+    # the content, whichever encoding compress_response picks for the body.
+    response.set_etag(etag, weak=True)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = cache_control(immutable)
+    return response
+
+
+@app.after_request
+def cache_and_compress(response):
+    if request.endpoint == 'static' and response.status_code in (200, 304):
+        response.headers['Cache-Control'] = cache_control(private=False)
+    return compressor.compress_response(response, request.headers.get('Accept-Encoding'))
 
 
 # ── AUTH ──────────────────────────────────────────────────────────────────────
@@ -82,11 +370,15 @@ def signup():
             flash('An account with this email already exists.', 'error')
             return render_template("signup.html")
 
-        result = db.users.insert_one({
-            'name': name, 'email': email,
-            'password': generate_password_hash(password),
-            'created_at': datetime.utcnow()
-        })
+        try:
+            result = db.users.insert_one({
+                'name': name, 'email': email,
+                'password': generate_password_hash(password),
+                'created_at': datetime.utcnow()
+            })
+        except DuplicateKeyError:
+            flash('An account with this email already exists.', 'error')
+            return render_template("signup.html")
         session['user_id']   = str(result.inserted_id)
         session['user_name'] = name
         return redirect(url_for('dashboard'))
@@ -127,104 +419,480 @@ def logout():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    return render_template("index.html",
-                           cities=list(locality_map.keys()),
-                           cities_map=locality_map,
-                           user_name=session.get('user_name'))
+    # Locality lists are fetched per city from /localities, not inlined here.
+    # The page only depends on the model version, the user and the template,
+    # so a revalidation that still matches is answered without rendering.
+    bundle    = model_registry.current
+    user_name = session.get('user_name')
+    etag = etag_for(bundle.version, user_name, page_templates.get('index.html'))
+    if request.if_none_match.contains_weak(etag):
+        return _validated(Response(status=304), etag)
+    return _validated(Response(render_template("index.html",
+                                               cities=list(bundle.locality_map.keys()),
+                                               model_version=bundle.version,
+                                               user_name=user_name)), etag)
+
+
+@app.route('/localities', methods=['GET'])
+@login_required
+def localities():
+    """Typeahead over the model's localities in `?city=`.
+
+    `?q=` returns up to `limit` ranked matches (prefix, word prefix, then
+    fuzzy); without `q` the city's full list comes back alphabetically.
+    Answers only change with the model, so a request carrying `?v=` equal to
+    the loaded version is cached for a year; any other is revalidated.
+    """
+    bundle = model_registry.current
+    index  = locality_index.get(bundle)
+    city   = index.city(request.args.get('city', ''))
+    if city is None:
+        return jsonify({'error': 'Unknown city.', 'cities': list(index.cities)}), 404
+    query = request.args.get('q', '').strip()
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), LOCALITIES_MAX_LIMIT) if query else None
+    except ValueError:
+        return jsonify({'error': 'limit must be a number.'}), 400
+    etag      = etag_for(bundle.version, city, query, limit)
+    immutable = request.args.get('v') == bundle.version
+    if request.if_none_match.contains_weak(etag):
+        return _validated(Response(status=304), etag, immutable)
+    with STAGE_SECONDS.time(stage='locality_search'):
+        matches = index.search(city, query, limit)
+    return _validated(jsonify({'city': city, 'q': query, 'model_version': bundle.version,
+                               'localities': matches}), etag, immutable)
 
 
 # ── PREDICT ───────────────────────────────────────────────────────────────────
 
-@app.route('/predict', methods=['POST'])
-@login_required
-def predict():
-    d          = request.json
-    city       = d.get('city', '')
-    locality   = d.get('locality', '')
+# Route bodies below are shared with the ASGI app (asgi.py), which awaits
+# Mongo and runs these in its inference pool.
+
+def _predict(d, user_id):
     bhk        = int(d.get('bhk', 2))
     area       = float(d.get('area', 1000))
     furnishing = d.get('furnishing', 'Semi-Furnished')
 
-    low, high = _run_model(city, locality, bhk, area, furnishing)
+    bundle = model_registry.current
+    city, locality, extra = _resolve_locality(bundle, str(d.get('city', '')),
+                                              str(d.get('locality', '')))
+    low, fair, high = _run_model(city, locality, bhk, area, furnishing, bundle=bundle)
     result = {
-        "city": city, "locality": locality, "bhk": bhk,
+        "city": city, "locality": locality, **extra, "bhk": bhk,
         "area": area, "furnishing": furnishing,
-        "fair_rent_low": low, "fair_rent_high": high,
+        "fair_rent_low": low, "fair_rent": fair, "fair_rent_high": high,
+        "model_version": bundle.version,
         "timestamp": datetime.utcnow().isoformat()
     }
-    try:
-        db.predictions.insert_one({
-            'user_id': session['user_id'], **result,
+    with STAGE_SECONDS.time(stage='prediction_log_enqueue'):
+        prediction_logger.log({
+            'user_id': user_id, **result,
             'created_at': datetime.utcnow(), 'note': ''
         })
-    except Exception:
-        pass
+    return result
 
-    return jsonify(result)
 
-
-@app.route('/compare', methods=['POST'])
-@login_required
-def compare():
-    props   = request.json.get('properties', [])
+def _compare(props):
+    bundle  = model_registry.current
     results = []
     for p in props[:2]:
-        low, high = _run_model(
-            p.get('city', ''), p.get('locality', ''),
+        city, locality, extra = _resolve_locality(bundle, str(p.get('city', '')),
+                                                  str(p.get('locality', '')))
+        low, fair, high = _run_model(
+            city, locality,
             int(p.get('bhk', 2)), float(p.get('area', 1000)),
-            p.get('furnishing', 'Semi-Furnished')
+            p.get('furnishing', 'Semi-Furnished'), bundle=bundle
         )
-        results.append({**p, "fair_rent_low": low, "fair_rent_high": high,
-                        "avg": (low + high) / 2})
-    return jsonify(results)
+        results.append({**p, "city": city, "locality": locality, **extra,
+                        "fair_rent_low": low, "fair_rent": fair, "fair_rent_high": high,
+                        "avg": fair})
+    return results
+
+
+@app.route('/predict', methods=['POST'])
+@login_required
+def predict():
+    return jsonify(_predict(request.json, session['user_id']))
+
+
+@app.route('/compare', methods=['POST'])
+@login_required
+def compare():
+    return jsonify(_compare(request.json.get('properties', [])))
+
+
+@app.route('/explore', methods=['GET'])
+@login_required
+def explore():
+    """Lookups on the precomputed rent surface (no model calls).
+
+    `?locality=` returns that locality's full BHK x furnishing x area grid;
+    otherwise `?city=` ranks the city's localities for one configuration.
+    """
+    bundle  = model_registry.current
+    surface = surface_store.get(bundle)
+    if surface is None and surface_store.failed_version == bundle.version:
+        return jsonify({'error': 'Rent surface for this model could not be built.'}), 503
+    if surface is None:
+        response = jsonify({'error': 'Rent surface for this model is still being built.'})
+        response.headers['Retry-After'] = '10'
+        return response, 503
+
+    args = request.args
+    city, locality = args.get('city', '').strip(), args.get('locality', '').strip()
+    try:
+        area     = float(args['area']) if args.get('area') else None
+        min_rent = float(args['min_rent']) if args.get('min_rent') else None
+        max_rent = float(args['max_rent']) if args.get('max_rent') else None
+        limit    = min(max(int(args.get('limit', 20)), 1), EXPLORE_MAX_LIMIT)
+        bhk      = int(args.get('bhk', 2))
+    except ValueError:
+        return jsonify({'error': 'bhk, area, min_rent, max_rent and limit must be numbers.'}), 400
+
+    try:
+        if locality:
+            if not city:
+                cities = surface.cities_for(locality)
+                if len(cities) != 1:
+                    return jsonify({'error': f"Pass city= for '{locality}'.", 'cities': cities}), 400
+                city = cities[0]
+            grid = surface.grid(city, locality,
+                                bhks=args.getlist('bhk') or None,
+                                furnishings=args.getlist('furnishing') or None)
+            return jsonify({'city': city, 'locality': locality,
+                            'model_version': surface.version, **grid})
+
+        if not city:
+            return jsonify({'error': 'city or locality is required.'}), 400
+        furnishing = args.get('furnishing', 'Semi-Furnished')
+        area_used, rows = surface.rank(city, bhk, furnishing, area=area, min_rent=min_rent,
+                                       max_rent=max_rent, limit=limit,
+                                       descending=args.get('order') == 'desc')
+    except KeyError as e:
+        return jsonify({'error': e.args[0]}), 400
+    return jsonify({'city': city, 'bhk': bhk, 'furnishing': furnishing, 'area': area_used,
+                    'model_version': surface.version, 'localities': rows})
+
+
+@app.route('/comparables', methods=['GET'])
+@login_required
+def comparables():
+    """Nearest similar real listings around a locality (or `lat`/`lon`)."""
+    index = comparables_store.get()
+    if index is None:
+        return jsonify({'error': 'No geocoded listings available; run src/data_pipeline.py.'}), 503
+
+    args = request.args
+    city = args.get('city', '').strip()
+    try:
+        bhk    = int(args.get('bhk', 2))
+        area   = float(args.get('area', 1000))
+        k      = min(max(int(args.get('k', 5)), 1), COMPARABLES_MAX_K)
+        lat    = float(args['lat']) if args.get('lat') else None
+        lon    = float(args['lon']) if args.get('lon') else None
+        max_km = float(args['max_km']) if args.get('max_km') else None
+    except ValueError:
+        return jsonify({'error': 'bhk, area, k, lat, lon and max_km must be numbers.'}), 400
+    if area <= 0:
+        return jsonify({'error': 'area must be positive.'}), 400
+
+    locality = args.get('locality', '').strip() or None
+    try:
+        rows = index.comparables(city, bhk, area, furnishing=args.get('furnishing'),
+                                 locality=locality, lat=lat, lon=lon, k=k, max_km=max_km)
+        nearby = index.nearby_localities(city, locality, lat=lat, lon=lon)
+    except KeyError as e:
+        return jsonify({'error': e.args[0]}), 404
+    return jsonify({'city': city, 'locality': locality, 'comparables': rows,
+                    'nearby_localities': nearby})
+
+
+def _market_evidence(ml):
+    """Comparables + nearby localities for the advisor prompt, or None."""
+    index = comparables_store.get() if ADVISOR_COMPARABLES > 0 else None
+    if index is None:
+        return None
+    try:
+        return {'comparables': index.comparables(ml['city'], ml['bhk'], ml['area'],
+                                                 furnishing=ml.get('furnishing'),
+                                                 locality=ml['locality'], k=ADVISOR_COMPARABLES),
+                'nearby_localities': index.nearby_localities(ml['city'], ml['locality'], n=2)}
+    except (KeyError, ValueError, TypeError):
+        return None
+
+
+@app.route('/predict/batch', methods=['POST'])
+@login_required
+def predict_batch():
+    ndjson = request.mimetype in NDJSON_MIMETYPES
+    if ndjson:
+        source = _ndjson_records(request.stream)
+    else:
+        if (request.content_length or 0) > BATCH_MAX_BYTES:
+            return jsonify({'error': f'Body exceeds {BATCH_MAX_BYTES} bytes.'}), 413
+        props = request.get_json(silent=True)
+        if isinstance(props, dict):
+            props = props.get('properties')
+        if not isinstance(props, list):
+            return jsonify({'error': 'Expected a JSON array of properties.'}), 400
+        if len(props) > BATCH_MAX_ROWS:
+            return jsonify({'error': f'Batch exceeds {BATCH_MAX_ROWS} properties.'}), 413
+        source = iter(props)
+
+    def encode(records, first):
+        for r in records:
+            if ndjson:
+                yield json.dumps(r) + "\n"
+            else:
+                yield ("" if first else ",") + json.dumps(r)
+                first = False
+
+    bundle = model_registry.current
+
+    def generate():
+        first, chunk, overflow = True, [], False
+        if not ndjson:
+            yield "["
+        for i, p in enumerate(source):
+            if i >= BATCH_MAX_ROWS:
+                overflow = True
+                break
+            chunk.append((i, p))
+            if len(chunk) == BATCH_CHUNK_SIZE:
+                yield from encode(_score_chunk(chunk, bundle), first)
+                first, chunk = False, []
+        records = _score_chunk(chunk, bundle)
+        if overflow:
+            records.append({'error': f'Batch exceeds {BATCH_MAX_ROWS} properties; remaining input ignored.'})
+        yield from encode(records, first)
+        if not ndjson:
+            yield "]"
+
+    return Response(stream_with_context(generate()),
+                    mimetype='application/x-ndjson' if ndjson else 'application/json')
+
+
+@app.route('/predict/cache', methods=['GET'])
+def prediction_cache_stats():
+    if not _is_admin():
+        return jsonify({'error': 'forbidden'}), 403
+    return jsonify(prediction_cache.stats())
+
+
+@app.route('/chat/cache', methods=['GET'])
+def advice_cache_stats():
+    if not _is_admin():
+        return jsonify({'error': 'forbidden'}), 403
+    return jsonify(advice_cache.stats())
+
+
+@app.route('/model', methods=['GET'])
+def model_info():
+    if not _is_admin():
+        return jsonify({'error': 'forbidden'}), 403
+    return jsonify(model_registry.stats())
+
+
+@app.route('/admin/model/reload', methods=['POST'])
+def reload_model():
+    if not _is_admin():
+        return jsonify({'error': 'forbidden'}), 403
+    try:
+        swapped, version = model_registry.reload(force=request.args.get('force') == '1')
+    except ModelValidationError as e:
+        return jsonify({'ok': False, 'error': str(e), **model_registry.stats()}), 422
+    except Exception as e:
+        return jsonify({'ok': False, 'error': f'{type(e).__name__}: {e}'}), 500
+    return jsonify({'ok': True, 'swapped': swapped, 'version': version})
+
+
+@app.route('/predict/log', methods=['GET'])
+def prediction_log_stats():
+    if not _is_admin():
+        return jsonify({'error': 'forbidden'}), 403
+    return jsonify(prediction_logger.stats())
 
 
 # ── STREAMING CHAT ────────────────────────────────────────────────────────────
 
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+
+def _advice_kwargs(data, history, market):
+    ml     = data['ml_data']
+    range_ = (ml['fair_rent_low'], ml['fair_rent_high'])
+    # Predictions from before the quantile band carry no point estimate.
+    return dict(bhk=ml['bhk'], locality=ml['locality'], city=ml['city'],
+                area=ml['area'], furnishing=ml['furnishing'],
+                predicted_rent=ml.get('fair_rent') or sum(range_) / 2,
+                user_question=data['user_question'],
+                chat_history=history,
+                persona=data.get('persona', 'tenant'),
+                use_cache=not data.get('no_cache', False),
+                market={**(market or {}), 'fair_rent_range': range_})
+
+
+def _sse(token):
+    return f"data: {token.replace(chr(10), chr(92)+'n')}\n\n"
+
+
+def _admit(user_id, kwargs, max_wait=None):
+    """serving.admission ticket for one advice stream: the shared upstream
+    budget is only charged when the answer is not cached and no identical
+    prompt is already admitted."""
+    admission = chat_admission.reserve(user_id, flight=advice_flight(**kwargs), max_wait=max_wait)
+    STAGE_SECONDS.observe(admission.delay, stage='chat_admission_wait')
+    return admission
+
+
+def _chat_rejected(e):
+    response = jsonify({'error': str(e), 'retry_after': e.retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+
 @app.route('/chat/stream', methods=['POST'])
 @login_required
 def chat_stream():
-    data    = request.json
-    ml      = data['ml_data']
-    persona = data.get('persona', 'tenant')
+    data     = request.json
+    ml       = data['ml_data']
+    question = data['user_question']
+
+    # History lives server-side, keyed by the session's conversation id.
+    user_id = session['user_id']
+    chat_id = session.get('chat_id') or ChatHistoryStore.new_chat_id()
+    session['chat_id'] = chat_id
+    context = ChatHistoryStore.context(ml)
+    history, usage = chat_store.window(chat_store.load(chat_id, user_id, context))
+    market = _market_evidence(ml)
+    kwargs = _advice_kwargs(data, history, market)
+    try:
+        admission = _admit(user_id, kwargs, max_wait=CHAT_SYNC_MAX_WAIT)
+    except AdmissionRejected as e:
+        return _chat_rejected(e)
+    if admission.delay:
+        time.sleep(admission.delay)
 
     def generate():
+        parts, ttft, start = [], None, time.perf_counter()
         try:
-            for token in stream_real_estate_advice(
-                bhk=ml['bhk'], locality=ml['locality'], city=ml['city'],
-                area=ml['area'], furnishing=ml['furnishing'],
-                predicted_rent=(ml['fair_rent_low'] + ml['fair_rent_high']) / 2,
-                user_question=data['user_question'],
-                chat_history=data.get('chat_history', ''),
-                persona=persona
-            ):
-                yield f"data: {token.replace(chr(10), chr(92)+'n')}\n\n"
+            for token in stream_real_estate_advice(**kwargs):
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                    STAGE_SECONDS.observe(ttft, stage='llm_first_token')
+                parts.append(token)
+                yield _sse(token)
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage='llm_total')
+            answer = ''.join(parts)
+            chat_store.append(chat_id, user_id, context, question, answer)
+            chat_store.record(usage, ttft)
+            chat_store.compact_async(chat_id, user_id, usage, question, answer)
         except Exception as e:
+            ERRORS.inc(endpoint='/chat/stream', type=type(e).__name__)
             yield f"data: [ERROR] {e}\n\n"
         yield "data: [DONE]\n\n"
 
-    return Response(stream_with_context(generate()),
-                    mimetype='text/event-stream',
-                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response = Response(stream_with_context(generate()),
+                        mimetype='text/event-stream', headers=SSE_HEADERS)
+    response.call_on_close(admission.release)
+    return response
+
+
+@app.route('/chat/history', methods=['GET', 'DELETE'])
+@login_required
+def chat_history():
+    chat_id = session.get('chat_id')
+    if request.method == 'DELETE':
+        if chat_id:
+            chat_store.clear(chat_id, session['user_id'])
+        session.pop('chat_id', None)
+        return jsonify({'success': True})
+    doc = chat_store.load(chat_id, session['user_id']) if chat_id else {'turns': [], 'summary': ''}
+    _, usage = chat_store.window(doc)
+    return jsonify({'turns': doc['turns'], 'summary': doc['summary'], **usage})
+
+
+@app.route('/chat/stats', methods=['GET'])
+def chat_stats():
+    if not _is_admin():
+        return jsonify({'error': 'forbidden'}), 403
+    return jsonify(chat_store.stats())
 
 
 # ── HISTORY + NOTES ───────────────────────────────────────────────────────────
 
+def _history_query(args, user_id):
+    """(filter, page size) for /history; ValueError on a malformed cursor.
+
+    The cursor is (`before`, `before_id`): records sort by (created_at, _id)
+    descending, so a page ending inside a run of records created in the same
+    millisecond resumes right after its last record. `before` alone still
+    works and skips the rest of its millisecond."""
+    query = {'user_id': user_id}
+    before = args.get('before')
+    if before:
+        try:
+            created = datetime.fromisoformat(before)
+        except ValueError:
+            raise ValueError('before must be an ISO-8601 timestamp.') from None
+        before_id = args.get('before_id')
+        if before_id:
+            try:
+                before_id = ObjectId(before_id)
+            except (InvalidId, TypeError):
+                raise ValueError('before_id must be a record id.') from None
+            query['$or'] = [{'created_at': {'$lt': created}},
+                            {'created_at': created, '_id': {'$lt': before_id}}]
+        else:
+            query['created_at'] = {'$lt': created}
+    try:
+        limit = min(max(int(args.get('limit', HISTORY_PAGE_SIZE)), 1), HISTORY_MAX_PAGE)
+    except ValueError:
+        limit = HISTORY_PAGE_SIZE
+    return query, limit
+
+
+def _history_page(records, limit):
+    """JSON-ready records and the next-page cursor headers (`X-Next-Before`,
+    `X-Next-Before-Id`; empty on the last page)."""
+    last_id = None
+    for r in records:
+        last_id = r.pop('_id', None)
+        if 'created_at' in r and hasattr(r['created_at'], 'isoformat'):
+            r['created_at'] = r['created_at'].isoformat()
+    if len(records) == limit and records[-1].get('created_at'):
+        cursor = {'X-Next-Before': records[-1]['created_at']}
+        if last_id is not None:
+            cursor['X-Next-Before-Id'] = str(last_id)
+        return records, cursor
+    return records, {}
+
+
 @app.route('/history', methods=['GET'])
 @login_required
 def history():
     try:
-        records = list(
-            db.predictions
-            .find({'user_id': session['user_id']}, {'_id': 0})
-            .sort('created_at', -1)
-            .limit(20)
-        )
-        for r in records:
-            if 'created_at' in r and hasattr(r['created_at'], 'isoformat'):
-                r['created_at'] = r['created_at'].isoformat()
-        return jsonify(records)
-    except Exception:
+        query, limit = _history_query(request.args, session['user_id'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        with STAGE_SECONDS.time(stage='history_query'):
+            records = list(
+                db.predictions
+                .find(query, HISTORY_PROJECTION)
+                .sort(HISTORY_SORT)
+                .limit(limit)
+            )
+        records, cursor = _history_page(records, limit)
+        response = jsonify(records)
+        response.headers.update(cursor)
+        # revalidated on every load; an unchanged page comes back as a 304
+        return _validated(response, etag_for(response.get_data())).make_conditional(request)
+    except Exception as e:
+        ERRORS.inc(endpoint='/history', type=type(e).__name__)
+        app.logger.warning("History query failed: %s", e)
         return jsonify([])
 
 
@@ -239,6 +907,7 @@ def save_note():
         )
         return jsonify({'ok': True})
     except Exception as e:
+        ERRORS.inc(endpoint='/history/note', type=type(e).__name__)
         return jsonify({'ok': False, 'error': str(e)})
 
 
@@ -1,12 +1,9 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import pickle
-import json
 import plotly.graph_objects as go
 import os
 import streamlit.components.v1 as components
 from Ai.apiCall import get_real_estate_advice
+from ml.artifacts import ArtifactStore
 
 st.set_page_config(page_title="Fair Rent Advisor", page_icon="🏢", layout="centered")
 
@@ -14,17 +11,11 @@ st.set_page_config(page_title="Fair Rent Advisor", page_icon="🏢", layout="cen
 def load_artifacts():
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     MODELS_DIR = os.path.join(BASE_DIR, 'models')
-    with open(os.path.join(MODELS_DIR, 'locality_mapping.json'), 'r') as f:
-        locality_map = json.load(f)
-    with open(os.path.join(MODELS_DIR, 'rent_model_artifacts.pkl'), 'rb') as f:
-        artifacts = pickle.load(f)
-    return locality_map, artifacts
+    return ArtifactStore(MODELS_DIR).load_bundle()
 
-locality_map, artifacts = load_artifacts()
-model = artifacts['model']
-locality_value_map = artifacts['locality_value_map']
-global_mean_rent = artifacts['global_mean_rent']
-feature_columns = artifacts['feature_columns']
+bundle = load_artifacts()
+locality_map = bundle.locality_map
+predictor = bundle.predictor
 
 st.markdown("<h1 style='text-align: center;'>🏠 Fair Rent Advisor</h1>", unsafe_allow_html=True)
 st.markdown("<h5 style='text-align: center; color: grey; margin-top: -10px;'>AI-Powered Valuation for Mumbai, Delhi, Pune</h5>", unsafe_allow_html=True)
@@ -51,22 +42,8 @@ with st.container(border=True):
     submitted = st.button("Analyze Fair Rent", type="primary")
 
 if submitted:
-    loc_val = locality_value_map.get(locality, global_mean_rent)
-    input_df = pd.DataFrame(columns=feature_columns)
-    input_df.loc[0] = 0
-    input_df.at[0,'BHK']=bhk
-    input_df.at[0,'Area']=area
-    input_df.at[0,'Locality_Value']=loc_val
-    city_col=f"city_{city_sel}"
-    furnishing_col=f"Furnishing_{furnishing}"
-    if city_col in feature_columns:
-        input_df.at[0, city_col]=1
-    if furnishing_col in feature_columns:
-        input_df.at[0, furnishing_col]=1
-    pred_log=model.predict(input_df)[0]
-    fair_rent=np.expm1(pred_log)
-    rent_low=fair_rent*0.95
-    rent_high=fair_rent*1.05
+    raw=predictor.forest.predict_one(predictor.features(city_sel, locality, bhk, area, furnishing))
+    rent_low, fair_rent, rent_high=(float(v) for v in predictor.rent_range(raw))
     st.markdown("### 📊 Valuation Result")
     st.success(f"**Fair Rent Estimate:** ₹{rent_low:,.0f} - ₹{rent_high:,.0f}")
     fig=go.Figure(go.Indicator(
@@ -0,0 +1,269 @@
+"""ASGI entry point: async chat streaming and Mongo routes, Flask for the rest.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 2
+
+/chat/stream, /chat/history, /predict, /compare, /history and /history/note
+run on the event loop: LLM streams and Mongo calls (pymongo's
+AsyncMongoClient) are awaited, so an open chat costs a coroutine rather than
+a worker thread, and model inference runs in a bounded thread pool
+(ASGI_INFERENCE_THREADS). Every other route - pages, auth, admin, batch,
+explore - is the unchanged Flask app behind a bounded WSGI thread pool
+(ASGI_WSGI_THREADS). Both halves read and write the same signed Flask
+session cookie, so a login on one is valid on the other.
+"""
+import os
+import time
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from itsdangerous import BadSignature
+from werkzeug.http import parse_etags, quote_etag
+from pymongo import AsyncMongoClient
+from starlette.applications import Starlette
+from starlette.responses import Response, JSONResponse, RedirectResponse, StreamingResponse
+from starlette.routing import Route, Mount
+from starlette.background import BackgroundTask
+from a2wsgi import WSGIMiddleware
+
+import app as flask_app
+from app import chat_store, model_registry, compressor, HISTORY_PROJECTION, HISTORY_SORT, SSE_HEADERS
+from Ai.apiCall import astream_advice
+from Ai.chat_history import ChatHistoryStore
+from serving.metrics import REQUEST_SECONDS, STAGE_SECONDS, ERRORS
+from serving.http_cache import etag_for, cache_control
+from serving.admission import AdmissionRejected
+
+ASGI_INFERENCE_THREADS = int(os.getenv("ASGI_INFERENCE_THREADS", "8"))
+ASGI_WSGI_THREADS      = int(os.getenv("ASGI_WSGI_THREADS", "16"))
+
+inference_pool = ThreadPoolExecutor(max_workers=ASGI_INFERENCE_THREADS,
+                                    thread_name_prefix="inference")
+# Opened on the serving loop at startup; tests and load tests may preset it.
+adb = None
+
+
+async def run_sync(fn, *args):
+    """Runs CPU-bound `fn` in the bounded inference pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(inference_pool, functools.partial(fn, *args))
+
+
+# ── Flask session cookie ──────────────────────────────────────────────────────
+
+def _serializer():
+    return flask_app.app.session_interface.get_signing_serializer(flask_app.app)
+
+
+def read_session(request):
+    cookie = request.cookies.get(flask_app.app.config['SESSION_COOKIE_NAME'])
+    if not cookie:
+        return {}
+    max_age = int(flask_app.app.permanent_session_lifetime.total_seconds())
+    try:
+        return dict(_serializer().loads(cookie, max_age=max_age))
+    except BadSignature:
+        return {}
+
+
+def write_session(response, data):
+    """Sets the cookie the way Flask's SecureCookieSessionInterface would."""
+    config = flask_app.app.config
+    response.set_cookie(config['SESSION_COOKIE_NAME'], _serializer().dumps(data),
+                        path=config['SESSION_COOKIE_PATH'] or config['APPLICATION_ROOT'] or '/',
+                        domain=config['SESSION_COOKIE_DOMAIN'] or None,
+                        secure=config['SESSION_COOKIE_SECURE'],
+                        httponly=config['SESSION_COOKIE_HTTPONLY'],
+                        samesite=config['SESSION_COOKIE_SAMESITE'])
+
+
+def view(rule, login=True):
+    """Starlette counterpart of the Flask hooks: login redirect, request
+    metrics, error counting and the X-Model-Version header."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def endpoint(request):
+            start = time.perf_counter()
+            session = read_session(request)
+            if login and 'user_id' not in session:
+                return RedirectResponse('/login', status_code=302)
+            try:
+                response = await fn(request, session)
+            except Exception as e:
+                ERRORS.inc(endpoint=rule, type=type(e).__name__)
+                raise
+            REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=rule,
+                                    method=request.method, status=response.status_code)
+            version = model_registry.loaded_version
+            if version:
+                response.headers['X-Model-Version'] = version
+            return response
+        return endpoint
+    return decorate
+
+
+# ── PREDICTIONS ───────────────────────────────────────────────────────────────
+
+@view('/predict')
+async def predict(request, session):
+    return JSONResponse(await run_sync(flask_app._predict, await request.json(), session['user_id']))
+
+
+@view('/compare')
+async def compare(request, session):
+    data = await request.json()
+    return JSONResponse(await run_sync(flask_app._compare, data.get('properties', [])))
+
+
+# ── HISTORY + NOTES ───────────────────────────────────────────────────────────
+
+def validated_json(request, payload, headers=None):
+    """JSON response with a body ETag, as Flask's /history sends it: a 304
+    when the client already has it, compressed when it accepts that."""
+    body = JSONResponse(payload).body
+    etag = etag_for(body)
+    headers = {**(headers or {}), 'ETag': quote_etag(etag, weak=True), 'Vary': 'Accept-Encoding',
+               'Cache-Control': cache_control()}
+    if parse_etags(request.headers.get('if-none-match')).contains_weak(etag):
+        return Response(status_code=304, headers=headers)
+    if compressor.compressible('application/json', len(body)):
+        body, encoding = compressor.encode(body, request.headers.get('accept-encoding'))
+        if encoding:
+            headers['Content-Encoding'] = encoding
+    return Response(body, media_type='application/json', headers=headers)
+
+
+@view('/history')
+async def history(request, session):
+    try:
+        query, limit = flask_app._history_query(request.query_params, session['user_id'])
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    try:
+        with STAGE_SECONDS.time(stage='history_query'):
+            records = await (adb.predictions
+                             .find(query, HISTORY_PROJECTION)
+                             .sort(HISTORY_SORT)
+                             .limit(limit)
+                             .to_list())
+        records, cursor = flask_app._history_page(records, limit)
+    except Exception as e:
+        ERRORS.inc(endpoint='/history', type=type(e).__name__)
+        flask_app.app.logger.warning("History query failed: %s", e)
+        return JSONResponse([])
+    return validated_json(request, records, cursor)
+
+
+@view('/history/note')
+async def save_note(request, session):
+    d = await request.json()
+    try:
+        await adb.predictions.update_one(
+            {'user_id': session['user_id'], 'timestamp': d.get('timestamp')},
+            {'$set': {'note': d.get('note', '')}}
+        )
+        return JSONResponse({'ok': True})
+    except Exception as e:
+        ERRORS.inc(endpoint='/history/note', type=type(e).__name__)
+        return JSONResponse({'ok': False, 'error': str(e)})
+
+
+# ── STREAMING CHAT ────────────────────────────────────────────────────────────
+
+@view('/chat/stream')
+async def chat_stream(request, session):
+    data     = await request.json()
+    ml       = data['ml_data']
+    question = data['user_question']
+
+    user_id = session['user_id']
+    chat_id = session.get('chat_id') or ChatHistoryStore.new_chat_id()
+    context = ChatHistoryStore.context(ml)
+    history, usage = chat_store.window(await chat_store.aload(chat_id, user_id, context))
+    market = await run_sync(flask_app._market_evidence, ml)
+    kwargs = flask_app._advice_kwargs(data, history, market)
+    try:
+        admission = flask_app._admit(user_id, kwargs)
+    except AdmissionRejected as e:
+        return JSONResponse({'error': str(e), 'retry_after': e.retry_after}, status_code=429,
+                            headers={'Retry-After': str(e.retry_after)})
+    if admission.delay:
+        await asyncio.sleep(admission.delay)
+
+    async def generate():
+        parts, ttft, start = [], None, time.perf_counter()
+        try:
+            async for token in astream_advice(**kwargs):
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                    STAGE_SECONDS.observe(ttft, stage='llm_first_token')
+                parts.append(token)
+                yield flask_app._sse(token)
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage='llm_total')
+            answer = ''.join(parts)
+            await chat_store.aappend(chat_id, user_id, context, question, answer)
+            chat_store.record(usage, ttft)
+            chat_store.compact_async(chat_id, user_id, usage, question, answer)
+        except Exception as e:
+            ERRORS.inc(endpoint='/chat/stream', type=type(e).__name__)
+            yield f"data: [ERROR] {e}\n\n"
+        finally:
+            admission.release()
+        yield "data: [DONE]\n\n"
+
+    # the background task also releases a stream whose body never started
+    response = StreamingResponse(generate(), media_type='text/event-stream', headers=SSE_HEADERS,
+                                 background=BackgroundTask(admission.release))
+    if session.get('chat_id') != chat_id:
+        write_session(response, {**session, 'chat_id': chat_id})
+    return response
+
+
+@view('/chat/history')
+async def chat_history(request, session):
+    chat_id = session.get('chat_id')
+    if request.method == 'DELETE':
+        if chat_id:
+            await chat_store.aclear(chat_id, session['user_id'])
+        response = JSONResponse({'success': True})
+        if chat_id:
+            write_session(response, {k: v for k, v in session.items() if k != 'chat_id'})
+        return response
+    doc = (await chat_store.aload(chat_id, session['user_id']) if chat_id
+           else {'turns': [], 'summary': ''})
+    _, usage = chat_store.window(doc)
+    return JSONResponse({'turns': doc['turns'], 'summary': doc['summary'], **usage})
+
+
+# ── APP ───────────────────────────────────────────────────────────────────────
+
+@asynccontextmanager
+async def lifespan(_app):
+    global adb
+    client = None
+    if adb is None:
+        client = AsyncMongoClient(os.getenv("MONGO_URI"))
+        adb = client['rent_db']
+    chat_store.async_collection = adb.chat_sessions
+    await run_sync(model_registry.warm)
+    await run_sync(flask_app.locality_index.get, model_registry.current)
+    try:
+        yield
+    finally:
+        if client is not None:
+            await client.close()
+        inference_pool.shutdown(wait=False)
+
+
+app = Starlette(
+    routes=[
+        Route('/predict', predict, methods=['POST']),
+        Route('/compare', compare, methods=['POST']),
+        Route('/history', history, methods=['GET']),
+        Route('/history/note', save_note, methods=['POST']),
+        Route('/chat/stream', chat_stream, methods=['POST']),
+        Route('/chat/history', chat_history, methods=['GET', 'DELETE']),
+        Mount('/', app=WSGIMiddleware(flask_app.app, workers=ASGI_WSGI_THREADS)),
+    ],
+    lifespan=lifespan,
+)
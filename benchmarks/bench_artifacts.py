@@ -0,0 +1,74 @@
+import os
+import sys
+import json
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside each simulated worker: load, score once, report, then wait until
+# every sibling is alive before sampling memory so shared pages are split fairly.
+WORKER = r'''
+import os, sys, time, json
+t0 = time.perf_counter()
+sys.path.insert(0, {base!r})
+if {mode!r} == "pickle":
+    import pickle
+    from ml.inference import RentPredictor
+    with open(os.path.join({base!r}, "models", "rent_model_artifacts.pkl"), "rb") as f:
+        a = pickle.load(f)
+    p = RentPredictor.from_model(a["model"], a["feature_columns"],
+                                 a["locality_value_map"], a["global_mean_rent"])
+else:
+    from ml.artifacts import load_compiled
+    p, _ = load_compiled(os.path.join({base!r}, "models", "compiled"))
+p.predict_log("Pune", "Lohegaon", 2, 906.0, "Unfurnished")
+load_s = time.perf_counter() - t0
+print("ready", flush=True)
+sys.stdin.readline()
+mem = {{}}
+with open("/proc/self/smaps_rollup") as f:
+    for line in f:
+        key, _, rest = line.partition(":")
+        if key in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+            mem[key] = int(rest.split()[0])
+print(json.dumps({{"load_s": load_s, **mem}}), flush=True)
+'''
+
+
+def run_workers(mode, n_workers):
+    code = WORKER.format(base=BASE_DIR, mode=mode)
+    procs = [subprocess.Popen([sys.executable, "-c", code], stdin=subprocess.PIPE,
+                              stdout=subprocess.PIPE, text=True)
+             for _ in range(n_workers)]
+    for p in procs:
+        assert p.stdout.readline().strip() == "ready"
+    results = []
+    for p in procs:
+        p.stdin.write("\n")
+        p.stdin.flush()
+        results.append(json.loads(p.stdout.readline()))
+        p.wait()
+    return results
+
+
+def summarize(mode, results):
+    n = len(results)
+    avg = lambda k: sum(r[k] for r in results) / n
+    private = avg("Private_Clean") + avg("Private_Dirty")
+    print(f"{mode:<10}{avg('load_s') * 1000:>14.0f}{avg('Rss') / 1024:>12.1f}"
+          f"{avg('Pss') / 1024:>12.1f}{private / 1024:>14.1f}")
+
+
+def run_benchmark(n_workers=4):
+    compiled_manifest = os.path.join(BASE_DIR, "models", "compiled", "manifest.json")
+    if not os.path.exists(compiled_manifest):
+        print("models/compiled missing; run `python -m ml.artifacts` first")
+        return
+    print(f"{n_workers} concurrent cold workers per format (memory in MiB)")
+    print(f"{'format':<10}{'cold start ms':>14}{'RSS':>12}{'PSS':>12}{'private':>14}")
+    for mode in ("pickle", "compiled"):
+        summarize(mode, run_workers(mode, n_workers))
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,139 @@
+"""Coalescing and admission control for /chat/stream, against the fake LLM server.
+
+Runs the real Flask app (mongomock) with a small upstream budget and sends:
+
+- hot property: many users ask the same question about the same listing at
+  once (answer cache off), with coalescing on and then off; reports upstream
+  requests opened, 429s, time to first token and whether every subscriber
+  got the full answer
+- distinct burst: more different questions than the shared bucket holds;
+  some start at once, some wait in the queue, the rest get 429 quickly
+- one user: repeated questions past the per-user bucket
+
+Exits 1 when the coalesced hot-property burst opens more than one upstream
+stream or rejects anyone, when any admitted stream ends in [ERROR], or when
+a 429 takes longer than REJECT_BUDGET_MS.
+"""
+import os
+import sys
+import time
+import threading
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from benchmarks.fake_llm_server import start_fake_server
+
+LIMITS = {'CHAT_RATE_PER_MIN': '300', 'CHAT_RATE_BURST': '8', 'CHAT_USER_RATE_PER_MIN': '30',
+          'CHAT_USER_BURST': '3', 'CHAT_QUEUE_MAX': '6', 'CHAT_QUEUE_TIMEOUT': '1'}
+ML = {'city': 'Pune', 'locality': 'Kothrud', 'bhk': 2, 'area': 950, 'furnishing': 'Furnished',
+      'fair_rent': 25000, 'fair_rent_low': 23000, 'fair_rent_high': 27000}
+REJECT_BUDGET_MS = 50
+HOT_USERS = 32
+
+
+def chat(app, user_id, question, results, lock):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+    t0 = time.perf_counter()
+    response = client.post('/chat/stream', json={'ml_data': ML, 'user_question': question,
+                                                 'no_cache': True}, buffered=False)
+    first, events = None, []
+    if response.status_code == 200:
+        for chunk in response.response:
+            if first is None:
+                first = time.perf_counter() - t0
+            events.append(chunk.decode() if isinstance(chunk, bytes) else chunk)
+    response.close()   # as a WSGI server would; releases the admission
+    body = ''.join(events)
+    with lock:
+        results.append({'status': response.status_code, 'seconds': time.perf_counter() - t0,
+                        'ttft': first, 'error': '[ERROR]' in body,
+                        'text': ''.join(line[6:] for line in body.split('\n\n')
+                                        if line.startswith('data: ') and line[6:] != '[DONE]')})
+
+
+def burst(app, requests):
+    results, lock = [], threading.Lock()
+    threads = [threading.Thread(target=chat, args=(app, user, q, results, lock)) for user, q in requests]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def report(label, results, upstream):
+    ok       = [r for r in results if r['status'] == 200]
+    rejected = [r for r in results if r['status'] == 429]
+    ttft = np.array([r['ttft'] for r in ok if r['ttft'] is not None]) * 1000
+    reject_ms = np.array([r['seconds'] for r in rejected]) * 1000
+    print(f"{label:<22}{len(results):>5}{len(ok):>6}{len(rejected):>6}{upstream:>10}"
+          + (f"{np.percentile(ttft, 50):>10.0f}{np.percentile(ttft, 99):>10.0f}" if len(ttft) else f"{'-':>10}{'-':>10}")
+          + (f"{reject_ms.max():>12.1f}" if len(reject_ms) else f"{'-':>12}"))
+    return ok, rejected, reject_ms
+
+
+def run_benchmark():
+    server, state, url = start_fake_server(tokens=30, first_token_delay=0.2, token_delay=0.01)
+    os.environ['LLM_BASE_URL'] = url
+    os.environ.setdefault('MODEL_WATCH_INTERVAL', '0')
+    for name, value in LIMITS.items():
+        os.environ.setdefault(name, value)
+    from benchmarks import loadtest_app
+    from Ai import apiCall
+    from serving.admission import AdmissionController
+    flask_app = loadtest_app.flask_app
+    app = loadtest_app.app
+
+    def fresh_limits():
+        flask_app.chat_admission = AdmissionController.from_env()
+
+    burst(app, [('warm-up', 'Warm-up?')])   # model, comparables index, fake server connection
+    print(f"limits: {', '.join(f'{k}={os.environ[k]}' for k in LIMITS)}")
+    print(f"{'scenario':<22}{'sent':>5}{'200':>6}{'429':>6}{'upstream':>10}"
+          f"{'TTFT p50':>10}{'TTFT p99':>10}{'429 max ms':>12}")
+    ok = True
+    hot = [(f'user-{i}', 'Is this rent fair?') for i in range(HOT_USERS)]
+    for coalesce in (True, False):
+        fresh_limits()
+        apiCall.LLM_COALESCE = coalesce
+        before = state.requests
+        results = burst(app, hot)
+        admitted, rejected, reject_ms = report(f"hot, coalesce {'on' if coalesce else 'off'}",
+                                               results, state.requests - before)
+        complete = len({r['text'] for r in admitted}) == 1 and not any(r['error'] for r in admitted)
+        if coalesce:
+            shared = flask_app.chat_admission.stats()['shared']
+            ok &= state.requests - before == 1 and not rejected and complete
+            if not complete:
+                print("  subscribers did not all receive the same complete answer")
+        ok &= not any(r['error'] for r in admitted) and (not len(reject_ms) or reject_ms.max() <= REJECT_BUDGET_MS)
+    apiCall.LLM_COALESCE = True
+
+    fresh_limits()
+    before = state.requests
+    results = burst(app, [(f'user-{i}', f'Question {i}?') for i in range(40)])
+    admitted, rejected, reject_ms = report("distinct burst", results, state.requests - before)
+    queued = flask_app.chat_admission.stats()['queued']
+    ok &= not any(r['error'] for r in admitted) and (not len(reject_ms) or reject_ms.max() <= REJECT_BUDGET_MS)
+
+    fresh_limits()
+    before = state.requests
+    results = burst(app, [('one-user', f'Follow-up {i}?') for i in range(10)])
+    admitted, rejected, reject_ms = report("one user", results, state.requests - before)
+    ok &= not any(r['error'] for r in admitted) and (not len(reject_ms) or reject_ms.max() <= REJECT_BUDGET_MS)
+
+    print(f"hot burst: {shared} of {HOT_USERS} requests joined an admitted flight free of the global bucket")
+    print(f"distinct burst: {queued} waited in the admission queue; upstream peak {state.peak}")
+    print(f"admission: {flask_app.chat_admission.stats()}")
+    server.shutdown()
+    if not ok:
+        print("coalescing/admission check failed")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_benchmark() else 1)
@@ -0,0 +1,86 @@
+"""Full chat-history replay vs the token-budgeted window + rolling summary.
+
+Plays the same long conversation both ways against the fake LLM server (with
+a prefill cost per prompt token) and reports prompt tokens and time to first
+token per turn. Needs `mongomock` for the history collection.
+"""
+import os
+import sys
+import time
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from benchmarks.fake_llm_server import start_fake_server
+
+PROPERTY = dict(bhk=2, locality='Kothrud', city='Pune', area=950, furnishing='Furnished',
+                predicted_rent=25000)
+
+
+def ask(apiCall, history, question):
+    t0 = time.perf_counter()
+    tokens = apiCall.stream_real_estate_advice(**PROPERTY, user_question=question,
+                                               chat_history=history, use_cache=False)
+    first = next(tokens)
+    ttft = time.perf_counter() - t0
+    return first + "".join(tokens), ttft
+
+
+def play(apiCall, state, n_turns, history_fn, record_fn):
+    prompt_tokens, ttfts = [], []
+    for turn in range(n_turns):
+        question = f"Follow-up question {turn}: how does this compare with nearby localities?"
+        before = state.prompt_tokens
+        answer, ttft = ask(apiCall, history_fn(), question)
+        prompt_tokens.append(state.prompt_tokens - before)
+        ttfts.append(ttft * 1000)
+        record_fn(question, answer)
+    return np.array(prompt_tokens), np.array(ttfts)
+
+
+def run_benchmark(n_turns=30):
+    import mongomock
+    server, state, url = start_fake_server(tokens=150, first_token_delay=0.05, token_delay=0.0,
+                                           text="rent-analysis", prefill_per_1k=0.2)
+    os.environ['LLM_BASE_URL'] = url
+    os.environ.setdefault('GEMINI_API_KEY', 'fake')
+    from Ai import apiCall
+    from Ai.chat_history import ChatHistoryStore
+
+    # Legacy: the client round-trips every turn as "user: / ai:" lines.
+    transcript = []
+    full_tokens, full_ttft = play(
+        apiCall, state, n_turns,
+        lambda: "\n".join(transcript),
+        lambda q, a: transcript.extend([f"user: {q}", f"ai: {a}"]))
+
+    store = ChatHistoryStore.from_env(mongomock.MongoClient().db.chat_sessions,
+                                      summarize_fn=apiCall.summarize_conversation)
+    context = ChatHistoryStore.context(PROPERTY)
+    usage = {}
+
+    def window():
+        messages, u = store.window(store.load('bench', 'bench', context))
+        usage.update(u)
+        return messages
+
+    def record(question, answer):
+        store.append('bench', 'bench', context, question, answer)
+        store.record(usage, None)
+        store.compact('bench', 'bench')   # synchronous here; the app runs it in the background
+
+    budget_tokens, budget_ttft = play(apiCall, state, n_turns, window, record)
+
+    print(f"{n_turns}-turn conversation, budget {store.token_budget} tokens")
+    print(f"{'mode':<12}{'prompt tok (last)':>18}{'prompt tok (sum)':>18}"
+          f"{'TTFT p50 (ms)':>15}{'TTFT last (ms)':>16}")
+    for name, toks, ttft in (('full', full_tokens, full_ttft), ('budgeted', budget_tokens, budget_ttft)):
+        print(f"{name:<12}{toks[-1]:>18,}{toks.sum():>18,}{np.median(ttft):>15.0f}{ttft[-1]:>16.0f}")
+    print(f"Prompt tokens saved: {1 - budget_tokens.sum() / full_tokens.sum():.0%}")
+    print(f"Store stats: {store.stats()}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,83 @@
+"""Comparables index build time and query latency at 1x, 10x and 100x the data.
+
+Larger datasets are synthesized from the cleaned listings by jittering
+coordinates (~300 m), area and rent, so density per locality grows the way
+it would with more scraped listings. The brute-force baseline scans every
+listing of the same city and BHK with NumPy; "agree" compares the two result
+sets by (distance, area, furnishing), since listings sharing a position tie.
+"""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from ml.comparables import ComparablesIndex, LISTING_COLUMNS, AREA_WEIGHT_KM, FURNISHING_PENALTY_KM
+
+
+def load_listings():
+    path = os.path.join(BASE_DIR, 'data', 'processed', 'cleaned_rent_data.csv')
+    return pd.read_csv(path, usecols=LISTING_COLUMNS).dropna(subset=['Latitude', 'Longitude'])
+
+
+def scale(df, factor, seed=0):
+    if factor == 1:
+        return df
+    rng = np.random.default_rng(seed)
+    big = pd.concat([df] * factor, ignore_index=True)
+    n = len(big)
+    big['Latitude']  += rng.normal(0, 0.003, n)
+    big['Longitude'] += rng.normal(0, 0.003, n)
+    big['Area'] = np.maximum(150, big['Area'] * rng.uniform(0.85, 1.15, n)).round()
+    big['Rent'] = (big['Rent'] * rng.uniform(0.9, 1.1, n)).round(-2)
+    return big
+
+
+def brute_force(index, rows, area, furnishing, x, y, k):
+    d2 = ((index.x[rows] - x) ** 2 + (index.y[rows] - y) ** 2
+          + (AREA_WEIGHT_KM * (np.log(index.area[rows]) - np.log(area))) ** 2
+          + (index.furnishing[rows] != furnishing) * FURNISHING_PENALTY_KM ** 2)
+    return rows[np.argsort(d2, kind='stable')[:k]]
+
+
+def run_benchmark(factors=(1, 10, 100), n_queries=2000, k=5):
+    base = load_listings()
+    queries = base.sample(n=n_queries, replace=True, random_state=1)
+    queries = list(zip(queries['city'], queries['Locality'], queries['BHK'].astype(int),
+                       queries['Area'].astype(float), queries['Furnishing']))
+
+    print(f"{'rows':>10}{'build (s)':>11}{'kd p50 (ms)':>13}{'kd p99 (ms)':>13}"
+          f"{'scan p50 (ms)':>15}{'scan p99 (ms)':>15}{'agree':>8}")
+    for factor in factors:
+        listings = scale(base, factor)
+        t0 = time.perf_counter()
+        index = ComparablesIndex(listings)
+        build = time.perf_counter() - t0
+        split = pd.DataFrame({'city': index.city, 'bhk': index.bhk}).groupby(['city', 'bhk']).indices
+
+        kd, scan, agree = [], [], 0
+        for city, locality, bhk, area, furnishing in queries:
+            t0 = time.perf_counter()
+            found = index.comparables(city, bhk, area, furnishing, locality=locality, k=k)
+            kd.append(time.perf_counter() - t0)
+
+            x, y = index.center(city, locality)
+            t0 = time.perf_counter()
+            rows = brute_force(index, split[(city, bhk)], area, furnishing, x, y, k)
+            scan.append(time.perf_counter() - t0)
+            expected = [(round(float(np.hypot(index.x[i] - x, index.y[i] - y)), 2), float(index.area[i]),
+                         index.furnishing[i]) for i in rows]
+            agree += sorted(expected) == sorted((r['distance_km'], r['area'], r['furnishing'])
+                                                for r in found)
+
+        kd, scan = np.array(kd) * 1000, np.array(scan) * 1000
+        print(f"{index.size:>10,}{build:>11.2f}{np.percentile(kd, 50):>13.3f}{np.percentile(kd, 99):>13.3f}"
+              f"{np.percentile(scan, 50):>15.3f}{np.percentile(scan, 99):>15.3f}"
+              f"{agree / len(queries):>8.1%}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
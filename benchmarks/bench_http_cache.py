@@ -0,0 +1,126 @@
+"""Bytes on the wire and time to first render for a dashboard visit.
+
+A visit is what the page fetches before it can be used: the dashboard HTML,
+the first city's locality list (the form cannot be filled without it) and
+the first /history page. Each is requested from the real app (mongomock,
+seeded benchmark user) the way a browser would:
+
+- identity: no Accept-Encoding, no HTTP cache (the behaviour before
+  serving/http_cache.py)
+- first visit: compressed, empty cache
+- repeat visit: ETags replayed as If-None-Match, and URLs cached as
+  immutable (`/localities?...&v=<model version>`) not requested at all
+
+Time to first render is server time plus LINK_RTT_MS and the transfer time
+at LINK_MBPS for the dashboard and the locality list, fetched one after the
+other as the page does. Exits 1 when a first visit sends more than
+MAX_COMPRESSED_SHARE of the identity bytes, or a repeat visit transfers any
+body.
+"""
+import os
+import sys
+import time
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+LINK_MBPS = 1.6        # "Fast 3G"
+LINK_RTT_MS = 150
+MAX_COMPRESSED_SHARE = 0.35
+RUNS = 20
+
+
+def header_bytes(response):
+    return sum(len(k) + len(v) + 4 for k, v in response.headers.items()) + len('HTTP/1.1 200 OK\r\n\r\n')
+
+
+class Browser:
+    """Test client plus the slice of an HTTP cache the benchmark needs."""
+
+    def __init__(self, client, accept_encoding=None, cache=False):
+        self.client  = client
+        self.headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+        self.cache   = {} if cache else None   # url -> (etag, immutable)
+
+    def get(self, url):
+        """(body bytes, header bytes, server seconds, status); status None when served from cache."""
+        cached = self.cache.get(url) if self.cache is not None else None
+        if cached and cached[1]:
+            return 0, 0, 0.0, None
+        headers = dict(self.headers)
+        if cached:
+            headers['If-None-Match'] = cached[0]
+        t0 = time.perf_counter()
+        response = self.client.get(url, headers=headers)
+        elapsed = time.perf_counter() - t0
+        assert response.status_code in (200, 304), (url, response.status_code)
+        if self.cache is not None and response.headers.get('ETag'):
+            self.cache[url] = (response.headers['ETag'],
+                               'immutable' in response.headers.get('Cache-Control', ''))
+        return len(response.data), header_bytes(response), elapsed, response.status_code
+
+
+def link_ms(nbytes):
+    return LINK_RTT_MS + nbytes * 8 / (LINK_MBPS * 1e6) * 1000
+
+
+def visit(browser, urls):
+    results = [browser.get(url) for url in urls]
+    render = sum(s * 1000 + (link_ms(b + h) if status else 0)
+                 for b, h, s, status in results[:2])
+    return results, render
+
+
+def run_benchmark(runs=RUNS):
+    os.environ.setdefault('MODEL_WATCH_INTERVAL', '0')
+    from benchmarks import loadtest_app
+    flask_app = loadtest_app.flask_app
+
+    client = loadtest_app.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = loadtest_app.seed(loadtest_app.db)
+        sess['user_name'] = 'Load Test'
+    bundle = flask_app.model_registry.current
+    city   = next(iter(bundle.locality_map))
+    urls   = ['/dashboard', f'/localities?city={city}&v={bundle.version}', '/history']
+    accept = 'br, gzip' if flask_app.compressor.stats()['brotli'] else 'gzip'
+
+    scenarios = {}
+    for label, make in (('identity', lambda: Browser(client)),
+                        ('first visit', lambda: Browser(client, accept)),
+                        ('repeat visit', None)):
+        renders, last = [], None
+        for _ in range(runs):
+            if make is None:
+                browser = Browser(client, accept, cache=True)
+                visit(browser, urls)   # fills the cache; the measured visit is the next one
+            else:
+                browser = make()
+            last, render = visit(browser, urls)
+            renders.append(render)
+        scenarios[label] = (last, float(np.median(renders)))
+
+    print(f"city {city}, model {bundle.version}, link {LINK_MBPS} Mbps / {LINK_RTT_MS} ms RTT")
+    print(f"{'':<14}" + ''.join(f"{u.split('?')[0]:>14}" for u in urls)
+          + f"{'total bytes':>14}{'first render':>14}")
+    for label, (results, render) in scenarios.items():
+        cells = ''.join(f"{'cached' if st is None else f'{b + h:,} ({st})':>14}"
+                        for b, h, _, st in results)
+        total = sum(b + h for b, h, _, _ in results)
+        print(f"{label:<14}{cells}{total:>14,}{render:>12.0f}ms")
+
+    identity = sum(b + h for b, h, _, _ in scenarios['identity'][0])
+    first    = sum(b + h for b, h, _, _ in scenarios['first visit'][0])
+    repeat_bodies = sum(b for b, _, _, _ in scenarios['repeat visit'][0])
+    print(f"first visit sends {first / identity:.0%} of the identity bytes; "
+          f"repeat visit bodies: {repeat_bodies} bytes")
+    ok = first <= MAX_COMPRESSED_SHARE * identity and repeat_bodies == 0
+    if not ok:
+        print(f"over budget: first visit must stay within {MAX_COMPRESSED_SHARE:.0%} "
+              f"of identity and a repeat visit must not transfer bodies")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_benchmark() else 1)
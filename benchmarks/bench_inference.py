@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+import pickle
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from ml.inference import RentPredictor
+
+
+def load_artifacts():
+    with open(os.path.join(BASE_DIR, 'models', 'rent_model_artifacts.pkl'), 'rb') as f:
+        return pickle.load(f)
+
+
+def pandas_run_model(artifacts, city, locality, bhk, area, furnishing):
+    """The original DataFrame-based `_run_model` body, kept as the baseline."""
+    feature_columns = artifacts['feature_columns']
+    loc_val  = float(artifacts['locality_value_map'].get(locality, artifacts['global_mean_rent']))
+    input_df = pd.DataFrame(0.0, index=[0], columns=feature_columns)
+    input_df.at[0, 'BHK']            = bhk
+    input_df.at[0, 'Area']           = area
+    input_df.at[0, 'Locality_Value'] = loc_val
+    if f"city_{city}" in feature_columns:
+        input_df.at[0, f"city_{city}"] = 1
+    if f"Furnishing_{furnishing}" in feature_columns:
+        input_df.at[0, f"Furnishing_{furnishing}"] = 1
+    return artifacts['model'].predict(input_df)[0]
+
+
+def sample_inputs(n):
+    df = pd.read_csv(os.path.join(BASE_DIR, 'data', 'processed', 'cleaned_rent_data.csv'))
+    df = df.sample(n=min(n, len(df)), random_state=0)
+    return list(zip(df['city'], df['Locality'], df['BHK'].astype(int),
+                    df['Area'].astype(float), df['Furnishing']))
+
+
+def check_identical(artifacts, predictor, inputs):
+    expected = np.array([pandas_run_model(artifacts, *row) for row in inputs])
+    single   = np.array([predictor.predict_log(*row) for row in inputs])
+    matrix   = np.array([predictor.features(*row).copy() for row in inputs])
+    batch    = predictor.forest.predict(matrix)[:, 0]
+    sk_batch = artifacts['model'].predict(pd.DataFrame(matrix, columns=artifacts['feature_columns']))
+    assert np.array_equal(expected, single), "single-row predictions differ from sklearn"
+    assert np.array_equal(sk_batch, batch), "batch predictions differ from sklearn"
+    print(f"Bit-identical on {len(inputs)} rows (single and batch)")
+
+
+def time_calls(fn, inputs, repeat):
+    samples = []
+    for _ in range(repeat):
+        for row in inputs:
+            t0 = time.perf_counter()
+            fn(*row)
+            samples.append(time.perf_counter() - t0)
+    samples = np.array(samples) * 1e6
+    return np.percentile(samples, 50), np.percentile(samples, 99)
+
+
+def run_benchmark(n_inputs=500, repeat=5):
+    artifacts = load_artifacts()
+    predictor = RentPredictor.from_model(artifacts['model'], artifacts['feature_columns'],
+                                         artifacts['locality_value_map'], artifacts['global_mean_rent'])
+    inputs = sample_inputs(n_inputs)
+    check_identical(artifacts, predictor, inputs)
+
+    base_p50, base_p99 = time_calls(lambda *r: pandas_run_model(artifacts, *r), inputs, repeat)
+    fast_p50, fast_p99 = time_calls(predictor.predict_log, inputs, repeat)
+
+    print(f"{'path':<12}{'p50 (us)':>12}{'p99 (us)':>12}")
+    print(f"{'pandas':<12}{base_p50:>12.1f}{base_p99:>12.1f}")
+    print(f"{'compiled':<12}{fast_p50:>12.1f}{fast_p99:>12.1f}")
+    print(f"Speed-up: p50 {base_p50 / fast_p50:.1f}x, p99 {base_p99 / fast_p99:.1f}x")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,103 @@
+"""Exercises the pooled LLM stream against the fake server.
+
+Reports time-to-first-token under concurrency, checks that upstream
+concurrency never exceeds LLM_MAX_STREAMS, that an abandoned stream is
+cancelled upstream, that a stalled upstream trips the first-token timeout and
+how fast a cached answer replays.
+"""
+import os
+import sys
+import time
+import threading
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from benchmarks.fake_llm_server import start_fake_server
+
+ADVICE_ARGS = dict(bhk=2, locality='Kothrud', city='Pune', area=950, furnishing='Furnished',
+                   predicted_rent=25000, user_question='Is this fair?', use_cache=False)
+
+
+def run_concurrent(stream_fn, n_clients):
+    ttft, errors = [], []
+    lock = threading.Lock()
+
+    def client(i):
+        t0 = time.perf_counter()
+        first = None
+        try:
+            # distinct questions: identical in-flight prompts would share one stream
+            for _ in stream_fn(**{**ADVICE_ARGS, 'user_question': f"Is this fair? ({i})"}):
+                if first is None:
+                    first = time.perf_counter() - t0
+        except Exception as e:
+            with lock:
+                errors.append(type(e).__name__)
+            return
+        with lock:
+            ttft.append(first)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(n_clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return np.array(ttft) * 1000, errors, time.perf_counter() - start
+
+
+def run_benchmark(n_clients=64):
+    server, state, url = start_fake_server(tokens=30, first_token_delay=0.1, token_delay=0.01)
+    os.environ['LLM_BASE_URL'] = url
+    os.environ.setdefault('GEMINI_API_KEY', 'fake')
+    from Ai import apiCall
+
+    ttft, errors, elapsed = run_concurrent(apiCall.stream_real_estate_advice, n_clients)
+    print(f"{n_clients} concurrent streams in {elapsed:.2f}s "
+          f"(max {apiCall.LLM_MAX_STREAMS} upstream, {len(errors)} errors {sorted(set(errors))})")
+    print(f"TTFT p50 {np.percentile(ttft, 50):.0f} ms, p99 {np.percentile(ttft, 99):.0f} ms")
+    print(f"Upstream peak concurrency: {state.peak}")
+    assert state.peak <= apiCall.LLM_MAX_STREAMS, "stream cap exceeded"
+
+    # Abandon a stream after a few tokens: the upstream request must be torn down.
+    aborted_before = state.aborted
+    tokens = apiCall.stream_real_estate_advice(**ADVICE_ARGS)
+    for i, _ in enumerate(tokens):
+        if i == 2:
+            break
+    tokens.close()
+    deadline = time.time() + 2
+    while state.aborted == aborted_before and time.time() < deadline:
+        time.sleep(0.05)
+    print(f"Abandoned stream cancelled upstream: {state.aborted > aborted_before}")
+
+    # A stalled upstream trips the first-token deadline.
+    state.first_token_delay = apiCall.LLM_FIRST_TOKEN_TIMEOUT + 1
+    t0 = time.perf_counter()
+    try:
+        list(apiCall.stream_real_estate_advice(**ADVICE_ARGS))
+        print("First-token timeout: not raised")
+    except apiCall.AdvisorTimeoutError as e:
+        print(f"First-token timeout raised after {time.perf_counter() - t0:.2f}s: {e}")
+    # Identical first questions: one upstream call, the rest replay from the advice cache.
+    state.first_token_delay = 0.1
+    cached_args = {**ADVICE_ARGS, 'use_cache': True, 'user_question': 'Full report'}
+    requests_before = state.requests
+    samples = []
+    for _ in range(20):
+        t0 = time.perf_counter()
+        tokens = apiCall.stream_real_estate_advice(**cached_args)
+        next(tokens)
+        samples.append((time.perf_counter() - t0) * 1000)
+        list(tokens)
+    print(f"Advice cache: miss TTFT {samples[0]:.0f} ms, hit TTFT {np.median(samples[1:]):.2f} ms, "
+          f"{state.requests - requests_before} upstream call(s) for 20 requests")
+    print(f"Pool stats: {apiCall.stream_stats()}")
+    print(f"Advice cache stats: {apiCall.advice_cache.stats()}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,173 @@
+"""Per-worker memory and lookup latency: locality dicts vs the mmap'd LocalityTable.
+
+"dict" is what every worker used to hold: the pickle's locality -> mean-rent
+dict plus the parsed locality_mapping.json. "table" is ml.localities over
+`.npy` files opened with mmap_mode='r', with its per-worker memo of
+LOCALITY_CACHE_SIZE names; "probe" is the table with the memo off. Memory is the smaps_rollup delta
+between just before loading and after every locality has been looked up
+(and every city's list read),
+sampled once N_WORKERS concurrent workers are alive (so shared pages split
+fairly), for the real tables and a synthetic SYNTHETIC_LOCALITIES one.
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import tempfile
+import subprocess
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from ml.localities import LocalityTable, LOCALITY_ARRAYS
+
+N_WORKERS = 4
+SYNTHETIC_LOCALITIES = 200_000
+SYNTHETIC_CITIES = 40
+
+WORKER = r'''
+import os, sys, json, pickle
+sys.path.insert(0, {base!r})
+import numpy as np
+from ml.localities import LocalityTable, LOCALITY_ARRAYS
+
+def memory():
+    mem = {{}}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                mem[key] = int(rest.split()[0])
+    mem["Private"] = mem.pop("Private_Clean") + mem.pop("Private_Dirty")
+    return mem
+
+with open(os.path.join({data!r}, "names.json")) as f:
+    names = json.load(f)   # the probe list itself is not counted
+before = memory()
+if {mode!r} == "dict":
+    with open(os.path.join({data!r}, "values.pkl"), "rb") as f:
+        values = pickle.load(f)
+    with open(os.path.join({data!r}, "locality_mapping.json")) as f:
+        city_map = json.load(f)
+    total = sum(values.get(n, 0.0) for n in names) + sum(len(v) for v in city_map.values())
+else:
+    table = LocalityTable({{name: np.load(os.path.join({data!r}, name + ".npy"), mmap_mode="r")
+                           for name in LOCALITY_ARRAYS}})
+    total = sum(table.value(n, 0.0) for n in names) + sum(len(v) for v in table.city_map.values())
+print("ready", flush=True)
+sys.stdin.readline()
+after = memory()
+print(json.dumps({{k: after[k] - before[k] for k in after}}), flush=True)
+'''
+
+
+def write_dataset(data_dir, values, city_map, value_dtype):
+    with open(os.path.join(data_dir, 'values.pkl'), 'wb') as f:
+        pickle.dump(values, f)
+    with open(os.path.join(data_dir, 'locality_mapping.json'), 'w') as f:
+        json.dump(city_map, f)
+    with open(os.path.join(data_dir, 'names.json'), 'w') as f:
+        json.dump(list(values), f)
+    arrays = LocalityTable.build_arrays(values, city_map, value_dtype)
+    for name in LOCALITY_ARRAYS:
+        np.save(os.path.join(data_dir, f'{name}.npy'), arrays[name])
+    return sum(arr.nbytes for arr in arrays.values())
+
+
+def synthetic(n, n_cities, seed=0):
+    rng = np.random.default_rng(seed)
+    cities = [f'City {i}' for i in range(n_cities)]
+    values, city_map = {}, {c: [] for c in cities}
+    for i in range(n):
+        name = f'Sector {i} {"ABCDEFGHJK"[i % 10]} Block Extension'
+        values[name] = float(rng.uniform(5_000, 200_000))
+        city_map[cities[i % n_cities]].append(name)
+    return values, {c: sorted(v) for c, v in city_map.items()}
+
+
+def run_workers(mode, data_dir, n_workers):
+    code = WORKER.format(base=BASE_DIR, data=data_dir, mode=mode)
+    procs = [subprocess.Popen([sys.executable, '-c', code], stdin=subprocess.PIPE,
+                              stdout=subprocess.PIPE, text=True)
+             for _ in range(n_workers)]
+    for p in procs:
+        assert p.stdout.readline().strip() == 'ready'
+    results = []
+    for p in procs:
+        p.stdin.write('\n')
+        p.stdin.flush()
+        results.append(json.loads(p.stdout.readline()))
+        p.wait()
+    return {k: sum(r[k] for r in results) / len(results) for k in results[0]}
+
+
+def time_lookups(fn, names, repeat=5):
+    samples = []
+    for _ in range(repeat):
+        for name in names:
+            t0 = time.perf_counter()
+            fn(name)
+            samples.append(time.perf_counter() - t0)
+    samples = np.array(samples) * 1e9
+    return np.percentile(samples, 50), np.percentile(samples, 99)
+
+
+def latency(values, city_map, n_probes=20_000, batch_rows=100_000):
+    arrays  = LocalityTable.build_arrays(values, city_map, np.float32)
+    table   = LocalityTable(arrays)
+    probe   = LocalityTable(arrays, cache_size=0)
+    default = float(np.mean(list(values.values())))
+    rng   = np.random.default_rng(1)
+    known = list(values)
+    # 90% hits, 10% misses, like free-text localities from the dashboard
+    probes = [known[i] for i in rng.integers(0, len(known), n_probes)]
+    probes[::10] = [f'Unknown {i}' for i in range(len(probes[::10]))]
+
+    single = {
+        'dict':  time_lookups(lambda n: float(values.get(n, default)), probes),
+        'table': time_lookups(lambda n: table.value(n, default), probes),
+        'probe': time_lookups(lambda n: probe.value(n, default), probes),
+    }
+    batch = [probes[i] for i in rng.integers(0, len(probes), batch_rows)]
+    timings = {}
+    for mode, fn in (('dict', lambda: np.array([values.get(n, default) for n in batch],
+                                               dtype=np.float64)),
+                     ('table', lambda: table.values(batch, default)),
+                     ('probe', lambda: probe.values(batch, default))):
+        t0 = time.perf_counter()
+        fn()
+        timings[mode] = time.perf_counter() - t0
+    return single, timings
+
+
+def run_benchmark(n_workers=N_WORKERS):
+    with open(os.path.join(BASE_DIR, 'models', 'rent_model_artifacts.pkl'), 'rb') as f:
+        real_values = pickle.load(f)['locality_value_map']
+    with open(os.path.join(BASE_DIR, 'models', 'locality_mapping.json')) as f:
+        real_map = json.load(f)
+    datasets = [('real', real_values, real_map),
+                ('synthetic', *synthetic(SYNTHETIC_LOCALITIES, SYNTHETIC_CITIES))]
+
+    print(f"{n_workers} concurrent workers; memory added by the lookup structures (KiB)")
+    print(f"{'dataset':<11}{'localities':>11}{'mode':>7}{'RSS':>10}{'PSS':>10}{'private':>10}{'on disk':>10}")
+    for label, values, city_map in datasets:
+        with tempfile.TemporaryDirectory() as data_dir:
+            disk = write_dataset(data_dir, values, city_map, np.float32)
+            for mode in ('dict', 'table'):
+                mem = run_workers(mode, data_dir, n_workers)
+                on_disk = f"{disk / 1024:>10.0f}" if mode == 'table' else f"{'':>10}"
+                print(f"{label:<11}{len(values):>11,}{mode:>7}{mem['Rss']:>10.0f}{mem['Pss']:>10.0f}"
+                      f"{mem['Private']:>10.0f}{on_disk}")
+
+    print(f"\n{'dataset':<11}{'mode':>7}{'p50 (ns)':>10}{'p99 (ns)':>10}{'batch 100k (ms)':>17}")
+    for label, values, city_map in datasets:
+        single, batch = latency(values, city_map)
+        for mode in ('dict', 'table', 'probe'):
+            p50, p99 = single[mode]
+            print(f"{label:<11}{mode:>7}{p50:>10.0f}{p99:>10.0f}{batch[mode] * 1000:>17.1f}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
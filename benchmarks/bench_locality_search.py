@@ -0,0 +1,89 @@
+"""Typeahead and /predict resolution latency of ml.locality_search.
+
+Queries are drawn from the model's own localities: 1-6 character prefixes
+(what a typeahead sends while typing), and full names with one character
+dropped or swapped (misspellings the resolver has to catch). Reports p50/p99
+per operation, the share of misspellings resolved back to their source and
+the share resolved to a different locality, and exits 1 when any p99
+exceeds P99_BUDGET_MS or more than MAX_WRONG of the misspellings resolve to
+another locality (a confident price for a place the user did not ask about).
+"""
+import os
+import sys
+import json
+import time
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from ml.locality_search import LocalityIndex, normalize_locality
+
+P99_BUDGET_MS = 1.0
+MAX_WRONG = 0.005
+N_QUERIES = 5_000
+
+
+def misspell(name, rng):
+    chars = list(name)
+    i = int(rng.integers(1, max(2, len(chars) - 1)))
+    if rng.random() < 0.5:
+        del chars[i]
+    elif i + 1 < len(chars):
+        chars[i], chars[i + 1] = chars[i + 1], chars[i]
+    return ''.join(chars)
+
+
+def timed(fn, args):
+    samples = []
+    for a in args:
+        t0 = time.perf_counter()
+        fn(*a)
+        samples.append(time.perf_counter() - t0)
+    samples = np.array(samples) * 1000
+    return np.percentile(samples, 50), np.percentile(samples, 99)
+
+
+def run_benchmark(n=N_QUERIES):
+    with open(os.path.join(BASE_DIR, 'models', 'locality_mapping.json')) as f:
+        locality_map = json.load(f)
+    index = LocalityIndex(locality_map)
+    rng   = np.random.default_rng(0)
+    pairs = [(city, name) for city, names in locality_map.items() for name in names if len(name) > 5]
+    picks = [pairs[i] for i in rng.integers(0, len(pairs), n)]
+
+    prefixes = [(c, name[:int(rng.integers(1, 7))], 10) for c, name in picks]
+    typos    = [(c, misspell(name, rng)) for c, name in picks]
+    exact    = [(c, name) for c, name in picks]
+    results = {
+        'search prefix':  timed(index.search, prefixes),
+        'resolve exact':  timed(index.resolve, exact),
+        'resolve typo':   timed(index.resolve, typos),
+    }
+    outcomes = []
+    for (c, typo), (_, name) in zip(typos, picks):
+        _, resolved, how = index.resolve(c, typo)
+        # a typo that is itself another locality's name is not the resolver's mistake
+        outcomes.append('unresolved' if how is None else
+                        'source' if normalize_locality(resolved) == normalize_locality(name) else
+                        'wrong' if how == 'fuzzy' else 'other name')
+    recovered = np.mean([o == 'source' for o in outcomes])
+    wrong     = np.mean([o == 'wrong' for o in outcomes])
+
+    print(f"{index.size} localities in {len(locality_map)} cities, index built in {index.build_ms:.1f} ms")
+    print(f"{'operation':<16}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+    ok = True
+    for label, (p50, p99) in results.items():
+        print(f"{label:<16}{p50:>10.4f}{p99:>10.4f}")
+        ok &= p99 <= P99_BUDGET_MS
+    print(f"misspellings resolved to their source: {recovered:.1%}, to another locality: {wrong:.2%}")
+    if not ok:
+        print(f"p99 over the {P99_BUDGET_MS} ms budget")
+    if wrong > MAX_WRONG:
+        print(f"more than {MAX_WRONG:.1%} of misspellings resolved to the wrong locality")
+        ok = False
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_benchmark() else 1)
@@ -0,0 +1,153 @@
+"""Cost of real prediction intervals: point model alone vs point + q10/q90.
+
+"point" is the old /predict path (one compiled model, fixed ±5% band);
+"fused" walks the point and both quantile models in one lock-step
+traversal of shared node arrays; "separate" walks three compiled forests
+one after the other; "sklearn" calls the three fitted models. Model timings
+include feature building and the rent conversion, as in `_score`. The
+/predict timings go through the Flask app (test client, mongomock, the
+prediction cache off, the prediction log's insert deferred) with the
+point-only and the fused bundle swapped in turn. Exits 1 when fused /predict p50 exceeds MAX_RATIO x the point p50.
+"""
+import os
+import sys
+import time
+import pickle
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from ml.inference import CompiledForest, RentPredictor
+
+MAX_RATIO = 1.5
+
+
+def load_artifacts():
+    with open(os.path.join(BASE_DIR, 'models', 'rent_model_artifacts.pkl'), 'rb') as f:
+        artifacts = pickle.load(f)
+    if not artifacts.get('band_models'):
+        sys.exit("The saved model has no band_models; retrain with src/model_training.py.")
+    return artifacts
+
+
+def sample_inputs(n):
+    df = pd.read_csv(os.path.join(BASE_DIR, 'data', 'processed', 'cleaned_rent_data.csv'))
+    df = df.sample(n=min(n, len(df)), random_state=0)
+    return list(zip(df['city'], df['Locality'], df['BHK'].astype(int),
+                    df['Area'].astype(float), df['Furnishing']))
+
+
+def time_calls(fn, inputs, repeat):
+    samples = []
+    for _ in range(repeat):
+        for row in inputs:
+            t0 = time.perf_counter()
+            fn(*row)
+            samples.append(time.perf_counter() - t0)
+    samples = np.array(samples) * 1e6
+    return np.percentile(samples, 50), np.percentile(samples, 99)
+
+
+def endpoint_timings(artifacts, inputs, repeat):
+    """/predict p50/p99 (us) per bundle, alternating bundles request by request."""
+    os.environ['PREDICTION_CACHE_SIZE'] = '0'
+    # The prediction log's periodic insert_many would land on whichever bundle
+    # happens to enqueue the 100th record; keep it out of the comparison.
+    os.environ['PREDICTION_LOG_BATCH_SIZE'] = '1000000'
+    os.environ['PREDICTION_LOG_FLUSH_INTERVAL'] = '3600'
+    os.environ.setdefault('MODEL_WATCH_INTERVAL', '0')
+    from benchmarks import loadtest_app
+
+    registry = loadtest_app.flask_app.model_registry
+    fused = registry.current
+    if not fused.predictor.has_band:
+        sys.exit("models/compiled/ has no band models; retrain with src/model_training.py.")
+    point = fused._replace(version=f'{fused.version}-point', predictor=RentPredictor.from_model(
+        artifacts['model'], artifacts['feature_columns'], artifacts['locality_value_map'],
+        artifacts['global_mean_rent']))
+
+    client = loadtest_app.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = loadtest_app.seed(loadtest_app.db)
+    bodies = [{'city': c, 'locality': l, 'bhk': int(b), 'area': a, 'furnishing': f}
+              for c, l, b, a, f in inputs]
+
+    samples = {'point': [], 'fused': []}
+    for _ in range(repeat):
+        for body in bodies:
+            for name, bundle in (('point', point), ('fused', fused)):
+                registry._activate(bundle, registry._fingerprint)
+                t0 = time.perf_counter()
+                response = client.post('/predict', json=body)
+                samples[name].append(time.perf_counter() - t0)
+                assert response.status_code == 200, response.get_data(as_text=True)
+    registry._activate(fused, registry._fingerprint)
+    return {name: (np.percentile(np.array(s) * 1e6, 50), np.percentile(np.array(s) * 1e6, 99))
+            for name, s in samples.items()}
+
+
+def run_benchmark(n_inputs=500, repeat=5, batch_rows=10_000):
+    artifacts = load_artifacts()
+    args = (artifacts['feature_columns'], artifacts['locality_value_map'], artifacts['global_mean_rent'])
+    point = RentPredictor.from_model(artifacts['model'], *args)
+    fused = RentPredictor.from_model(artifacts['model'], *args, artifacts['band_models'])
+    separate = [CompiledForest(m) for m in [artifacts['model']] + artifacts['band_models']]
+    models = [artifacts['model']] + artifacts['band_models']
+    inputs = sample_inputs(n_inputs)
+
+    def run_point(*row):
+        return point.rent_range(point.forest.predict_one(point.features(*row)))
+
+    def run_fused(*row):
+        return fused.rent_range(fused.forest.predict_one(fused.features(*row)))
+
+    def run_separate(*row):
+        vec = fused.features(*row)
+        return fused.rent_range(np.concatenate([f.predict_one(vec) for f in separate]))
+
+    def run_sklearn(*row):
+        X = pd.DataFrame([fused.features(*row)], columns=fused.feature_columns)
+        return fused.rent_range(np.array([m.predict(X)[0] for m in models]))
+
+    matrix = np.array([fused.features(*row).copy() for row in inputs])
+    frame    = pd.DataFrame(matrix, columns=fused.feature_columns)
+    expected = np.column_stack([m.predict(frame) for m in models])
+    assert np.array_equal(fused.forest.predict(matrix), expected), "fused batch differs from sklearn"
+    assert np.array_equal(np.array([fused.forest.predict_one(x) for x in matrix]), expected), \
+        "fused single-row differs from sklearn"
+    print(f"Fused forest: {fused.forest.n_outputs} outputs, {fused.forest.roots.size} trees, "
+          f"depth {fused.forest.depth}; bit-identical to sklearn on {len(inputs)} rows")
+
+    low, _, high = fused.rent_range(expected)
+    print(f"Median band width: {np.median((high - low) / np.expm1(expected[:, 0])):.1%} of the point estimate")
+
+    print(f"\n{'model':<12}{'p50 (us)':>12}{'p99 (us)':>12}{'vs point':>10}")
+    timings = {name: time_calls(fn, inputs, repeat)
+               for name, fn in (('point', run_point), ('fused', run_fused),
+                                ('separate', run_separate), ('sklearn', run_sklearn))}
+    for name, (p50, p99) in timings.items():
+        print(f"{name:<12}{p50:>12.1f}{p99:>12.1f}{p50 / timings['point'][0]:>9.2f}x")
+
+    big = matrix[np.random.default_rng(0).integers(0, len(matrix), batch_rows)]
+    print(f"\n{'batch':<12}{'rows/s':>12}")
+    for name, fn in (('point', point.forest.predict), ('fused', fused.forest.predict),
+                     ('separate', lambda X: [f.predict(X) for f in separate])):
+        t0 = time.perf_counter()
+        fn(big)
+        print(f"{name:<12}{batch_rows / (time.perf_counter() - t0):>12,.0f}")
+
+    endpoint = endpoint_timings(artifacts, inputs, repeat)
+    print(f"\n{'/predict':<12}{'p50 (us)':>12}{'p99 (us)':>12}{'vs point':>10}")
+    for name, (p50, p99) in endpoint.items():
+        print(f"{name:<12}{p50:>12.1f}{p99:>12.1f}{p50 / endpoint['point'][0]:>9.2f}x")
+
+    ratio = endpoint['fused'][0] / endpoint['point'][0]
+    verdict = "within" if ratio <= MAX_RATIO else "OVER"
+    print(f"\nFused /predict p50 is {ratio:.2f}x the point model's ({verdict} the {MAX_RATIO}x budget)")
+    return ratio <= MAX_RATIO
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_benchmark() else 1)
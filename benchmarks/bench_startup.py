@@ -0,0 +1,76 @@
+"""Import-time budget for the serving entry points.
+
+Imports each module in a fresh interpreter under `python -X importtime`,
+RUNS times, and keeps the fastest run (the first one also warms the page
+cache). Prints the slowest imports and exits 1 when importing a module loads
+any of DEFERRED_MODULES, which must only load on first use (model training,
+the comparables index build, the first LLM call), or when it takes more than
+IMPORT_BUDGET_RATIO times BASELINE: the libraries every entry point needs,
+imported the same way on the same machine, so the budget does not depend on
+how fast the machine is. Milliseconds are printed for reference only.
+"""
+import os
+import sys
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BASELINE = ('flask', 'pymongo', 'numpy')
+IMPORT_BUDGET_RATIO = {'app': 1.75, 'asgi': 2.0}
+DEFERRED_MODULES = ('pandas', 'sklearn', 'scipy', 'openai', 'httpx')
+RUNS = 5
+TOP = 10
+
+# Placeholders so the import succeeds without a .env; nothing connects at import.
+ENV = {'GEMINI_API_KEY': 'startup-check', 'SECRET_KEY': 'startup-check',
+       'MONGO_URI': 'mongodb://127.0.0.1:27017/rent_db', 'MODEL_WATCH_INTERVAL': '0'}
+
+PROBE = ("import sys, {modules}; "
+         "print(','.join(m for m in {deferred!r} if m in sys.modules))")
+
+
+def import_once(*modules):
+    """(total us, {imported module: cumulative us}, deferred modules loaded)."""
+    env = {**ENV, **os.environ, 'PYTHONPATH': BASE_DIR}
+    probe = PROBE.format(modules=', '.join(modules), deferred=DEFERRED_MODULES)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', probe],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True)
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cum, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        cumulative[name] = int(cum)
+    loaded = [m for m in result.stdout.strip().split(',') if m]
+    return sum(cumulative[m] for m in modules), cumulative, loaded
+
+
+def best_of(runs, *modules):
+    return min((import_once(*modules) for _ in range(runs)), key=lambda r: r[0])
+
+
+def run_benchmark(runs=RUNS):
+    ok = True
+    baseline = best_of(runs, *BASELINE)[0]
+    print(f"baseline {' + '.join(BASELINE)}: {baseline / 1000:.0f} ms (best of {runs})")
+    for module, budget in IMPORT_BUDGET_RATIO.items():
+        total, cumulative, loaded = best_of(runs, module)
+        ratio = total / baseline
+        print(f"import {module}: {total / 1000:.0f} ms, {ratio:.2f}x baseline "
+              f"(best of {runs}, budget {budget:.2f}x)")
+        top_level = sorted(((us, name) for name, us in cumulative.items()
+                            if '.' not in name and name != module), reverse=True)[:TOP]
+        for us, name in top_level:
+            print(f"  {name:<24}{us / 1000:>8.1f} ms")
+        if ratio > budget:
+            print(f"  OVER budget: {ratio:.2f}x baseline")
+            ok = False
+        if loaded:
+            print(f"  loads deferred modules at import: {', '.join(loaded)}")
+            ok = False
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_benchmark() else 1)
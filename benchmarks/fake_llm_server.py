@@ -0,0 +1,167 @@
+"""Minimal OpenAI-compatible chat completions server for local testing.
+
+Streams `--tokens` chunks per request with configurable first-token and
+inter-token delays; `--prefill-per-1k` adds prompt-size dependent latency
+(seconds per 1k prompt tokens, ~4 chars each) like a real model's prefill.
+Point the app at it with `LLM_BASE_URL=http://127.0.0.1:8089/v1/`. GET /stats
+reports open, finished and aborted (client went away mid-stream) requests.
+"""
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class FakeLLMState:
+    def __init__(self, tokens=40, first_token_delay=0.2, token_delay=0.02, text="token",
+                 prefill_per_1k=0.0):
+        self.tokens            = tokens
+        self.first_token_delay = first_token_delay
+        self.token_delay       = token_delay
+        self.text              = text
+        self.prefill_per_1k    = prefill_per_1k
+        self.prompt_tokens     = 0
+        self.lock     = threading.Lock()
+        self.open     = 0
+        self.peak     = 0
+        self.finished = 0
+        self.aborted  = 0
+        self.requests = 0
+
+    def enter(self, prompt_tokens):
+        with self.lock:
+            self.prompt_tokens += prompt_tokens
+            self.requests += 1
+            self.open += 1
+            self.peak = max(self.peak, self.open)
+
+    def leave(self, aborted):
+        with self.lock:
+            self.open -= 1
+            if aborted:
+                self.aborted += 1
+            else:
+                self.finished += 1
+
+    def stats(self):
+        with self.lock:
+            return {'requests': self.requests, 'open': self.open, 'peak': self.peak,
+                    'finished': self.finished, 'aborted': self.aborted,
+                    'prompt_tokens': self.prompt_tokens}
+
+
+def _chunk(content=None, finish_reason=None):
+    return {
+        'id': 'chatcmpl-fake', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+        'model': 'fake',
+        'choices': [{'index': 0, 'delta': {'content': content} if content is not None else {},
+                     'finish_reason': finish_reason}],
+    }
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/stats'):
+            self._send_json(self.state.stats())
+        else:
+            self._send_json({'error': 'not found'}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json({'error': 'not found'}, 404)
+            return
+
+        state = self.state
+        prompt_tokens = sum(len(str(m.get('content', ''))) for m in body.get('messages', [])) // 4
+        state.enter(prompt_tokens)
+        first_token_delay = state.first_token_delay + state.prefill_per_1k * prompt_tokens / 1000
+        aborted = False
+        try:
+            if not body.get('stream'):
+                time.sleep(first_token_delay)
+                text = ' '.join([state.text] * state.tokens)
+                self._send_json({
+                    'id': 'chatcmpl-fake', 'object': 'chat.completion', 'created': int(time.time()),
+                    'model': 'fake',
+                    'choices': [{'index': 0, 'finish_reason': 'stop',
+                                 'message': {'role': 'assistant', 'content': text}}],
+                })
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            time.sleep(first_token_delay)
+            for i in range(state.tokens):
+                if i:
+                    time.sleep(state.token_delay)
+                self._write_event(_chunk(f"{state.text}{i} "))
+            self._write_event(_chunk(finish_reason='stop'))
+            self._write_chunk(b'data: [DONE]\n\n')
+            self._write_chunk(b'')
+        except (BrokenPipeError, ConnectionResetError):
+            aborted = True
+            self.close_connection = True
+        finally:
+            state.leave(aborted)
+
+    def _write_event(self, payload):
+        self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode())
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+class _FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # the default backlog of 5 drops SYNs under concurrent load
+
+
+def start_fake_server(host='127.0.0.1', port=0, **options):
+    """Serves in a daemon thread; returns (server, state, base_url)."""
+    state = FakeLLMState(**options)
+    handler = type('Handler', (FakeLLMHandler,), {'state': state})
+    server = _FakeLLMServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name='fake-llm', daemon=True).start()
+    return server, state, f"http://{host}:{server.server_address[1]}/v1/"
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible streaming server.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--tokens', type=int, default=40)
+    parser.add_argument('--first-token-delay', type=float, default=0.2)
+    parser.add_argument('--token-delay', type=float, default=0.02)
+    parser.add_argument('--prefill-per-1k', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, state, url = start_fake_server(args.host, args.port, tokens=args.tokens,
+                                           first_token_delay=args.first_token_delay,
+                                           token_delay=args.token_delay,
+                                           prefill_per_1k=args.prefill_per_1k)
+    print(f"Fake LLM listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,382 @@
+"""Load test for /predict, /compare, /history and /chat/stream.
+
+Drives the app in-process (threaded werkzeug server), under gunicorn or as
+the ASGI app under uvicorn (asgi.py), on mongomock (see loadtest_app.py) and
+the fake streaming LLM server, with
+`--concurrency` logged-in keep-alive clients per scenario. Reports RPS,
+p50/p95/p99 latency, time to the first SSE token and peak RSS per process,
+writes the run as JSON and, given `--baseline`, exits 1 when any scenario
+lost more than `--threshold` of its throughput or latency.
+
+    python benchmarks/loadtest.py --mode gunicorn --workers 2 --threads 8 \\
+        --concurrency 16 --duration 10 --output before.json
+    python benchmarks/loadtest.py --mode gunicorn ... --baseline before.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import platform
+import argparse
+import threading
+import subprocess
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import httpx
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from benchmarks.fake_llm_server import start_fake_server
+
+# /history runs first: mongomock has no indexes, so it would otherwise scan
+# every record the /predict scenario logged for the benchmark user.
+SCENARIOS    = ('history', 'predict', 'compare', 'chat_stream')
+RESULTS_DIR  = os.path.join(BASE_DIR, 'benchmarks', 'results')
+# Seeded by loadtest_app.py; every client logs in as this user.
+BENCH_EMAIL    = "loadtest@example.com"
+BENCH_PASSWORD = "loadtest-password"
+# Latency regressions smaller than this are noise, whatever the ratio.
+MIN_DELTA_MS = 1.0
+
+
+def sample_properties(n=500, seed=0):
+    path = os.path.join(BASE_DIR, 'data', 'processed', 'cleaned_rent_data.csv')
+    df = pd.read_csv(path, usecols=['city', 'Locality', 'BHK', 'Area', 'Furnishing'])
+    df = df.sample(n=min(n, len(df)), random_state=seed)
+    return [{'city': c, 'locality': l, 'bhk': int(b), 'area': float(a), 'furnishing': f}
+            for c, l, b, a, f in zip(df['city'], df['Locality'], df['BHK'], df['Area'],
+                                     df['Furnishing'])]
+
+
+# ── scenarios: one request each, returning time to first SSE token or None ──
+
+def do_predict(client, prop, i):
+    client.post('/predict', json=prop).raise_for_status()
+
+
+def do_compare(client, prop, i):
+    other = dict(prop, area=prop['area'] * 1.2)
+    client.post('/compare', json={'properties': [prop, other]}).raise_for_status()
+
+
+def do_history(client, prop, i):
+    client.get('/history', params={'limit': 20}).raise_for_status()
+
+
+def do_chat_stream(client, prop, i, use_cache=False):
+    ml = dict(prop, predicted_rent=25000, fair_rent_low=23750, fair_rent_high=26250)
+    body = {'user_question': f"Is this a fair rent? ({i})", 'ml_data': ml,
+            'no_cache': not use_cache}
+    t0 = time.perf_counter()
+    ttft = None
+    with client.stream('POST', '/chat/stream', json=body) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line.startswith('data: '):
+                continue
+            data = line[6:]
+            if data.startswith('[ERROR]'):
+                raise RuntimeError(data)
+            if data == '[DONE]':
+                break
+            if ttft is None:
+                ttft = time.perf_counter() - t0
+    return ttft
+
+
+# ── servers ──────────────────────────────────────────────────────────────────
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_inprocess():
+    import logging
+    from werkzeug.serving import make_server
+    from benchmarks.loadtest_app import app
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # no per-request access log
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='loadtest-app', daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server.shutdown, os.getpid()
+
+
+def start_gunicorn(workers, threads, log_path):
+    port = _free_port()
+    return _start_server([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--preload',
+                          '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+                          '--threads', str(threads), '--timeout', '120',
+                          'benchmarks.loadtest_app:app'], port, log_path)
+
+
+def start_asgi(workers, log_path):
+    port = _free_port()
+    return _start_server([sys.executable, '-m', 'uvicorn', 'benchmarks.loadtest_asgi:app',
+                          '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers),
+                          '--log-level', 'warning', '--no-access-log'], port, log_path)
+
+
+def _start_server(cmd, port, log_path):
+    log = open(log_path, 'w')
+    proc = subprocess.Popen(cmd, cwd=BASE_DIR, env=dict(os.environ), stdout=log, stderr=log)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 180  # the master may build the rent surface first
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{cmd[2]} exited with {proc.returncode}; see {log_path}")
+        try:
+            if httpx.get(base_url + '/', timeout=1).status_code == 200:
+                break
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    else:
+        proc.terminate()
+        raise RuntimeError(f"{cmd[2]} did not come up; see {log_path}")
+
+    def stop():
+        proc.terminate()
+        proc.wait(timeout=30)
+        log.close()
+    return base_url, stop, proc.pid
+
+
+def login(base_url):
+    client = httpx.Client(base_url=base_url, timeout=120)
+    response = client.post('/login', data={'email': BENCH_EMAIL, 'password': BENCH_PASSWORD})
+    if response.status_code != 302 or 'dashboard' not in response.headers.get('location', ''):
+        raise RuntimeError(f"Benchmark login failed ({response.status_code})")
+    return client
+
+
+# ── RSS ──────────────────────────────────────────────────────────────────────
+
+def _rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _children(pid):
+    children = []
+    try:
+        for tid in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{tid}/children') as f:
+                children += [int(c) for c in f.read().split()]
+    except OSError:
+        pass
+    return children
+
+
+class RSSSampler:
+    """Polls /proc for the peak RSS of a server process and its workers (Linux only)."""
+
+    def __init__(self, pid, interval=0.2):
+        self.pid      = pid
+        self.interval = interval
+        self.peak     = {}
+        self._stop    = threading.Event()
+        self._thread  = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            for pid in [self.pid] + _children(self.pid):
+                rss = _rss_mb(pid)
+                if rss is not None:
+                    self.peak[pid] = max(self.peak.get(pid, 0.0), rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def report(self, in_process):
+        master = self.peak.get(self.pid)
+        workers = [round(v, 1) for pid, v in sorted(self.peak.items()) if pid != self.pid]
+        if in_process:
+            return {'process': round(master, 1) if master else None}
+        return {'master': round(master, 1) if master else None, 'workers': workers}
+
+
+# ── runner ───────────────────────────────────────────────────────────────────
+
+def _percentiles(samples):
+    if not samples:
+        return None
+    ms = np.array(samples) * 1000
+    return {'p50': round(float(np.percentile(ms, 50)), 2), 'p95': round(float(np.percentile(ms, 95)), 2),
+            'p99': round(float(np.percentile(ms, 99)), 2), 'max': round(float(ms.max()), 2)}
+
+
+def run_scenario(fn, clients, props, duration, warmup):
+    latencies, ttfts, errors = [], [], {}
+    lock = threading.Lock()
+    start = time.perf_counter()
+    measure_from, deadline = start + warmup, start + warmup + duration
+
+    def worker(n, client):
+        i = n
+        while True:
+            t0 = time.perf_counter()
+            if t0 >= deadline:
+                return
+            try:
+                ttft = fn(client, props[i % len(props)], i)
+                failed = None
+            except Exception as e:
+                ttft, failed = None, type(e).__name__
+            elapsed = time.perf_counter() - t0
+            i += len(clients)
+            if t0 < measure_from:
+                continue
+            with lock:
+                if failed:
+                    errors[failed] = errors.get(failed, 0) + 1
+                else:
+                    latencies.append(elapsed)
+                    if ttft is not None:
+                        ttfts.append(ttft)
+
+    threads = [threading.Thread(target=worker, args=(n, c)) for n, c in enumerate(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {'requests': len(latencies), 'errors': errors,
+            'rps': round(len(latencies) / duration, 1),
+            'latency_ms': _percentiles(latencies), 'ttft_ms': _percentiles(ttfts)}
+
+
+def compare(current, baseline, threshold):
+    """Human-readable regressions of `current` against `baseline`."""
+    failures = []
+    for name, cur in current['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if not base:
+            continue
+        if base['rps'] and cur['rps'] < base['rps'] * (1 - threshold):
+            failures.append(f"{name}: {cur['rps']} rps < {base['rps']} rps baseline")
+        for metric in ('latency_ms', 'ttft_ms'):
+            if not cur.get(metric) or not base.get(metric):
+                continue
+            now, before = cur[metric]['p95'], base[metric]['p95']
+            if now > before * (1 + threshold) and now - before > MIN_DELTA_MS:
+                failures.append(f"{name}: {metric} p95 {now} > {before} baseline")
+        if cur['errors'] and not base.get('errors'):
+            failures.append(f"{name}: errors {cur['errors']}")
+    return failures
+
+
+def _git_rev():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the rent advisor app.")
+    parser.add_argument('--mode', choices=('inprocess', 'gunicorn', 'asgi'), default='inprocess')
+    parser.add_argument('--workers', type=int, default=2, help="gunicorn / uvicorn workers")
+    parser.add_argument('--threads', type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0, help="measured seconds per scenario")
+    parser.add_argument('--warmup', type=float, default=2.0, help="unmeasured seconds per scenario")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--chat-cache', action='store_true',
+                        help="let /chat/stream answers come from the advice cache")
+    parser.add_argument('--llm-tokens', type=int, default=40)
+    parser.add_argument('--llm-first-token-delay', type=float, default=0.2)
+    parser.add_argument('--llm-token-delay', type=float, default=0.01)
+    parser.add_argument('--output', help="results JSON (default benchmarks/results/<mode>-<time>.json)")
+    parser.add_argument('--baseline', help="earlier results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help="allowed relative loss in rps / p95 before failing")
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {sorted(unknown)}")
+
+    llm, llm_state, llm_url = start_fake_server(tokens=args.llm_tokens,
+                                                first_token_delay=args.llm_first_token_delay,
+                                                token_delay=args.llm_token_delay)
+    os.environ['LLM_BASE_URL'] = llm_url
+    # one user drives every chat: measure capacity, not the per-user rate limit
+    os.environ.setdefault('CHAT_USER_RATE_PER_MIN', '0')
+    os.environ.setdefault('CHAT_RATE_PER_MIN', '0')
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    output = args.output or os.path.join(RESULTS_DIR, f"{args.mode}-{stamp}.json")
+
+    if args.mode == 'gunicorn':
+        base_url, stop, server_pid = start_gunicorn(args.workers, args.threads,
+                                                    os.path.join(RESULTS_DIR, f"gunicorn-{stamp}.log"))
+    elif args.mode == 'asgi':
+        base_url, stop, server_pid = start_asgi(args.workers,
+                                                os.path.join(RESULTS_DIR, f"asgi-{stamp}.log"))
+    else:
+        base_url, stop, server_pid = start_inprocess()
+
+    functions = {'predict': do_predict, 'compare': do_compare, 'history': do_history,
+                 'chat_stream': lambda c, p, i: do_chat_stream(c, p, i, args.chat_cache)}
+    props = sample_properties()
+    results = {}
+    try:
+        clients = [login(base_url) for _ in range(args.concurrency)]
+        with RSSSampler(server_pid) as rss:
+            for name in scenarios:
+                results[name] = run_scenario(functions[name], clients, props,
+                                             args.duration, args.warmup)
+                r = results[name]
+                ttft = f", TTFT p50 {r['ttft_ms']['p50']} ms" if r['ttft_ms'] else ""
+                lat = r['latency_ms'] or {'p50': '-', 'p95': '-', 'p99': '-'}
+                print(f"{name:<12} {r['rps']:>8} rps  p50 {lat['p50']} / p95 {lat['p95']} / "
+                      f"p99 {lat['p99']} ms{ttft}  errors {r['errors'] or 0}")
+        for client in clients:
+            client.close()
+    finally:
+        stop()
+        llm.shutdown()
+
+    run = {'meta': {'mode': args.mode, 'concurrency': args.concurrency, 'duration': args.duration,
+                    'warmup': args.warmup, 'created_at': datetime.now().isoformat(),
+                    'git_rev': _git_rev(), 'python': platform.python_version(),
+                    'workers': args.workers if args.mode != 'inprocess' else None,
+                    'threads': args.threads if args.mode == 'gunicorn' else None,
+                    'llm': {'tokens': args.llm_tokens, 'first_token_delay': args.llm_first_token_delay,
+                            'token_delay': args.llm_token_delay, 'upstream': llm_state.stats()}},
+           'scenarios': results,
+           'rss_mb': rss.report(args.mode == 'inprocess')}
+    with open(output, 'w') as f:
+        json.dump(run, f, indent=2)
+    print(f"Peak RSS (MB): {run['rss_mb']}")
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare(run, json.load(f), args.threshold)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} of {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
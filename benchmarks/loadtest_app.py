@@ -0,0 +1,60 @@
+"""WSGI entry point for load tests: the real app, optionally on an in-memory Mongo.
+
+With `LOADTEST_MONGO=mock` (the default) every collection the app touches is
+swapped for mongomock; any other value keeps the configured MONGO_URI (e.g. a
+local mongod). Either way a benchmark user and some prediction history are
+seeded. Serve it with
+`gunicorn -c gunicorn.conf.py --preload benchmarks.loadtest_app:app`.
+"""
+import os
+from datetime import datetime, timedelta
+from werkzeug.security import generate_password_hash
+
+USE_MONGOMOCK = os.getenv("LOADTEST_MONGO", "mock") == "mock"
+
+os.environ.setdefault("GEMINI_API_KEY", "fake")
+os.environ.setdefault("SECRET_KEY", "loadtest")
+os.environ.setdefault("MONGO_URI", "mongodb://127.0.0.1:27017/rent_db")
+if USE_MONGOMOCK:
+    os.environ.setdefault("MONGO_ENSURE_INDEXES", "0")
+
+import app as flask_app
+from benchmarks.loadtest import BENCH_EMAIL, BENCH_PASSWORD
+
+HISTORY_SEED = 200
+
+
+def use_mongomock():
+    import mongomock
+    db = mongomock.MongoClient()['rent_db']
+    flask_app.db = db
+    flask_app.prediction_logger.collection = db.predictions
+    flask_app.chat_store.collection = db.chat_sessions
+    return db
+
+
+def seed(db):
+    """Creates the benchmark user and HISTORY_SEED past predictions once."""
+    user = db.users.find_one({'email': BENCH_EMAIL})
+    if user is None:
+        user = {'name': 'Load Test', 'email': BENCH_EMAIL,
+                'password': generate_password_hash(BENCH_PASSWORD),
+                'created_at': datetime.utcnow()}
+        user['_id'] = db.users.insert_one(user).inserted_id
+    user_id = str(user['_id'])
+
+    if db.predictions.count_documents({'user_id': user_id}) == 0:
+        now = datetime.utcnow()
+        db.predictions.insert_many([
+            {'user_id': user_id, 'city': 'Pune', 'locality': 'Kothrud', 'bhk': 2,
+             'area': 900 + i, 'furnishing': 'Semi-Furnished',
+             'fair_rent_low': 23750, 'fair_rent_high': 26250,
+             'timestamp': (now - timedelta(minutes=i)).isoformat(),
+             'created_at': now - timedelta(minutes=i), 'note': ''}
+            for i in range(HISTORY_SEED)])
+    return user_id
+
+
+db = use_mongomock() if USE_MONGOMOCK else flask_app.db
+seed(db)
+app = flask_app.app
@@ -0,0 +1,53 @@
+"""ASGI entry point for load tests: asgi.py over the same seeded database.
+
+With mongomock the async routes get a thin awaitable wrapper around the
+in-memory collections (mongomock has no async API); otherwise asgi.py opens
+its own AsyncMongoClient on MONGO_URI. Serve it with
+`uvicorn benchmarks.loadtest_asgi:app`.
+"""
+from benchmarks import loadtest_app
+import asgi
+
+
+class _AsyncCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, n):
+        self._cursor = self._cursor.limit(n)
+        return self
+
+    async def to_list(self, length=None):
+        return list(self._cursor)
+
+
+class _AsyncCollection:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def find(self, *args, **kwargs):
+        return _AsyncCursor(self._collection.find(*args, **kwargs))
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+class AsyncMockDatabase:
+    def __init__(self, db):
+        self._db = db
+
+    def __getattr__(self, name):
+        return _AsyncCollection(self._db[name])
+
+
+if loadtest_app.USE_MONGOMOCK:
+    asgi.adb = AsyncMockDatabase(loadtest_app.db)
+app = asgi.app
@@ -0,0 +1,29 @@
+# Picked up automatically by `gunicorn app:app` from the working directory.
+
+
+def when_ready(server):
+    # With --preload the app is imported once in the master: open the
+    # memory-mapped model there so every forked worker shares its pages.
+    if server.cfg.preload_app:
+        from app import model_registry, surface_store, comparables_store, locality_index
+        model_registry.warm()
+        # load only: a missing surface is built once the workers are up
+        surface = surface_store.get(model_registry.current, build=False)
+        locality_index.get(model_registry.current)
+        comparables_store.get()
+        server.log.info("Model artifacts, %slocality and comparables indexes warmed in master",
+                        "rent surface, " if surface is not None else "")
+
+
+def post_worker_init(worker):
+    # Starts the background build of a missing rent surface; the surface
+    # store's lock file lets one worker build it while the others wait and
+    # load the saved arrays.
+    from app import model_registry, surface_store
+    surface_store.get(model_registry.current)
+
+
+def worker_exit(server, worker):
+    # Flush queued prediction records before the worker process goes away.
+    from app import prediction_logger
+    prediction_logger.close()
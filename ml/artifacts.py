@@ -0,0 +1,225 @@
+"""Versioned, memory-mappable model artifact format.
+
+`models/compiled/<version>/` holds one `.npy` file per array (tree nodes plus
+the locality tables of ml.localities, built from the pickle's
+`locality_value_map` and `locality_mapping.json`); `models/compiled/manifest.json`
+names the active version and carries `feature_columns`, `global_mean_rent`,
+forest metadata and a sha256 over every array. The point model and its quantile band models (when
+the pickle has `band_models`) are compiled into one forest. Version
+directories are content-addressed and never rewritten, and the manifest is
+replaced atomically, so a reader always sees one complete model. Arrays are
+opened with `mmap_mode='r'`, so gunicorn workers share one copy of the model
+and of the locality lookups through the page cache.
+"""
+import os
+import json
+import shutil
+import pickle
+import hashlib
+import logging
+from collections import namedtuple
+import numpy as np
+
+from ml.inference import CompiledForest, RentPredictor, FOREST_ARRAYS
+from ml.localities import LocalityTable, LOCALITY_ARRAYS
+
+log = logging.getLogger(__name__)
+
+FORMAT_VERSION = 3
+COMPILED_DIRNAME = 'compiled'
+PICKLE_NAME = 'rent_model_artifacts.pkl'
+KEEP_VERSIONS = 3
+
+# One immutable, fully loaded model; swapped as a single reference on reload.
+ModelBundle = namedtuple('ModelBundle', ['version', 'predictor', 'manifest', 'locality_map'])
+
+
+def file_sha256(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _arrays_checksum(arrays):
+    h = hashlib.sha256()
+    for name in sorted(arrays):
+        arr = np.ascontiguousarray(arrays[name])
+        h.update(name.encode())
+        h.update(str(arr.dtype).encode())
+        h.update(arr.tobytes())
+    return h.hexdigest()
+
+
+def load_locality_map(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def compile_arrays(artifacts, locality_map):
+    """(CompiledForest, every array of the compiled format) for an artifacts dict."""
+    forest = CompiledForest(artifacts['model'], *artifacts.get('band_models', ()))
+    localities = LocalityTable.build_arrays(artifacts['locality_value_map'], locality_map,
+                                            forest.input_dtype)
+    return forest, {**forest.arrays(), **localities}
+
+
+def export_compiled(artifacts, out_dir, locality_map, source_sha256=None, locality_sha256=None):
+    """Writes the compiled format for an unpickled artifacts dict and the
+    city -> localities map; returns the manifest."""
+    forest, arrays = compile_arrays(artifacts, locality_map)
+    checksum = _arrays_checksum(arrays)
+    version = checksum[:16]
+
+    version_dir = os.path.join(out_dir, version)
+    if not os.path.exists(os.path.join(version_dir, 'complete')):
+        tmp_dir = f"{version_dir}.tmp-{os.getpid()}"
+        os.makedirs(tmp_dir, exist_ok=True)
+        for name, arr in arrays.items():
+            np.save(os.path.join(tmp_dir, f'{name}.npy'), np.ascontiguousarray(arr))
+        open(os.path.join(tmp_dir, 'complete'), 'w').close()
+        if os.path.isdir(version_dir):
+            # left behind by an interrupted export
+            shutil.rmtree(version_dir, ignore_errors=True)
+        try:
+            os.rename(tmp_dir, version_dir)
+        except OSError:
+            # another process published the same content first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'version': version,
+        'model_type': type(artifacts['model']).__name__,
+        'feature_columns': list(artifacts['feature_columns']),
+        'global_mean_rent': float(artifacts['global_mean_rent']),
+        'band_quantiles': list(artifacts.get('band_quantiles', ())),
+        'depth': forest.depth,
+        'n_features': forest.n_features,
+        'input_dtype': np.dtype(forest.input_dtype).name,
+        'checksum': checksum,
+        'source_sha256': source_sha256,
+        'locality_map_sha256': locality_sha256,
+    }
+    tmp = os.path.join(out_dir, f'manifest.json.tmp-{os.getpid()}')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(out_dir, 'manifest.json'))
+    _prune_versions(out_dir, keep=version)
+    return manifest
+
+
+def _prune_versions(out_dir, keep):
+    """Drops all but the newest KEEP_VERSIONS version dirs (open mmaps stay valid)."""
+    versions = [d for d in os.listdir(out_dir)
+                if os.path.isdir(os.path.join(out_dir, d)) and '.tmp-' not in d and d != keep]
+    versions.sort(key=lambda d: os.path.getmtime(os.path.join(out_dir, d)), reverse=True)
+    for old in versions[KEEP_VERSIONS - 1:]:
+        shutil.rmtree(os.path.join(out_dir, old), ignore_errors=True)
+
+
+def read_manifest(compiled_dir):
+    with open(os.path.join(compiled_dir, 'manifest.json'), 'r') as f:
+        return json.load(f)
+
+
+def load_compiled(compiled_dir, mmap=True, verify=True):
+    """Opens the active compiled version; returns (RentPredictor, manifest)."""
+    manifest = read_manifest(compiled_dir)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format {manifest.get('format_version')}")
+
+    version_dir = os.path.join(compiled_dir, manifest['version'])
+    arrays = {name: np.load(os.path.join(version_dir, f'{name}.npy'),
+                            mmap_mode='r' if mmap else None)
+              for name in FOREST_ARRAYS + LOCALITY_ARRAYS}
+    if verify and _arrays_checksum(arrays) != manifest['checksum']:
+        raise ValueError(f"Checksum mismatch in {version_dir}")
+
+    forest = CompiledForest.from_arrays(arrays, manifest['depth'], manifest['n_features'],
+                                        manifest['input_dtype'])
+    predictor = RentPredictor(forest, manifest['feature_columns'], LocalityTable(arrays),
+                              manifest['global_mean_rent'])
+    return predictor, manifest
+
+
+def load_pickle(pickle_path):
+    with open(pickle_path, 'rb') as f:
+        return pickle.load(f)
+
+
+class ArtifactStore:
+    """Builds ModelBundles from a models directory.
+
+    Prefers `models/compiled/` when its manifest matches the current pickle's
+    and locality map's sha256; otherwise falls back to unpickling and compiling (and refreshes
+    the compiled copy when the directory is writable).
+    """
+
+    def __init__(self, models_dir):
+        self.models_dir   = models_dir
+        self.pickle_path  = os.path.join(models_dir, PICKLE_NAME)
+        self.compiled_dir = os.path.join(models_dir, COMPILED_DIRNAME)
+        self.locality_path = os.path.join(models_dir, 'locality_mapping.json')
+
+    def fingerprint(self):
+        """Cheap stat-based token that changes when a new artifact is dropped in."""
+        parts = []
+        for path in (self.pickle_path, os.path.join(self.compiled_dir, 'manifest.json'),
+                     self.locality_path):
+            try:
+                st = os.stat(path)
+                parts.append(f"{st.st_mtime_ns}-{st.st_size}")
+            except OSError:
+                parts.append("missing")
+        return "/".join(parts)
+
+    def _load_predictor(self):
+        source_sha = file_sha256(self.pickle_path) if os.path.exists(self.pickle_path) else None
+        locality_sha = (file_sha256(self.locality_path) if os.path.exists(self.locality_path)
+                        else None)
+        try:
+            predictor, manifest = load_compiled(self.compiled_dir)
+            if ((source_sha is None or manifest.get('source_sha256') == source_sha) and
+                    (locality_sha is None or manifest.get('locality_map_sha256') == locality_sha)):
+                return predictor, manifest
+            log.info("Compiled artifacts are stale; rebuilding from %s", self.pickle_path)
+        except (OSError, ValueError, KeyError) as e:
+            log.info("Compiled artifacts unavailable (%s); loading %s", e, self.pickle_path)
+
+        artifacts = load_pickle(self.pickle_path)
+        locality_map = load_locality_map(self.locality_path)
+        try:
+            export_compiled(artifacts, self.compiled_dir, locality_map,
+                            source_sha256=source_sha, locality_sha256=locality_sha)
+            return load_compiled(self.compiled_dir)
+        except OSError as e:
+            log.warning("Could not write %s (%s); using in-memory model", self.compiled_dir, e)
+            forest, arrays = compile_arrays(artifacts, locality_map)
+            predictor = RentPredictor(forest, artifacts['feature_columns'], LocalityTable(arrays),
+                                      artifacts['global_mean_rent'])
+            checksum = _arrays_checksum(arrays)
+            return predictor, {'version': checksum[:16], 'checksum': checksum,
+                               'model_type': type(artifacts['model']).__name__,
+                               'band_quantiles': list(artifacts.get('band_quantiles', ())),
+                               'source_sha256': source_sha,
+                               'feature_columns': list(artifacts['feature_columns']),
+                               'global_mean_rent': float(artifacts['global_mean_rent'])}
+
+    def load_bundle(self):
+        predictor, manifest = self._load_predictor()
+        return ModelBundle(manifest['version'], predictor, manifest, predictor.localities.city_map)
+
+
+if __name__ == "__main__":
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    models_dir = os.path.join(BASE_DIR, 'models')
+    pickle_path = os.path.join(models_dir, PICKLE_NAME)
+    locality_path = os.path.join(models_dir, 'locality_mapping.json')
+    manifest = export_compiled(load_pickle(pickle_path), os.path.join(models_dir, COMPILED_DIRNAME),
+                               load_locality_map(locality_path),
+                               source_sha256=file_sha256(pickle_path),
+                               locality_sha256=file_sha256(locality_path))
+    print(f"Exported {manifest['model_type']} version {manifest['version']} "
+          f"to {os.path.join(models_dir, COMPILED_DIRNAME)}")
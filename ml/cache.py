@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+
+class RedisBackend:
+    """Optional shared tier so gunicorn workers reuse each other's predictions."""
+
+    def __init__(self, url, prefix="rentpred"):
+        import redis  # optional dependency, only needed when a URL is configured
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, version, key):
+        return f"{self.prefix}:{version}:" + json.dumps(key, separators=(',', ':'))
+
+    def get(self, version, key):
+        raw = self.client.get(self._key(version, key))
+        return tuple(json.loads(raw)) if raw is not None else None
+
+    def set(self, version, key, value, ttl):
+        self.client.set(self._key(version, key), json.dumps(value), ex=max(1, int(ttl)))
+
+
+class PredictionCache:
+    """Bounded, thread-safe LRU + TTL cache for `_run_model` results.
+
+    Keys are normalized property inputs with area snapped to `area_bucket`
+    sq ft. The whole cache is dropped when `version_fn()` changes (e.g. a new
+    model goes live); it is polled at most every `check_interval`s. The
+    shared backend is best effort: when it fails the value is computed and
+    kept in the local LRU only.
+    """
+
+    def __init__(self, maxsize=4096, ttl=3600, area_bucket=1, version_fn=None,
+                 check_interval=5.0, backend=None):
+        self.maxsize        = maxsize
+        self.ttl            = ttl
+        self.area_bucket    = area_bucket
+        self.version_fn     = version_fn or (lambda: "static")
+        self.check_interval = check_interval
+        self.backend        = backend
+
+        self._data       = OrderedDict()
+        self._lock       = threading.Lock()
+        self._version    = self.version_fn()
+        self._checked_at = time.monotonic()
+        self.hits = self.misses = self.shared_hits = 0
+        self.evictions = self.invalidations = self.backend_errors = 0
+        self.last_backend_error = None
+
+    @classmethod
+    def from_env(cls, version_fn):
+        url = os.getenv("PREDICTION_CACHE_URL")
+        return cls(maxsize=int(os.getenv("PREDICTION_CACHE_SIZE", "4096")),
+                   ttl=float(os.getenv("PREDICTION_CACHE_TTL", "3600")),
+                   area_bucket=float(os.getenv("PREDICTION_CACHE_AREA_BUCKET", "1")),
+                   version_fn=version_fn, check_interval=0.0,
+                   backend=RedisBackend(url) if url else None)
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    def normalize(self, city, locality, bhk, area, furnishing):
+        area = float(area)
+        if self.area_bucket > 1:
+            area = float(round(area / self.area_bucket) * self.area_bucket)
+        return (str(city).strip(), str(locality).strip(), int(bhk), area,
+                str(furnishing).strip())
+
+    def _check_version(self, now):
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        version = self.version_fn()
+        if version != self._version:
+            self._version = version
+            self._data.clear()
+            self.invalidations += 1
+
+    def get_or_compute(self, key, compute):
+        if not self.enabled:
+            return compute()
+
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(now)
+            version = self._version
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        value = self._backend_call('get', version, key) if self.backend else None
+        shared_hit = value is not None
+        if not shared_hit:
+            value = compute()
+            if self.backend:
+                self._backend_call('set', version, key, value, self.ttl)
+
+        with self._lock:
+            self.misses += 1
+            self.shared_hits += shared_hit
+            if version == self._version:
+                self._data[key] = (now + self.ttl, value)
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def _backend_call(self, method, *args):
+        try:
+            return getattr(self.backend, method)(*args)
+        except Exception as e:
+            with self._lock:
+                self.backend_errors += 1
+                self.last_backend_error = str(e)
+            log.warning("Shared prediction cache %s failed: %s", method, e)
+            return None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data), "maxsize": self.maxsize,
+                "hits": self.hits, "misses": self.misses, "shared_hits": self.shared_hits,
+                "evictions": self.evictions, "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "shared_backend": type(self.backend).__name__ if self.backend else None,
+                "backend_errors": self.backend_errors,
+                "last_backend_error": self.last_backend_error,
+            }
@@ -0,0 +1,185 @@
+"""Nearest comparable listings over the cleaned dataset.
+
+Listings with coordinates are projected to local km per city and split by
+(city, BHK). Each split gets a KD-tree over
+[x_km, y_km, AREA_WEIGHT_KM * ln(area), furnishing one-hot], so "nearest"
+trades distance against size and furnishing in one exact k-NN query. A
+per-locality table (centroid, listing count, median rent) backs locality
+lookups and the "nearby localities" list.
+"""
+import os
+import logging
+import threading
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+KM_PER_DEG = 111.32
+# One unit of ln(area) costs as much as AREA_WEIGHT_KM of distance (±25% size ≈ 0.9 km).
+AREA_WEIGHT_KM = 4.0
+# A furnishing mismatch costs as much as this much distance.
+FURNISHING_PENALTY_KM = 1.5
+FURNISHINGS = ('Furnished', 'Semi-Furnished', 'Unfurnished')
+LISTING_COLUMNS = ['city', 'Locality', 'BHK', 'Area', 'Furnishing', 'Rent', 'Latitude', 'Longitude']
+
+
+class ComparablesIndex:
+    """Immutable spatial + per-locality index over listings with coordinates."""
+
+    def __init__(self, listings):
+        from scipy.spatial import cKDTree  # only needed once an index is built
+
+        df = (listings[LISTING_COLUMNS]
+              .dropna(subset=['Latitude', 'Longitude', 'BHK', 'Area', 'Rent'])
+              .drop_duplicates()
+              .reset_index(drop=True))
+        self.size = len(df)
+
+        self.city       = df['city'].to_numpy(dtype=object)
+        self.locality   = df['Locality'].to_numpy(dtype=object)
+        self.bhk        = df['BHK'].to_numpy(dtype=np.int64)
+        self.area       = df['Area'].to_numpy(dtype=np.float64)
+        self.furnishing = df['Furnishing'].to_numpy(dtype=object)
+        self.rent       = df['Rent'].to_numpy(dtype=np.float64)
+        self.lat        = df['Latitude'].to_numpy(dtype=np.float64)
+        self.lon        = df['Longitude'].to_numpy(dtype=np.float64)
+
+        # Equirectangular projection around each city's mean position.
+        self.origins = {city: (float(g['Latitude'].mean()), float(g['Longitude'].mean()))
+                        for city, g in df.groupby('city')}
+        self.x, self.y = np.zeros(self.size), np.zeros(self.size)
+        for city, rows in df.groupby('city').indices.items():
+            self.x[rows], self.y[rows] = self._project(city, self.lat[rows], self.lon[rows])
+
+        points = np.column_stack([self.x, self.y, AREA_WEIGHT_KM * np.log(self.area),
+                                  self._furnishing_vectors(self.furnishing)])
+        self._trees = {}
+        for (city, bhk), rows in df.groupby(['city', 'BHK']).indices.items():
+            self._trees[(city, int(bhk))] = (cKDTree(points[rows]), rows)
+
+        self.localities = {}
+        self._locality_trees = {}
+        for city, g in df.groupby('city'):
+            stats = g.groupby('Locality').agg(lat=('Latitude', 'median'), lon=('Longitude', 'median'),
+                                              listings=('Rent', 'size'), median_rent=('Rent', 'median'))
+            x, y = self._project(city, stats['lat'].to_numpy(), stats['lon'].to_numpy())
+            for i, (name, row) in enumerate(stats.iterrows()):
+                self.localities[(city, name)] = {'lat': float(row['lat']), 'lon': float(row['lon']),
+                                                 'x': float(x[i]), 'y': float(y[i]),
+                                                 'listings': int(row['listings']),
+                                                 'median_rent': float(row['median_rent'])}
+            self._locality_trees[city] = (cKDTree(np.column_stack([x, y])), stats.index.to_list())
+
+    @classmethod
+    def from_path(cls, path):
+        import pandas as pd  # only needed to build the index, never per request
+        if path.endswith('.parquet'):
+            return cls(pd.read_parquet(path, columns=LISTING_COLUMNS))
+        return cls(pd.read_csv(path, usecols=LISTING_COLUMNS))
+
+    def _project(self, city, lat, lon):
+        lat0, lon0 = self.origins[city]
+        return ((np.asarray(lon) - lon0) * KM_PER_DEG * np.cos(np.radians(lat0)),
+                (np.asarray(lat) - lat0) * KM_PER_DEG)
+
+    @staticmethod
+    def _furnishing_vectors(furnishing):
+        furnishing = np.atleast_1d(np.asarray(furnishing, dtype=object))
+        scale = FURNISHING_PENALTY_KM / np.sqrt(2)
+        return np.column_stack([(furnishing == f) * scale for f in FURNISHINGS])
+
+    def center(self, city, locality=None, lat=None, lon=None):
+        """(x_km, y_km) of the query point: explicit coordinates or the locality centroid."""
+        if city not in self.origins:
+            raise KeyError(f"No geocoded listings for city '{city}'.")
+        if lat is not None and lon is not None:
+            x, y = self._project(city, lat, lon)
+            return float(x), float(y)
+        entry = self.localities.get((city, locality))
+        if entry is None:
+            raise KeyError(f"No geocoded listings for '{locality}' in {city}.")
+        return entry['x'], entry['y']
+
+    def comparables(self, city, bhk, area, furnishing=None, locality=None, lat=None, lon=None,
+                    k=5, max_km=None):
+        """The k most similar listings with the same BHK, most similar first."""
+        x, y = self.center(city, locality, lat, lon)
+        tree = self._trees.get((city, int(bhk)))
+        if tree is None:
+            return []
+        tree, rows = tree
+        query = np.concatenate([[x, y, AREA_WEIGHT_KM * np.log(float(area))],
+                                self._furnishing_vectors([furnishing])[0]])
+        _, idx = tree.query(query, k=min(int(k), len(rows)))
+        results = []
+        for i in rows[np.atleast_1d(idx)]:
+            distance = float(np.hypot(self.x[i] - x, self.y[i] - y))
+            if max_km is not None and distance > max_km:
+                continue
+            results.append({'locality': self.locality[i], 'bhk': int(self.bhk[i]),
+                            'area': float(self.area[i]), 'furnishing': self.furnishing[i],
+                            'rent': float(self.rent[i]),
+                            'rent_per_sqft': round(float(self.rent[i] / self.area[i]), 2),
+                            'distance_km': round(distance, 2),
+                            'latitude': float(self.lat[i]), 'longitude': float(self.lon[i])})
+        return results
+
+    def nearby_localities(self, city, locality=None, lat=None, lon=None, n=3):
+        """Closest other localities by centroid, with their median asking rent."""
+        x, y = self.center(city, locality, lat, lon)
+        tree, names = self._locality_trees[city]
+        _, idx = tree.query([x, y], k=min(n + 1, len(names)))
+        results = []
+        for i in np.atleast_1d(idx):
+            name = names[i]
+            if name == locality:
+                continue
+            entry = self.localities[(city, name)]
+            results.append({'locality': name, 'listings': entry['listings'],
+                            'median_rent': entry['median_rent'],
+                            'distance_km': round(float(np.hypot(entry['x'] - x, entry['y'] - y)), 2)})
+        return results[:n]
+
+
+class ComparablesStore:
+    """Lazily (re)loads the index when a cleaned listings file changes.
+
+    `paths` are tried in order (e.g. the Parquet copy, then the CSV); a file
+    without coordinate columns (written by an older pipeline) is skipped.
+    """
+
+    def __init__(self, *paths):
+        self.paths  = paths
+        self._lock  = threading.Lock()
+        self._index = None
+        self._stamp = None
+
+    def _current_stamp(self):
+        stamp = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _load(self):
+        for path in self.paths:
+            if not os.path.exists(path):
+                continue
+            try:
+                return ComparablesIndex.from_path(path)
+            except (ValueError, KeyError) as e:
+                log.warning("Cannot index %s for comparables: %s", path, e)
+        return None
+
+    def get(self):
+        """The current index, or None when no usable listings file exists."""
+        stamp = self._current_stamp()
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    self._index = self._load()
+                    self._stamp = stamp
+        return self._index
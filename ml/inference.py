@@ -0,0 +1,299 @@
+import threading
+import numpy as np
+
+from ml.localities import LocalityTable
+
+# Node arrays persisted by ml.artifacts, in this order.
+FOREST_ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots', 'inits', 'segments')
+
+# Rows x trees walked per batch block; keeps the node matrix cache-sized
+# however many models the forest fuses.
+PREDICT_BLOCK_NODES = 1 << 15
+
+# Quantiles of the published fair-rent range (an 80% prediction interval).
+BAND_QUANTILES = (0.1, 0.9)
+# Fixed range around the point estimate for artifacts without quantile models.
+BAND_LOW, BAND_HIGH = 0.95, 1.05
+
+
+class CompiledForest:
+    """Flat NumPy copy of one or more fitted (Hist)GradientBoostingRegressors.
+
+    Every tree of every model is packed into shared node arrays (feature,
+    threshold, left, right, value). Leaves point back to themselves so all
+    trees can be walked in lock-step for `depth` steps; with several models
+    (the point estimate plus its quantile models) one walk scores them all,
+    and `segments` marks where each model's trees start. Results are
+    bit-identical to `model.predict`: inputs are cast to the dtype sklearn
+    uses (float32 for GradientBoosting, float64 for HistGradientBoosting)
+    and leaf values are summed tree by tree in the same order.
+    """
+
+    def __init__(self, *models):
+        if not models:
+            raise ValueError("Nothing to compile.")
+        trees, inits, dtypes, counts = [], [], set(), []
+        for model in models:
+            kind = type(model).__name__
+            if kind == 'HistGradientBoostingRegressor':
+                model_trees, init, dtype = self._hist_trees(model)
+            elif kind == 'GradientBoostingRegressor':
+                model_trees, init, dtype = self._gb_trees(model)
+            else:
+                raise ValueError(f"Cannot compile {kind}.")
+            if model.n_features_in_ != models[0].n_features_in_:
+                raise ValueError("All compiled models must take the same features.")
+            trees += model_trees
+            inits.append(init)
+            dtypes.add(dtype)
+            counts.append(len(model_trees))
+        if len(dtypes) > 1:
+            raise ValueError("Cannot compile GradientBoosting and HistGradientBoosting models together.")
+
+        offsets = np.cumsum([0] + [len(t[0]) for t in trees[:-1]])
+
+        feature, threshold, left, right, value = [], [], [], [], []
+        for off, (t_feature, t_threshold, t_left, t_right, t_value, is_leaf) in zip(offsets, trees):
+            own = np.arange(len(t_feature)) + off
+            feature.append(np.where(is_leaf, 0, t_feature))
+            threshold.append(np.where(is_leaf, np.inf, t_threshold))
+            left.append(np.where(is_leaf, own, t_left + off))
+            right.append(np.where(is_leaf, own, t_right + off))
+            value.append(t_value)
+
+        self.feature     = np.concatenate(feature).astype(np.intp)
+        self.threshold   = np.concatenate(threshold).astype(np.float64)
+        self.left        = np.concatenate(left).astype(np.intp)
+        self.right       = np.concatenate(right).astype(np.intp)
+        self.value       = np.concatenate(value).astype(np.float64)
+        self.roots       = offsets.astype(np.intp)
+        self.inits       = np.array(inits, dtype=np.float64)
+        self.segments    = np.cumsum([0] + counts).astype(np.intp)
+        self.depth       = max(self._depth(t[2], t[3], t[5]) for t in trees)
+        self.n_features  = models[0].n_features_in_
+        self.input_dtype = dtypes.pop()
+        self._pack_children()
+
+    @classmethod
+    def from_arrays(cls, arrays, depth, n_features, input_dtype):
+        """Rebuilds a forest from saved node arrays (which may be read-only mmaps)."""
+        forest = cls.__new__(cls)
+        for name in FOREST_ARRAYS:
+            # Plain ndarray views of the same pages: indexing an np.memmap
+            # wraps every gathered result in the subclass, which dominates a walk.
+            setattr(forest, name, np.asarray(arrays[name]))
+        forest.depth       = int(depth)
+        forest.n_features  = int(n_features)
+        forest.input_dtype = np.dtype(input_dtype).type
+        forest._pack_children()
+        return forest
+
+    def _pack_children(self):
+        # children[2*node] = right, children[2*node + 1] = left, so one step of
+        # the batch walk is `children[2*node + go_left]` (a single gather).
+        self.children = np.stack([np.asarray(self.right), np.asarray(self.left)], axis=1).ravel()
+        counts = np.diff(self.segments)
+        self._trees_per_model = int(counts[0]) if (counts == counts[0]).all() else 0
+
+    @property
+    def n_outputs(self):
+        return len(self.inits)
+
+    def arrays(self):
+        return {name: getattr(self, name) for name in FOREST_ARRAYS}
+
+    @staticmethod
+    def _gb_trees(model):
+        from sklearn.dummy import DummyRegressor
+        if model.init_ != "zero" and not isinstance(model.init_, DummyRegressor):
+            raise ValueError("Only the default init estimator can be compiled.")
+        trees = []
+        for est in model.estimators_:
+            t = est[0].tree_
+            trees.append((t.feature, t.threshold, t.children_left, t.children_right,
+                          t.value[:, 0, 0] * model.learning_rate, t.children_left == -1))
+        if model.init_ == "zero":
+            init = 0.0
+        else:
+            zeros = np.zeros((1, model.n_features_in_), dtype=np.float32)
+            init  = float(model._raw_predict_init(zeros)[0, 0])
+        return trees, init, np.float32
+
+    @staticmethod
+    def _hist_trees(model):
+        if model.loss not in ("squared_error", "quantile"):
+            raise ValueError("Only squared_error and quantile HistGradientBoosting models can be compiled.")
+        if getattr(model, "is_categorical_", None) is not None:
+            raise ValueError("Categorical HistGradientBoosting models cannot be compiled.")
+        trees = []
+        for (predictor,) in model._predictors:
+            n = predictor.nodes
+            trees.append((n['feature_idx'], n['num_threshold'], n['left'].astype(np.intp),
+                          n['right'].astype(np.intp), n['value'], n['is_leaf'].astype(bool)))
+        return trees, float(model._baseline_prediction.ravel()[0]), np.float64
+
+    @staticmethod
+    def _depth(left, right, is_leaf):
+        depth, frontier = 0, [0]
+        while True:
+            frontier = [c for n in frontier if not is_leaf[n] for c in (left[n], right[n])]
+            if not frontier:
+                return depth
+            depth += 1
+
+    def _leaves(self, Xc):
+        """Walk every tree for every row; returns leaf ids of shape (n, n_trees)."""
+        flat  = Xc.ravel()
+        base  = (np.arange(Xc.shape[0]) * Xc.shape[1])[:, None]
+        nodes = np.broadcast_to(self.roots, (Xc.shape[0], self.roots.size))
+        for _ in range(self.depth):
+            go_left = flat.take(base + self.feature.take(nodes)) <= self.threshold.take(nodes)
+            nodes   = self.children.take(2 * nodes + go_left)
+        return nodes
+
+    def _sum(self, leaf_vals):
+        """init + leaf values per model, shape (..., n_outputs). accumulate is
+        strictly left-to-right, matching sklearn's summation order."""
+        shape = leaf_vals.shape[:-1]
+        if self._trees_per_model:
+            # Equal-sized models: one accumulate over a (..., n_outputs, trees + 1) view.
+            acc = np.empty(shape + (self.n_outputs, self._trees_per_model + 1), dtype=np.float64)
+            acc[..., 0]  = self.inits
+            acc[..., 1:] = leaf_vals.reshape(shape + (self.n_outputs, self._trees_per_model))
+            return np.add.accumulate(acc, axis=-1)[..., -1]
+        out = np.empty(shape + (self.n_outputs,), dtype=np.float64)
+        for k in range(self.n_outputs):
+            lo, hi = self.segments[k], self.segments[k + 1]
+            acc = np.empty(shape + (hi - lo + 1,), dtype=np.float64)
+            acc[..., 0]  = self.inits[k]
+            acc[..., 1:] = leaf_vals[..., lo:hi]
+            out[..., k] = np.add.accumulate(acc, axis=-1)[..., -1]
+        return out
+
+    def predict(self, X):
+        """Raw (log-space) predictions, shape (n, n_outputs), for a 2-D float array."""
+        Xc = np.ascontiguousarray(X, dtype=self.input_dtype)
+        if Xc.ndim != 2 or Xc.shape[1] != self.n_features:
+            raise ValueError(f"Expected shape (n, {self.n_features}), got {Xc.shape}")
+        out = np.empty((Xc.shape[0], self.n_outputs), dtype=np.float64)
+        # Walk in cache-sized blocks: the (rows, trees) node matrix stays small.
+        block_rows = max(1, PREDICT_BLOCK_NODES // self.roots.size)
+        for lo in range(0, Xc.shape[0], block_rows):
+            block = Xc[lo:lo + block_rows]
+            out[lo:lo + block.shape[0]] = self._sum(self.value[self._leaves(block)])
+        return out
+
+    def predict_one(self, x):
+        """Raw predictions, shape (n_outputs,), for a single 1-D feature vector."""
+        xc   = np.asarray(x, dtype=self.input_dtype)
+        node = self.roots
+        for _ in range(self.depth):
+            node = np.where(xc[self.feature[node]] <= self.threshold[node],
+                            self.left[node], self.right[node])
+        return self._sum(self.value[node])
+
+
+class RentPredictor:
+    """Scores `_run_model` inputs without building a DataFrame.
+
+    Forest output 0 is the point estimate; outputs 1 and 2, when present, are
+    the BAND_QUANTILES models that bound the published range. Column
+    positions for BHK, Area, Locality_Value and every `city_*` /
+    `Furnishing_*` dummy are resolved once; each thread reuses its own
+    preallocated float64 feature vector. Locality encodings come from a
+    LocalityTable rather than a per-worker dict.
+    """
+
+    def __init__(self, forest, feature_columns, localities, global_mean_rent):
+        self.forest           = forest
+        self.feature_columns  = list(feature_columns)
+        self.localities       = localities
+        self.global_mean_rent = float(global_mean_rent)
+
+        col = {name: i for i, name in enumerate(self.feature_columns)}
+        self.idx_bhk        = col['BHK']
+        self.idx_area       = col['Area']
+        self.idx_locality   = col['Locality_Value']
+        self.city_idx       = {c[len('city_'):]: i for c, i in col.items()
+                               if c.startswith('city_')}
+        self.furnishing_idx = {c[len('Furnishing_'):]: i for c, i in col.items()
+                               if c.startswith('Furnishing_')}
+        self._local = threading.local()
+
+    @classmethod
+    def from_model(cls, model, feature_columns, locality_value_map, global_mean_rent,
+                   band_models=(), locality_map=None):
+        forest = CompiledForest(model, *band_models)
+        localities = LocalityTable.build(locality_value_map, locality_map or {}, forest.input_dtype)
+        return cls(forest, feature_columns, localities, global_mean_rent)
+
+    def _vector(self):
+        vec = getattr(self._local, 'vec', None)
+        if vec is None:
+            vec = self._local.vec = np.zeros(len(self.feature_columns), dtype=np.float64)
+        else:
+            vec.fill(0.0)
+        return vec
+
+    def features(self, city, locality, bhk, area, furnishing):
+        vec = self._vector()
+        vec[self.idx_bhk]      = bhk
+        vec[self.idx_area]     = area
+        vec[self.idx_locality] = self.localities.value(locality, self.global_mean_rent)
+        if city in self.city_idx:
+            vec[self.city_idx[city]] = 1
+        if furnishing in self.furnishing_idx:
+            vec[self.furnishing_idx[furnishing]] = 1
+        return vec
+
+    def predict_log(self, city, locality, bhk, area, furnishing):
+        return float(self.forest.predict_one(self.features(city, locality, bhk, area, furnishing))[0])
+
+    @property
+    def has_band(self):
+        return self.forest.n_outputs >= 3
+
+    def rent_range(self, raw):
+        """(low, fair, high) rents from raw forest output(s) of shape (..., n_outputs).
+
+        Quantile models are fit independently, so their bounds are clamped to
+        contain the point estimate; without them the fixed BAND_LOW/HIGH applies.
+        """
+        rents = np.expm1(raw)
+        fair  = rents[..., 0]
+        if not self.has_band:
+            return fair * BAND_LOW, fair, fair * BAND_HIGH
+        return np.minimum(rents[..., 1], fair), fair, np.maximum(rents[..., 2], fair)
+
+    def locality_values(self, localities):
+        """Locality_Value column for `localities`, global_mean_rent when unknown."""
+        return self.localities.values(localities, self.global_mean_rent)
+
+    @staticmethod
+    def _one_hot(X, values, index):
+        uniq, inv = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+        cols = np.array([index.get(u, -1) for u in uniq], dtype=np.intp)[inv.ravel()]
+        rows = np.nonzero(cols >= 0)[0]
+        X[rows, cols[rows]] = 1
+
+    def feature_matrix(self, cities, localities, bhks, areas, furnishings):
+        """Builds the (n, len(feature_columns)) matrix for column-wise inputs."""
+        X = np.zeros((len(bhks), len(self.feature_columns)), dtype=np.float64)
+        if X.shape[0] == 0:
+            return X
+        X[:, self.idx_bhk]      = bhks
+        X[:, self.idx_area]     = areas
+        X[:, self.idx_locality] = self.locality_values(localities)
+        self._one_hot(X, cities, self.city_idx)
+        self._one_hot(X, furnishings, self.furnishing_idx)
+        return X
+
+    def predict_raw_batch(self, cities, localities, bhks, areas, furnishings):
+        """Every forest output, shape (n, n_outputs), from one vectorized walk."""
+        X = self.feature_matrix(cities, localities, bhks, areas, furnishings)
+        if X.shape[0] == 0:
+            return np.empty((0, self.forest.n_outputs), dtype=np.float64)
+        return self.forest.predict(X)
+
+    def predict_log_batch(self, cities, localities, bhks, areas, furnishings):
+        return self.predict_raw_batch(cities, localities, bhks, areas, furnishings)[:, 0]
@@ -0,0 +1,253 @@
+"""Typeahead and fuzzy resolution over the model's known localities.
+
+Built once per model version from `locality_map` (city -> [locality]). Each
+name gets a normalized key (lowercase, punctuation dropped, letters and
+digits split, common abbreviations such as "extn" -> "extension" expanded),
+and per city the index keeps:
+
+- `exact`: normalized key -> name, so "kalkaji  ", "KALKAJI" and "Kalkaji"
+  resolve to one locality
+- `tails`: every word-suffix of every key, sorted, so "nag" finds "Laxmi
+  Nagar" with one bisect
+- `postings`: trigram -> ids (pg_trgm-style, words padded with spaces) for
+  misspellings ("Andheri Wst"), scored with a Dice coefficient in which each
+  trigram is weighted by its IDF within the city, so a shared "extension" or
+  "nagar" counts for less than a shared "kalkaji"
+
+`/localities` searches the index; `/predict` resolves a locality that is not
+an exact name to its best match only when that match is unambiguous: a Dice
+score of at least RESOLVE_MIN_SCORE, the same sector numbers, letters and
+roman numerals ("Sector 99" never becomes "Sector 9", "Sector C" never
+"Sector-B"), and every word a typo of a distinct word of the match ("Bandra"
+never becomes "Bandra East", "Kalkaji Extn" never "IP Extension"), with no
+other name passing those checks ("Andheri Est" could be East or West). Anything else falls
+back to the global mean as before, with suggestions for the caller.
+"""
+import re
+import math
+import time
+import bisect
+import threading
+import unicodedata
+from collections import Counter
+
+ALIASES = {
+    'extn': 'extension', 'ext': 'extension', 'sec': 'sector', 'sect': 'sector',
+    'ph': 'phase', 'rd': 'road', 'mkt': 'market', 'stn': 'station', 'apts': 'apartments',
+}
+# Lowest Dice similarity a typeahead suggestion and a /predict resolution need.
+SEARCH_MIN_SCORE  = 0.3
+RESOLVE_MIN_SCORE = 0.5
+# Longest word a /predict resolution may change by one edit only.
+MAX_ONE_EDIT_LEN  = 5
+
+_TOKEN = re.compile(r'[a-z]+|\d+')
+_ROMAN = re.compile(r'[ivx]{1,4}')
+_MATCH_PREFIX, _MATCH_WORD, _MATCH_FUZZY = 0, 1, 2
+_MATCH_NAMES = ('prefix', 'word', 'fuzzy')
+
+
+def normalize_locality(name):
+    """'Kalkaji Extn.' -> 'kalkaji extension'; 'Sector-15A' -> 'sector 15 a'."""
+    text = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode().lower()
+    return ' '.join(ALIASES.get(t, t) for t in _TOKEN.findall(text))
+
+
+def _typo_distance(a, b):
+    """Optimal string alignment distance: edits, counting a swap of two
+    neighbouring characters as one."""
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        row = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], prev2[j - 2] + 1)
+        prev2, prev = prev, row
+    return prev[-1]
+
+
+def _same_words(key, other):
+    """True when each word of `key` is a typo (one edit, two in words longer
+    than MAX_ONE_EDIT_LEN) of a distinct word of `other`, in any order."""
+    words, unused = key.split(), other.split()
+    if len(words) != len(unused):
+        return False
+    for word in words:
+        allowed = 1 if len(word) <= MAX_ONE_EDIT_LEN else 2
+        match = next((w for w in unused if _typo_distance(word, w) <= allowed), None)
+        if match is None:
+            return False
+        unused.remove(match)
+    return True
+
+
+def _shape(key):
+    """Word count and the number, letter and roman numeral tokens, in order;
+    a fuzzy resolution must keep both, so only spelling can differ."""
+    words = key.split()
+    return len(words), tuple(w for w in words if w.isdigit() or _ROMAN.fullmatch(w) or len(w) == 1)
+
+
+def _trigrams(key):
+    grams = set()
+    for word in key.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+class _CityIndex:
+    def __init__(self, names):
+        # Clean spellings first, so they win when two names share a key
+        # (' Kharadi' and 'Kharadi', 'Borivali (West)' and 'Borivali West').
+        self.names = sorted(dict.fromkeys(names), key=lambda n: (n != ' '.join(n.split()), n))
+        self.ids   = {name: i for i, name in enumerate(self.names)}
+        self.keys  = [normalize_locality(n) for n in self.names]
+        self.shapes = [_shape(key) for key in self.keys]
+        self.exact = {}
+        for i, key in enumerate(self.keys):
+            self.exact.setdefault(key, i)
+
+        self.tails = sorted((key[m.start():], i) for i, key in enumerate(self.keys)
+                            for m in re.finditer(r'\S+', key))
+        grams = [_trigrams(key) for key in self.keys]
+        self.postings = {}
+        for i, key_grams in enumerate(grams):
+            for gram in key_grams:
+                self.postings.setdefault(gram, []).append(i)
+        # a trigram no name has weighs as much as the rarest one
+        self.unseen_weight = math.log(1 + len(self.names))
+        self.weights = {gram: math.log(1 + len(self.names) / len(ids))
+                        for gram, ids in self.postings.items()}
+        self.mass = [sum(self.weights[g] for g in key_grams) for key_grams in grams]
+        self.alphabetical = sorted(range(len(self.names)), key=lambda i: self.names[i].strip().lower())
+
+    def similar(self, grams):
+        """{id: weighted Dice score} for ids sharing at least one trigram."""
+        shared, mass = Counter(), 0.0
+        for gram in grams:
+            weight = self.weights.get(gram, self.unseen_weight)
+            mass += weight
+            for i in self.postings.get(gram, ()):
+                shared[i] += weight
+        return {i: 2 * w / (mass + self.mass[i]) for i, w in shared.items()}
+
+
+class LocalityIndex:
+    """Immutable search index over a city -> [locality] mapping."""
+
+    def __init__(self, locality_map):
+        start = time.perf_counter()
+        self.cities    = {city: _CityIndex(names) for city, names in locality_map.items()}
+        self.size      = sum(len(c.names) for c in self.cities.values())
+        self.build_ms  = (time.perf_counter() - start) * 1000
+        self._by_lower = {city.lower(): city for city in self.cities}
+
+    def city(self, name):
+        """Canonical spelling of a city (case-insensitive), or None."""
+        name = str(name).strip()
+        return name if name in self.cities else self._by_lower.get(name.lower())
+
+    def search(self, city, query='', limit=10):
+        """Ranked suggestions for `query` in `city`: prefix matches on the whole
+        name, then on a later word, then trigram matches. An empty query lists
+        the city's localities alphabetically. Raises KeyError for an unknown city.
+        """
+        index = self.cities[city]
+        key = normalize_locality(query)
+        if not key:
+            ids = index.alphabetical[:limit] if limit else index.alphabetical
+            return [{'locality': index.names[i]} for i in ids]
+
+        grams  = _trigrams(key)
+        scores = index.similar(grams)
+        tiers  = {}
+        pos = bisect.bisect_left(index.tails, (key, -1))
+        while pos < len(index.tails) and index.tails[pos][0].startswith(key):
+            tail, i = index.tails[pos]
+            tier = _MATCH_PREFIX if len(tail) == len(index.keys[i]) else _MATCH_WORD
+            tiers[i] = min(tiers.get(i, tier), tier)
+            pos += 1
+        for i, score in scores.items():
+            if i not in tiers and score >= SEARCH_MIN_SCORE:
+                tiers[i] = _MATCH_FUZZY
+
+        # one entry per normalized key, so near-duplicate spellings are not suggested twice
+        ranked, seen = [], set()
+        for i in sorted(tiers, key=lambda i: (tiers[i], -scores.get(i, 0.0), index.names[i])):
+            if index.keys[i] not in seen:
+                seen.add(index.keys[i])
+                ranked.append({'locality': index.names[i], 'match': _MATCH_NAMES[tiers[i]],
+                               'score': round(scores.get(i, 0.0), 3)})
+                if len(ranked) == limit:
+                    break
+        return ranked
+
+    def resolve(self, city, locality):
+        """(city, locality, how): the model's spelling of both, and how the
+        locality matched: 'exact', 'normalized', 'fuzzy', or None when no
+        single name is close enough (the input is returned and the model uses
+        its global mean, as for any unknown locality).
+        """
+        index = self.cities.get(city)
+        if index is None:
+            city  = self.city(city) or city
+            index = self.cities.get(city)
+            if index is None:
+                return city, locality, None
+        if locality in index.ids:
+            return city, locality, 'exact'
+        key = normalize_locality(locality)
+        i = index.exact.get(key)
+        if i is not None:
+            return city, index.names[i], 'normalized'
+        if key:
+            shape = _shape(key)
+            # one id per normalized key (ids of a key are spellings of one place)
+            matches = {}
+            for i, score in index.similar(_trigrams(key)).items():
+                if (score >= RESOLVE_MIN_SCORE and index.shapes[i] == shape
+                        and _same_words(key, index.keys[i])):
+                    matches[index.keys[i]] = min(i, matches.get(index.keys[i], i))
+            if len(matches) == 1:
+                return city, index.names[next(iter(matches.values()))], 'fuzzy'
+        return city, locality, None
+
+
+class LocalityIndexStore:
+    """Hands out the LocalityIndex for a ModelBundle, rebuilt when the version changes."""
+
+    def __init__(self):
+        self._lock    = threading.Lock()
+        self._current = None   # (version, LocalityIndex)
+        self.builds   = 0
+        self.resolved = Counter()
+
+    def get(self, bundle):
+        current = self._current
+        if current is None or current[0] != bundle.version:
+            with self._lock:
+                if self._current is None or self._current[0] != bundle.version:
+                    self._current = (bundle.version, LocalityIndex(bundle.locality_map))
+                    self.builds += 1
+                current = self._current
+        return current[1]
+
+    def resolve(self, bundle, city, locality):
+        """`LocalityIndex.resolve` on the bundle's index, counted by outcome."""
+        city, locality, how = self.get(bundle).resolve(city, locality)
+        self.resolved[how or 'unresolved'] += 1
+        return city, locality, how
+
+    def stats(self):
+        current = self._current
+        index = current[1] if current else None
+        return {
+            "version": current[0] if current else None,
+            "localities": index.size if index else 0,
+            "build_ms": round(index.build_ms, 2) if index else None,
+            "builds": self.builds,
+            "resolved": {how: self.resolved[how]
+                         for how in ('exact', 'normalized', 'fuzzy', 'unresolved')},
+        }
@@ -0,0 +1,166 @@
+import os
+import time
+import logging
+import threading
+import numpy as np
+
+from ml.artifacts import ArtifactStore
+
+log = logging.getLogger(__name__)
+
+# Fixed inputs every candidate model must score sanely before it goes live.
+SMOKE_TEST_INPUTS = [
+    ('Mumbai', 'Andheri West', 2, 1000.0, 'Semi-Furnished'),
+    ('Mumbai', 'Powai', 3, 1500.0, 'Furnished'),
+    ('Delhi', 'Kalkaji', 2, 900.0, 'Furnished'),
+    ('Delhi', 'Dwarka', 1, 500.0, 'Unfurnished'),
+    ('Pune', 'Lohegaon', 2, 906.0, 'Unfurnished'),
+    ('Pune', 'Unknown Locality', 4, 2200.0, 'Semi-Furnished'),
+]
+MIN_SANE_RENT = 1_000
+MAX_SANE_RENT = 10_000_000
+REQUIRED_COLUMNS = ('BHK', 'Area', 'Locality_Value')
+
+
+class ModelValidationError(ValueError):
+    pass
+
+
+def validate_bundle(bundle):
+    """Raises ModelValidationError unless the bundle scores the smoke-test set sanely."""
+    missing = [c for c in REQUIRED_COLUMNS if c not in bundle.predictor.feature_columns]
+    if missing:
+        raise ModelValidationError(f"feature_columns missing {missing}")
+    if not bundle.locality_map:
+        raise ModelValidationError("locality map is empty")
+
+    predictor = bundle.predictor
+    # Every forest output (point estimate and band quantiles), per row and batched.
+    single = np.array([predictor.forest.predict_one(predictor.features(*row))
+                       for row in SMOKE_TEST_INPUTS])
+    batch  = predictor.predict_raw_batch(*zip(*SMOKE_TEST_INPUTS))
+    if not np.array_equal(single, batch):
+        raise ModelValidationError("single-row and batch scoring disagree")
+    rents = np.expm1(single)
+    if not np.all(np.isfinite(rents)):
+        raise ModelValidationError("non-finite prediction on smoke-test set")
+    if rents.min() < MIN_SANE_RENT or rents.max() > MAX_SANE_RENT:
+        raise ModelValidationError(
+            f"smoke-test rents {rents.min():.0f}..{rents.max():.0f} outside "
+            f"[{MIN_SANE_RENT}, {MAX_SANE_RENT}]")
+
+
+class ModelRegistry:
+    """Holds the active ModelBundle and swaps it atomically on reload.
+
+    Callers take one `registry.current` snapshot per request and use only that
+    bundle, so a concurrent swap can never mix old and new parts. New
+    artifacts are picked up by `reload()` (admin trigger) or by a watcher
+    thread polling the models directory every `watch_interval` seconds; a
+    candidate only goes live after `validate_bundle` passes.
+    """
+
+    def __init__(self, models_dir, watch_interval=0.0):
+        self.store          = ArtifactStore(models_dir)
+        self.watch_interval = watch_interval
+        self._bundle        = None
+        self._fingerprint   = None
+        self._load_lock     = threading.Lock()
+        self._watcher_pid   = None
+        self.loaded_at      = None
+        self.reloads = self.failed_reloads = 0
+        self.last_error = None
+
+    @property
+    def current(self):
+        bundle = self._bundle
+        if bundle is None:
+            with self._load_lock:
+                if self._bundle is None:
+                    bundle = self.store.load_bundle()
+                    validate_bundle(bundle)
+                    # read after loading, which may re-export the compiled manifest
+                    self._activate(bundle, self.store.fingerprint())
+                bundle = self._bundle
+        if self._watcher_pid != os.getpid():
+            self._start_watcher()
+        return bundle
+
+    @property
+    def version(self):
+        return self.current.version
+
+    @property
+    def loaded_version(self):
+        """Active version without forcing a load (None until first use)."""
+        bundle = self._bundle
+        return bundle.version if bundle is not None else None
+
+    def _activate(self, bundle, fingerprint):
+        self._bundle      = bundle   # single reference assignment == atomic swap
+        self._fingerprint = fingerprint
+        self.loaded_at    = time.time()
+
+    def reload(self, force=False):
+        """Loads, validates and activates the artifact on disk.
+
+        Returns (swapped, version). On failure the old bundle stays active.
+        """
+        with self._load_lock:
+            fingerprint = self.store.fingerprint()
+            if not force and self._bundle is not None and fingerprint == self._fingerprint:
+                return False, self._bundle.version
+            try:
+                bundle = self.store.load_bundle()
+                validate_bundle(bundle)
+            except Exception as e:
+                self.failed_reloads += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                # don't retry the same broken files (loading may have re-exported them)
+                self._fingerprint = self.store.fingerprint()
+                log.warning("Model reload rejected: %s", self.last_error)
+                raise
+            previous = self._bundle.version if self._bundle else None
+            # re-read, as in `current`
+            self._activate(bundle, self.store.fingerprint())
+            self.reloads += 1
+            log.info("Model %s -> %s", previous, bundle.version)
+            return bundle.version != previous, bundle.version
+
+    def warm(self):
+        _ = self.current
+        return self
+
+    def _start_watcher(self):
+        # Per process: a watcher started in a preloading master dies at fork.
+        with self._load_lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+        if self.watch_interval > 0:
+            threading.Thread(target=self._watch, name="model-watcher", daemon=True).start()
+
+    def _watch(self):
+        seen = None
+        while True:
+            time.sleep(self.watch_interval)
+            fingerprint = self.store.fingerprint()
+            # act only once the files have stopped changing for a full interval
+            if fingerprint != self._fingerprint and fingerprint == seen:
+                try:
+                    self.reload()
+                except Exception:
+                    pass
+            seen = fingerprint
+
+    def stats(self):
+        bundle = self._bundle
+        return {
+            "version": bundle.version if bundle else None,
+            "model_type": bundle.manifest.get('model_type') if bundle else None,
+            "loaded_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.loaded_at))
+                         if self.loaded_at else None,
+            "reloads": self.reloads, "failed_reloads": self.failed_reloads,
+            "last_error": self.last_error,
+            "watch_interval": self.watch_interval,
+        }
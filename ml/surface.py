@@ -0,0 +1,293 @@
+"""Precomputed rent surface: every locality x BHK x furnishing x area bucket.
+
+`models/surface/<model version>/` holds `fair_rent_low.npy`, `fair_rent.npy`
+and `fair_rent_high.npy` (int32, shape [locality, bhk, furnishing, area]) plus
+`meta.json` with the axis labels. Localities are sorted by (city, name), so
+a city is one contiguous row range and every query is an index lookup and a
+slice over at most a few hundred values.
+"""
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+import numpy as np
+
+try:
+    import fcntl   # POSIX; elsewhere every process builds its own surface
+except ImportError:
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+SURFACE_DIRNAME = 'surface'
+SURFACE_ARRAYS  = ('fair_rent_low', 'fair_rent', 'fair_rent_high')
+BHKS = np.arange(1, 6)
+# 50 sq ft steps where most listings are, coarser for large homes.
+AREA_BUCKETS = np.concatenate([np.arange(250, 1500, 50), np.arange(1500, 3000, 100),
+                               np.arange(3000, 10001, 250)]).astype(np.float64)
+# Used when an explore query does not name an area (≈ median listing size).
+TYPICAL_AREA = {1: 600, 2: 1000, 3: 1700, 4: 2500, 5: 3500}
+BUILD_CHUNK_ROWS = 200_000
+
+
+def locality_map_sha256(locality_map):
+    return hashlib.sha256(json.dumps(dict(locality_map), sort_keys=True).encode()).hexdigest()
+
+
+class RentSurface:
+    """Read-only, index-based view over the precomputed arrays."""
+
+    def __init__(self, arrays, meta):
+        self.meta        = meta
+        self.version     = meta['model_version']
+        self.cities      = meta['cities']
+        self.localities  = meta['localities']
+        self.furnishings = meta['furnishings']
+        self.bhks        = meta['bhks']
+        self.areas       = np.asarray(meta['areas'], dtype=np.float64)
+        self.low         = arrays['fair_rent_low']
+        self.fair        = arrays['fair_rent']
+        self.high        = arrays['fair_rent_high']
+
+        self._index = {}
+        self._city_rows = {}
+        for city, (start, stop) in zip(self.cities, meta['city_rows']):
+            self._city_rows[city] = (start, stop)
+            for i in range(start, stop):
+                self._index[(city, self.localities[i])] = i
+
+    # ── build / persist ──────────────────────────────────────────────────────
+
+    @classmethod
+    def build(cls, predictor, locality_map, model_version, areas=AREA_BUCKETS):
+        """Scores the whole grid with chunked, vectorized forest calls."""
+        cities = sorted(locality_map)
+        localities, city_rows = [], []
+        for city in cities:
+            start = len(localities)
+            localities += sorted(locality_map[city])
+            city_rows.append((start, len(localities)))
+        row_city = np.repeat(np.arange(len(cities)), [b - a for a, b in city_rows])
+        furnishings = sorted(predictor.furnishing_idx)
+        areas = np.asarray(areas, dtype=np.float64)
+
+        shape = (len(localities), len(BHKS), len(furnishings), len(areas))
+        loc, bhk, furn, area = (a.ravel() for a in np.indices(shape))
+        city_col = np.array([predictor.city_idx.get(c, -1) for c in cities], dtype=np.intp)[row_city]
+        furn_col = np.array([predictor.furnishing_idx[f] for f in furnishings], dtype=np.intp)
+        loc_vals = predictor.locality_values(localities)
+
+        low, fair, high = (np.empty(loc.size, dtype=np.float64) for _ in range(3))
+        for lo in range(0, loc.size, BUILD_CHUNK_ROWS):
+            hi = min(lo + BUILD_CHUNK_ROWS, loc.size)
+            rows = np.arange(hi - lo)
+            X = np.zeros((hi - lo, len(predictor.feature_columns)), dtype=np.float64)
+            X[:, predictor.idx_bhk]      = BHKS[bhk[lo:hi]]
+            X[:, predictor.idx_area]     = areas[area[lo:hi]]
+            X[:, predictor.idx_locality] = loc_vals[loc[lo:hi]]
+            cc = city_col[loc[lo:hi]]
+            X[rows[cc >= 0], cc[cc >= 0]] = 1
+            X[rows, furn_col[furn[lo:hi]]] = 1
+            low[lo:hi], fair[lo:hi], high[lo:hi] = predictor.rent_range(predictor.forest.predict(X))
+
+        arrays = {name: np.round(values, 0).astype(np.int32).reshape(shape)
+                  for name, values in zip(SURFACE_ARRAYS, (low, fair, high))}
+        meta = {'model_version': model_version, 'cities': cities, 'city_rows': city_rows,
+                'localities': localities, 'bhks': BHKS.tolist(), 'furnishings': furnishings,
+                'areas': areas.tolist(), 'locality_map_sha256': locality_map_sha256(locality_map)}
+        return cls(arrays, meta)
+
+    def save(self, surface_dir):
+        """Writes `<surface_dir>/<version>/` atomically (tmp dir + rename)."""
+        version_dir = os.path.join(surface_dir, self.version)
+        tmp_dir = f"{version_dir}.tmp-{os.getpid()}"
+        os.makedirs(tmp_dir, exist_ok=True)
+        for name, arr in zip(SURFACE_ARRAYS, (self.low, self.fair, self.high)):
+            np.save(os.path.join(tmp_dir, f'{name}.npy'), np.ascontiguousarray(arr))
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump(self.meta, f)
+        shutil.rmtree(version_dir, ignore_errors=True)
+        try:
+            os.rename(tmp_dir, version_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return version_dir
+
+    @classmethod
+    def load(cls, surface_dir, version, mmap=True):
+        version_dir = os.path.join(surface_dir, version)
+        with open(os.path.join(version_dir, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(version_dir, f'{name}.npy'),
+                                mmap_mode='r' if mmap else None)
+                  for name in SURFACE_ARRAYS}
+        return cls(arrays, meta)
+
+    # ── queries ──────────────────────────────────────────────────────────────
+
+    def area_index(self, area):
+        """Nearest area bucket."""
+        i = int(np.searchsorted(self.areas, area))
+        if i == len(self.areas) or (i > 0 and area - self.areas[i - 1] <= self.areas[i] - area):
+            i -= 1
+        return i
+
+    def _axis(self, values, value, name):
+        try:
+            return values.index(value)
+        except ValueError:
+            raise KeyError(f"Unknown {name} '{value}'.") from None
+
+    def rank(self, city, bhk, furnishing, area=None, min_rent=None, max_rent=None,
+             limit=20, descending=False):
+        """Localities of `city` ordered by fair rent for one configuration."""
+        if city not in self._city_rows:
+            raise KeyError(f"Unknown city '{city}'.")
+        start, stop = self._city_rows[city]
+        b = self._axis(self.bhks, int(bhk), 'bhk')
+        f = self._axis(self.furnishings, furnishing, 'furnishing')
+        a = self.area_index(area if area is not None else TYPICAL_AREA.get(int(bhk), 1000))
+
+        low  = np.asarray(self.low[start:stop, b, f, a])
+        fair = np.asarray(self.fair[start:stop, b, f, a])
+        high = np.asarray(self.high[start:stop, b, f, a])
+        keep = np.ones(fair.size, dtype=bool)
+        if min_rent is not None:
+            keep &= fair >= min_rent
+        if max_rent is not None:
+            keep &= fair <= max_rent
+        rows = np.nonzero(keep)[0]
+        order = rows[np.argsort(-fair[rows] if descending else fair[rows], kind='stable')][:limit]
+
+        area_value = float(self.areas[a])
+        return area_value, [{'locality': self.localities[start + i],
+                             'fair_rent_low': int(low[i]), 'fair_rent_high': int(high[i]),
+                             'fair_rent': int(fair[i]),
+                             'rent_per_sqft': round(float(fair[i]) / area_value, 2)}
+                            for i in order]
+
+    def grid(self, city, locality, bhks=None, furnishings=None):
+        """Full low/fair/high grid for one locality, optionally narrowed to some BHKs / furnishings."""
+        row = self._index.get((city, locality))
+        if row is None:
+            raise KeyError(f"Unknown locality '{locality}' in {city}.")
+        b = [self._axis(self.bhks, int(x), 'bhk') for x in bhks] if bhks else list(range(len(self.bhks)))
+        f = ([self._axis(self.furnishings, x, 'furnishing') for x in furnishings]
+             if furnishings else list(range(len(self.furnishings))))
+        low  = np.asarray(self.low[row])[np.ix_(b, f)]
+        fair = np.asarray(self.fair[row])[np.ix_(b, f)]
+        high = np.asarray(self.high[row])[np.ix_(b, f)]
+        return {'bhk': [self.bhks[i] for i in b], 'furnishing': [self.furnishings[i] for i in f],
+                'area': self.areas.tolist(),
+                'fair_rent_low': low.tolist(), 'fair_rent': fair.tolist(),
+                'fair_rent_high': high.tolist()}
+
+    def cities_for(self, locality):
+        return [city for city in self.cities if (city, locality) in self._index]
+
+
+class SurfaceStore:
+    """Hands out the surface matching a ModelBundle.
+
+    A saved surface is memory-mapped on first use. When none matches the
+    live model (a fresh hot-reload), it is built in a background thread and
+    `get` returns None until it is ready, so no request waits on a full pass.
+    Builds take a lock file next to the surface, so of all the workers that
+    see a new version one builds it and the others load what it saved. A
+    build that fails is not retried until the model version changes.
+    """
+
+    def __init__(self, models_dir):
+        self.surface_dir = os.path.join(models_dir, SURFACE_DIRNAME)
+        self._lock     = threading.Lock()
+        self._surface  = None
+        self._building = None
+        self.failed_version = None   # version whose build failed; last_error says why
+        self.last_error     = None
+
+    def get(self, bundle, wait=False, build=True):
+        """The surface for `bundle`, or None while it is being built. With
+        `build=False` a missing surface is left for a later call to build."""
+        surface = self._surface
+        if surface is not None and surface.version == bundle.version:
+            return surface
+        with self._lock:
+            if self._surface is not None and self._surface.version == bundle.version:
+                return self._surface
+            if self._building != bundle.version and self.failed_version != bundle.version:
+                surface = self._load(bundle)
+                if surface is not None:
+                    self._surface = surface
+                    return surface
+                if not build:
+                    return None
+                self._building = bundle.version
+                if wait:
+                    self._build(bundle)
+                    return self._surface
+                threading.Thread(target=self._build, args=(bundle,), name="surface-build",
+                                 daemon=True).start()
+        return None
+
+    def _load(self, bundle):
+        try:
+            surface = RentSurface.load(self.surface_dir, bundle.version)
+            if surface.meta.get('locality_map_sha256') == locality_map_sha256(bundle.locality_map):
+                return surface
+            log.info("Rent surface for %s is stale; rebuilding", bundle.version)
+        except (OSError, ValueError, KeyError) as e:
+            log.info("Rent surface for %s unavailable (%s); building", bundle.version, e)
+        return None
+
+    def _build_lock(self, version):
+        """An exclusive lock file for building `version` (blocks while another
+        process holds it), or None when locking is unavailable."""
+        if fcntl is None:
+            return None
+        try:
+            os.makedirs(self.surface_dir, exist_ok=True)
+            f = open(os.path.join(self.surface_dir, f'.{version}.lock'), 'w')
+        except OSError:
+            return None
+        fcntl.flock(f, fcntl.LOCK_EX)
+        return f
+
+    def _build(self, bundle):
+        lock = None
+        try:
+            lock = self._build_lock(bundle.version)
+            # another process may have built it while this one waited for the lock
+            surface = self._load(bundle) if lock is not None else None
+            if surface is None:
+                surface = RentSurface.build(bundle.predictor, bundle.locality_map, bundle.version)
+                try:
+                    surface.save(self.surface_dir)
+                except OSError as e:
+                    log.warning("Could not write %s (%s); keeping the surface in memory",
+                                self.surface_dir, e)
+            self._surface = surface
+        except Exception as e:
+            self.failed_version = bundle.version
+            self.last_error     = f"{type(e).__name__}: {e}"
+            log.exception("Rent surface build for %s failed; not retrying for this version",
+                          bundle.version)
+        finally:
+            if lock is not None:
+                lock.close()   # releases the flock
+            self._building = None
+
+
+if __name__ == "__main__":
+    import time
+    from ml.artifacts import ArtifactStore
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    models_dir = os.path.join(BASE_DIR, 'models')
+    bundle = ArtifactStore(models_dir).load_bundle()
+    start = time.perf_counter()
+    surface = RentSurface.build(bundle.predictor, bundle.locality_map, bundle.version)
+    elapsed = time.perf_counter() - start
+    path = surface.save(os.path.join(models_dir, SURFACE_DIRNAME))
+    cells = surface.low.size
+    print(f"Scored {cells:,} combinations in {elapsed:.2f}s ({cells / elapsed:,.0f}/s); wrote {path}")
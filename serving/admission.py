@@ -0,0 +1,195 @@
+"""Token-bucket admission control for advisor chats.
+
+Every /chat/stream request takes a token from its user's bucket, and one that
+will open an upstream stream also takes one from the shared bucket sized to
+the upstream rate limit. Requests name their `flight` (the single-flight key
+of their prompt, None for an answer-cache hit); a flight already admitted and
+not yet closed shares that request's upstream stream, so only its first
+request pays. An empty bucket does not reject at once:
+the request reserves the next token and waits for it, as long as that wait
+is at most `max_wait` and fewer than `max_waiting` requests are already
+waiting. Anything beyond that is rejected with the time after which a retry
+would be admitted, so the route can answer 429 + Retry-After before opening
+a stream instead of failing it halfway with an upstream error. A caller that
+holds a thread while it waits (the sync Flask route) passes a shorter
+`max_wait` of its own.
+
+Buckets are per process, like the stream cap in Ai.apiCall.
+"""
+import os
+import math
+import time
+import heapq
+import threading
+from collections import OrderedDict
+
+
+class AdmissionRejected(RuntimeError):
+    """`reason` is the limit hit ('user', 'global' or 'queue'); `retry_after`
+    whole seconds, for the Retry-After header."""
+
+    def __init__(self, reason, retry_after):
+        self.reason      = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"Too many advisor requests, please retry in {self.retry_after}s.")
+
+
+class TokenBucket:
+    """`rate` tokens per second up to `burst`; may go negative by reservations."""
+
+    def __init__(self, rate, burst, now=None):
+        self.rate    = rate
+        self.burst   = burst
+        self.tokens  = float(burst)
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now):
+        self.tokens  = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, now):
+        """Seconds until a token reserved now would be available."""
+        self._refill(now)
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def take(self):
+        self.tokens -= 1
+
+    def full(self, now):
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+class Admission:
+    """An admitted request: wait `delay` seconds, then stream; `release()`
+    (idempotent) when the response closes."""
+
+    def __init__(self, controller, flight, delay):
+        self.delay       = delay
+        self.flight      = flight
+        self._controller = controller
+
+    def release(self):
+        controller, self._controller = self._controller, None
+        if controller is not None:
+            controller._release(self.flight)
+
+
+class AdmissionController:
+    """Per-user and global token buckets with a bounded wait queue.
+
+    A rate of 0 disables that bucket. A flight left open for `hold` seconds
+    (a response that was never closed) stops counting as in flight.
+    """
+
+    def __init__(self, global_rate=2.0, global_burst=20, user_rate=0.2, user_burst=4,
+                 max_waiting=32, max_wait=5.0, max_users=10000, hold=300.0):
+        self.global_rate  = global_rate
+        self.global_burst = global_burst
+        self.user_rate    = user_rate
+        self.user_burst   = user_burst
+        self.max_waiting  = max_waiting
+        self.max_wait     = max_wait
+        self.max_users    = max_users
+        self.hold         = hold
+
+        self._lock    = threading.Lock()
+        self._global  = TokenBucket(global_rate, global_burst) if global_rate > 0 else None
+        self._users   = OrderedDict()   # user_id -> TokenBucket
+        self._waiters = []              # heap of monotonic times queued requests become ready
+        self._flights = {}              # flight -> [open requests, last admitted]
+        self.admitted = self.queued = self.shared = 0
+        self.rejected = {'user': 0, 'global': 0, 'queue': 0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(global_rate=float(os.getenv("CHAT_RATE_PER_MIN", "120")) / 60,
+                   global_burst=int(os.getenv("CHAT_RATE_BURST", "20")),
+                   user_rate=float(os.getenv("CHAT_USER_RATE_PER_MIN", "12")) / 60,
+                   user_burst=int(os.getenv("CHAT_USER_BURST", "4")),
+                   max_waiting=int(os.getenv("CHAT_QUEUE_MAX", "32")),
+                   max_wait=float(os.getenv("CHAT_QUEUE_TIMEOUT", "5")))
+
+    def _user_bucket(self, user_id, now):
+        bucket = self._users.get(user_id)
+        if bucket is None:
+            bucket = self._users[user_id] = TokenBucket(self.user_rate, self.user_burst, now)
+            # forget the least recently seen users, once their buckets have refilled
+            while len(self._users) > self.max_users:
+                oldest = next(iter(self._users))
+                if not self._users[oldest].full(now):
+                    break
+                del self._users[oldest]
+        self._users.move_to_end(user_id)
+        return bucket
+
+    def reserve(self, user_id, flight=None, max_wait=None):
+        """An Admission whose `delay` is the seconds to wait before streaming
+        (0.0 when admitted at once). Raises AdmissionRejected when the wait
+        would exceed `max_wait` (the smaller of the argument and the
+        controller's) or the wait queue is full."""
+        max_wait = self.max_wait if max_wait is None else min(max_wait, self.max_wait)
+        now = time.monotonic()
+        with self._lock:
+            open_ = self._flights.get(flight) if flight is not None else None
+            if open_ is not None and now - open_[1] > self.hold:
+                del self._flights[flight]
+                open_ = None
+            buckets = []
+            if self.user_rate > 0:
+                buckets.append(('user', self._user_bucket(user_id, now)))
+            if flight is not None and open_ is None and self._global is not None:
+                buckets.append(('global', self._global))
+            delay = 0.0
+            for reason, bucket in buckets:
+                wait = bucket.wait_for(now)
+                if wait > max_wait:
+                    self.rejected[reason] += 1
+                    raise AdmissionRejected(reason, wait)
+                delay = max(delay, wait)
+
+            while self._waiters and self._waiters[0] <= now:
+                heapq.heappop(self._waiters)
+            if delay > 0 and len(self._waiters) >= self.max_waiting:
+                self.rejected['queue'] += 1
+                raise AdmissionRejected('queue', self._waiters[0] - now if self._waiters else delay)
+
+            for _, bucket in buckets:
+                bucket.take()
+            self.admitted += 1
+            if delay > 0:
+                self.queued += 1
+                heapq.heappush(self._waiters, now + delay)
+            if flight is not None:
+                if open_ is None:
+                    self._flights[flight] = [1, now]
+                else:
+                    open_[0] += 1
+                    open_[1] = now
+                    self.shared += 1
+            return Admission(self, flight, delay)
+
+    def _release(self, flight):
+        if flight is None:
+            return
+        with self._lock:
+            open_ = self._flights.get(flight)
+            if open_ is not None:
+                open_[0] -= 1
+                if open_[0] <= 0:
+                    del self._flights[flight]
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            waiting = sum(1 for t in self._waiters if t > now)
+            return {
+                'admitted': self.admitted,
+                'queued': self.queued,
+                'shared': self.shared,
+                'waiting': waiting,
+                'flights': len(self._flights),
+                'rejected': dict(self.rejected),
+                'users': len(self._users),
+                'global_tokens': round(self._global.tokens, 2) if self._global else None,
+            }
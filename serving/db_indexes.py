@@ -0,0 +1,40 @@
+import os
+import logging
+import threading
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
+
+log = logging.getLogger(__name__)
+
+# (collection, keys, options) — names are fixed so re-running is a no-op.
+INDEXES = [
+    ('predictions', [('user_id', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+     {'name': 'user_created_id_desc'}),
+    ('predictions', [('user_id', ASCENDING), ('timestamp', ASCENDING)],
+     {'name': 'user_timestamp'}),
+    ('users', [('email', ASCENDING)],
+     {'name': 'email_unique', 'unique': True}),
+    ('chat_sessions', [('updated_at', ASCENDING)],
+     {'name': 'chat_updated_ttl',
+      'expireAfterSeconds': int(os.getenv("CHAT_HISTORY_TTL", str(7 * 24 * 3600)))}),
+]
+
+
+def ensure_indexes(db):
+    """Creates every index in INDEXES; returns the names that were ensured."""
+    created = []
+    for collection, keys, options in INDEXES:
+        try:
+            db[collection].create_index(keys, **options)
+            created.append(options['name'])
+        except PyMongoError as e:
+            log.warning("Could not create index %s on %s: %s", options['name'], collection, e)
+    return created
+
+
+def ensure_indexes_async(db):
+    """Runs ensure_indexes off the import path so an unreachable Mongo can't stall boot."""
+    thread = threading.Thread(target=ensure_indexes, args=(db,), name="ensure-indexes",
+                              daemon=True)
+    thread.start()
+    return thread
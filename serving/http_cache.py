@@ -0,0 +1,181 @@
+"""Validators, cache lifetimes and compression for HTTP responses.
+
+Payloads that only change with the model version, the user or a template
+(the dashboard shell, a city's locality list) get an ETag derived from what
+they depend on, so a revalidation is answered with a 304 before anything is
+rendered. URLs that carry that version (`?v=`) are cached for a year.
+Everything text-like above COMPRESS_MIN_BYTES goes out gzip- or
+brotli-encoded.
+"""
+import os
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict, Counter
+from werkzeug.http import parse_accept_header
+
+# A year: model-versioned URLs never change content.
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript',
+                      'application/xml', 'image/svg+xml')
+
+_brotli = None
+
+
+def _brotli_module():
+    global _brotli
+    if _brotli is None:
+        try:
+            import brotli  # optional dependency; gzip is used without it
+        except ImportError:
+            brotli = False
+        _brotli = brotli
+    return _brotli
+
+
+def etag_for(*parts):
+    """Short content hash of `parts` (bytes or anything str() can render)."""
+    h = hashlib.blake2b(digest_size=10)
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode())
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def cache_control(immutable=False, private=True):
+    """Cache-Control for a validated response: revalidate on every use, or
+    keep for a year when the URL itself changes with the content."""
+    scope = 'private' if private else 'public'
+    if immutable:
+        return f'{scope}, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f'{scope}, no-cache'
+
+
+class AssetFingerprints:
+    """Content hashes of files under a folder (page templates), recomputed
+    when the file's mtime or size changes, for ETags that follow the file."""
+
+    def __init__(self, folder):
+        self.folder  = folder
+        self._hashes = {}   # filename -> ((mtime_ns, size), fingerprint)
+
+    def get(self, filename):
+        path = os.path.join(self.folder, filename)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self._hashes.get(filename)
+        if cached is None or cached[0] != stamp:
+            with open(path, 'rb') as f:
+                cached = (stamp, etag_for(f.read())[:12])
+            self._hashes[filename] = cached
+        return cached[1]
+
+
+class ResponseCompressor:
+    """gzip (or brotli, when installed and accepted) for response bodies of at
+    least `min_bytes` with a text-like content type.
+
+    Bodies that many requests share (an ETag plus a public or immutable
+    Cache-Control: static files, versioned locality lists) are compressed
+    once per (ETag, encoding) and kept in an LRU of `cache_size` entries.
+    Streamed responses (SSE, NDJSON) are left alone.
+    """
+
+    def __init__(self, min_bytes=1024, level=6, cache_size=128, max_bytes=8 * 1024 * 1024):
+        self.min_bytes  = min_bytes
+        self.level      = level
+        self.cache_size = cache_size
+        self.max_bytes  = max_bytes
+
+        self._lock  = threading.Lock()
+        self._cache = OrderedDict()   # (etag, encoding) -> body
+        self.responses = Counter()    # encoding -> count
+        self.bytes_in = self.bytes_out = self.hits = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(min_bytes=int(os.getenv("COMPRESS_MIN_BYTES", "1024")),
+                   level=int(os.getenv("COMPRESS_LEVEL", "6")),
+                   cache_size=int(os.getenv("COMPRESS_CACHE_SIZE", "128")))
+
+    @property
+    def enabled(self):
+        return self.min_bytes >= 0
+
+    def encoding_for(self, accept_encoding):
+        """'br', 'gzip' or None for an Accept-Encoding header value."""
+        offers = ['br', 'gzip'] if _brotli_module() else ['gzip']
+        return parse_accept_header(accept_encoding or '').best_match(offers)
+
+    def _compress(self, data, encoding):
+        if encoding == 'br':
+            return _brotli_module().compress(data, quality=min(self.level, 11))
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    def encode(self, data, accept_encoding, etag=None):
+        """(body, encoding): `data` compressed for the client, or unchanged
+        with encoding None."""
+        encoding = self.encoding_for(accept_encoding)
+        if encoding is None:
+            return data, None
+        key  = (etag, encoding) if etag and self.cache_size > 0 else None
+        body = None
+        if key is not None:
+            with self._lock:
+                body = self._cache.get(key)
+                if body is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+        if body is None:
+            body = self._compress(data, encoding)
+            if key is not None:
+                with self._lock:
+                    self._cache[key] = body
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+        with self._lock:
+            self.responses[encoding] += 1
+            self.bytes_in  += len(data)
+            self.bytes_out += len(body)
+        return body, encoding
+
+    def compressible(self, mimetype, size):
+        return (self.enabled and size is not None and self.min_bytes <= size <= self.max_bytes
+                and (mimetype or '').startswith(COMPRESSIBLE_TYPES))
+
+    def compress_response(self, response, accept_encoding):
+        """Flask `after_request` body: compresses a complete (or file-backed)
+        200 response in place. A strong ETag becomes weak, since the bytes on
+        the wire now depend on the encoding."""
+        if (response.status_code != 200 or 'Content-Encoding' in response.headers
+                or (response.is_streamed and not response.direct_passthrough)
+                or not self.compressible(response.mimetype, response.content_length)):
+            return response
+        response.vary.add('Accept-Encoding')
+        if self.encoding_for(accept_encoding) is None:
+            return response
+        etag, weak = response.get_etag()
+        shared = response.cache_control.public or response.cache_control.immutable
+        # send_file responses iterate the file; it is small enough to read here
+        response.direct_passthrough = False
+        body, encoding = self.encode(response.get_data(), accept_encoding, etag if shared else None)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {
+                "responses": dict(self.responses),
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "cache_hits": self.hits,
+                "cache_size": len(self._cache),
+                "brotli": bool(_brotli_module()),
+                "min_bytes": self.min_bytes,
+            }
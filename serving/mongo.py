@@ -0,0 +1,57 @@
+"""Mongo handles that create their client on first use.
+
+`LazyDatabase(connect)` stands in for a pymongo Database: `db.users` and
+`db['users']` return collection proxies straight away, and `connect()` (which
+builds the MongoClient, resolving mongodb+srv DNS and starting its monitor
+threads) runs the first time any collection is actually used. Importing the
+app therefore never touches the network, and under `gunicorn --preload` each
+worker builds its own client after the fork.
+"""
+import threading
+
+
+class LazyDatabase:
+    def __init__(self, connect, on_connect=None):
+        self._connect    = connect
+        self._on_connect = on_connect
+        self._db   = None
+        self._lock = threading.Lock()
+
+    @property
+    def connected(self):
+        return self._db is not None
+
+    def get(self):
+        """The real Database, connecting on the first call."""
+        if self._db is None:
+            with self._lock:
+                if self._db is None:
+                    db = self._connect()
+                    if self._on_connect is not None:
+                        self._on_connect(db)
+                    self._db = db
+        return self._db
+
+    def __getitem__(self, name):
+        return LazyCollection(self, name)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return LazyCollection(self, name)
+
+
+class LazyCollection:
+    """Forwards every attribute to `database.get()[name]`, resolved once."""
+
+    def __init__(self, database, name):
+        self._database   = database
+        self._name       = name
+        self._collection = None
+
+    def __getattr__(self, attr):
+        if attr.startswith('__'):
+            raise AttributeError(attr)
+        if self._collection is None:
+            self._collection = self._database.get()[self._name]
+        return getattr(self._collection, attr)
@@ -0,0 +1,152 @@
+import os
+import queue
+import atexit
+import logging
+import threading
+import time
+from pymongo.errors import BulkWriteError, PyMongoError
+from serving.metrics import STAGE_SECONDS, ERRORS
+
+log = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class PredictionLogger:
+    """Write-behind queue that batches prediction records into `insert_many`.
+
+    `log()` never touches Mongo: records go into a bounded queue and a daemon
+    thread flushes them with `insert_many(ordered=False)` once `batch_size`
+    records are waiting or `flush_interval` seconds have passed. When the
+    queue is full the caller waits up to `put_timeout` seconds (backpressure)
+    and the record is dropped and counted after that.
+    """
+
+    def __init__(self, collection, batch_size=100, flush_interval=1.0,
+                 max_queue=10000, put_timeout=0.0):
+        self.collection     = collection
+        self.batch_size     = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout    = put_timeout
+
+        self._queue  = queue.Queue(maxsize=max_queue)
+        self._lock   = threading.Lock()
+        self._thread = None
+        self._pid    = None
+        self.enqueued = self.written = self.dropped = self.failed = self.batches = 0
+        self.last_error = None
+        atexit.register(self.close)
+
+    @classmethod
+    def from_env(cls, collection):
+        return cls(collection,
+                   batch_size=int(os.getenv("PREDICTION_LOG_BATCH_SIZE", "100")),
+                   flush_interval=float(os.getenv("PREDICTION_LOG_FLUSH_INTERVAL", "1.0")),
+                   max_queue=int(os.getenv("PREDICTION_LOG_MAX_QUEUE", "10000")),
+                   put_timeout=float(os.getenv("PREDICTION_LOG_PUT_TIMEOUT", "0")))
+
+    def _ensure_started(self):
+        # Started lazily (and restarted after fork) so a preloaded gunicorn
+        # master never owns the writer thread its workers depend on.
+        # A writer that died is replaced rather than left to fill the queue.
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid    = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="prediction-log",
+                                                daemon=True)
+                self._thread.start()
+
+    def log(self, record):
+        self._ensure_started()
+        try:
+            if self.put_timeout > 0:
+                self._queue.put(record, timeout=self.put_timeout)
+            else:
+                self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    def _run(self):
+        while True:
+            batch, stop = [], False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            if stop:
+                batch.extend(self._drain())
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    def _drain(self):
+        items = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return items
+            if item is not _STOP:
+                items.append(item)
+
+    def _write(self, batch):
+        for start in range(0, len(batch), self.batch_size):
+            chunk = batch[start:start + self.batch_size]
+            try:
+                with STAGE_SECONDS.time(stage='mongo_insert_many'):
+                    self.collection.insert_many(chunk, ordered=False)
+                self.written += len(chunk)
+            except BulkWriteError as e:
+                failed = len(e.details.get('writeErrors', []))
+                self.failed  += failed
+                self.written += len(chunk) - failed
+                self.last_error = str(e)
+                ERRORS.inc(endpoint='prediction_log', type=type(e).__name__)
+                log.warning("Prediction log bulk write partially failed: %s", e)
+            except PyMongoError as e:
+                self.failed += len(chunk)
+                self.last_error = str(e)
+                ERRORS.inc(endpoint='prediction_log', type=type(e).__name__)
+                log.warning("Prediction log bulk write failed: %s", e)
+            except Exception as e:
+                # e.g. an unencodable field or a failed lazy connect: keep the writer alive
+                self.failed += len(chunk)
+                self.last_error = str(e)
+                ERRORS.inc(endpoint='prediction_log', type=type(e).__name__)
+                log.exception("Prediction log write failed")
+            self.batches += 1
+
+    def close(self, timeout=10.0):
+        """Flushes everything queued so far; safe to call more than once."""
+        thread = self._thread
+        if thread is None or self._pid != os.getpid() or not thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            log.warning("Prediction log queue still full at shutdown; %d records lost",
+                        self._queue.qsize())
+            return
+        thread.join(timeout)
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(), "enqueued": self.enqueued,
+            "written": self.written, "dropped": self.dropped, "failed": self.failed,
+            "batches": self.batches, "last_error": self.last_error,
+        }
@@ -0,0 +1,76 @@
+"""Per-request cProfile sampling, off unless asked for.
+
+`PROFILE_SAMPLE_RATE` (0..1) profiles that fraction of requests; it can be
+changed at runtime through `/admin/profiling`. A request carrying
+`X-Profile: 1` and a valid admin token is always profiled. With the rate at 0
+and no header the only cost is one comparison per request. The newest
+`keep` reports (top functions by cumulative time) stay in memory.
+"""
+import io
+import os
+import uuid
+import random
+import pstats
+import cProfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+
+class RequestProfiler:
+    def __init__(self, sample_rate=0.0, keep=20, top=40):
+        self.sample_rate = sample_rate
+        self.keep        = keep
+        self.top         = top
+        self._lock    = threading.Lock()
+        self._reports = OrderedDict()
+        self.profiled = self.skipped = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+                   keep=int(os.getenv("PROFILE_KEEP", "20")))
+
+    def set_rate(self, rate):
+        self.sample_rate = min(max(float(rate), 0.0), 1.0)
+
+    def start(self, forced=False):
+        """A running profiler for this request, or None when it is not sampled."""
+        if not forced and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active (e.g. a concurrent request on 3.12+).
+            self.skipped += 1
+            return None
+        return profiler
+
+    def finish(self, profiler, method, path, status, seconds):
+        """Stops `profiler` and stores its report; returns the report id."""
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(self.top)
+        report_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self.profiled += 1
+            self._reports[report_id] = {
+                'id': report_id, 'method': method, 'path': path, 'status': status,
+                'duration_ms': round(seconds * 1000, 2),
+                'created_at': datetime.utcnow().isoformat(), 'stats': out.getvalue()}
+            while len(self._reports) > self.keep:
+                self._reports.popitem(last=False)
+        return report_id
+
+    def get(self, report_id):
+        return self._reports.get(report_id)
+
+    def reports(self):
+        with self._lock:
+            return [{k: v for k, v in r.items() if k != 'stats'}
+                    for r in reversed(self._reports.values())]
+
+    def stats(self):
+        return {'sample_rate': self.sample_rate, 'profiled': self.profiled,
+                'skipped': self.skipped, 'kept': len(self._reports)}
@@ -1,92 +1,204 @@
 import pandas as pd
 import numpy as np
+import hashlib
+import json
+import time
 import re
 import os
 
-def clean_and_merge_data():
-
-
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    RAW_DIR = os.path.join(BASE_DIR, 'data', 'raw')
-    PROCESSED_DIR = os.path.join(BASE_DIR, 'data', 'processed')
-
-    files = {
-        'Delhi': os.path.join(RAW_DIR, 'Indian_housing_Delhi_data.csv'),
-        'Mumbai': os.path.join(RAW_DIR, 'Indian_housing_Mumbai_data.csv'),
-        'Pune': os.path.join(RAW_DIR, 'Indian_housing_Pune_data.csv')
-    }
-
-    dfs = []
-    
-    for city, filepath in files.items():
-        try:
-            df = pd.read_csv(filepath)
-            df['city'] = city
-            dfs.append(df)
-            print(f"Loaded {city} data: {df.shape}")
-        except FileNotFoundError:
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_DIR = os.path.join(BASE_DIR, 'data', 'raw')
+PROCESSED_DIR = os.path.join(BASE_DIR, 'data', 'processed')
+CACHE_DIR = os.path.join(PROCESSED_DIR, 'cache')
+
+RAW_FILES = {
+    'Delhi': os.path.join(RAW_DIR, 'Indian_housing_Delhi_data.csv'),
+    'Mumbai': os.path.join(RAW_DIR, 'Indian_housing_Mumbai_data.csv'),
+    'Pune': os.path.join(RAW_DIR, 'Indian_housing_Pune_data.csv')
+}
+RAW_FILE_CITY = re.compile(r'Indian_housing_(\w+?)_data', re.IGNORECASE)
+
+# Only these raw columns are ever parsed; `description` etc. are skipped on read.
+RAW_COLUMNS = ['house_type', 'house_size', 'location', 'price', 'Status', 'latitude', 'longitude']
+# Text columns stay text even in a chunk where they are entirely empty.
+RAW_TEXT_DTYPES = {'house_type': str, 'house_size': str, 'location': str, 'Status': str}
+MODEL_COLUMNS = ['city', 'Locality', 'BHK', 'Area', 'Furnishing', 'Rent']
+OUTPUT_COLUMNS = MODEL_COLUMNS + ['Latitude', 'Longitude']
+
+# Listings geocoded further than this from their city centre are treated as
+# unknown locations (the raw data has swapped and out-of-state coordinates).
+CITY_CENTERS = {'Delhi': (28.6139, 77.2090), 'Mumbai': (19.0760, 72.8777), 'Pune': (18.5204, 73.8567)}
+MAX_CITY_RADIUS_KM = 60.0
+
+# Bump when the cleaning rules change so cached per-city results are rebuilt.
+PIPELINE_VERSION = 2
+
+
+# --- Cleaning rules (vectorized) ---
+
+def parse_bhk(house_type):
+    """'2 BHK Apartment' -> 2.0; anything without '<n> BHK' -> NaN."""
+    return pd.to_numeric(
+        house_type.astype('string').str.extract(r'(\d+)\s*BHK', flags=re.IGNORECASE, expand=False),
+        errors='coerce'
+    ).astype(float)
+
+
+def parse_area(house_size):
+    """'1,200 sq ft' -> 1200.0; unparseable -> NaN."""
+    text = (house_size.astype('string').str.lower()
+                      .str.replace('sq ft', '', regex=False)
+                      .str.replace(',', '', regex=False)
+                      .str.strip())
+    return pd.to_numeric(text, errors='coerce').astype(float)
+
+
+def parse_rent(price):
+    if pd.api.types.is_numeric_dtype(price):
+        return price
+    return pd.to_numeric(price.astype(str).str.replace(',', '', regex=False), errors='coerce')
+
+
+def parse_coordinates(latitude, longitude, city):
+    """Numeric lat/lon, NaN where missing or implausibly far from the city."""
+    lat = pd.to_numeric(latitude, errors='coerce').astype(float)
+    lon = pd.to_numeric(longitude, errors='coerce').astype(float)
+    center = CITY_CENTERS.get(city)
+    if center is not None:
+        dy = (lat - center[0]) * 111.32
+        dx = (lon - center[1]) * 111.32 * np.cos(np.radians(center[0]))
+        far = ~(np.hypot(dx, dy) <= MAX_CITY_RADIUS_KM)
+        lat, lon = lat.mask(far), lon.mask(far)
+    return lat, lon
+
+
+def clean_chunk(raw, city):
+    """Applies the cleaning rules to one chunk of a raw city CSV."""
+    lat, lon = parse_coordinates(raw['latitude'], raw['longitude'], city)
+    df = pd.DataFrame({
+        'city': city,
+        'Locality': raw['location'],
+        'BHK': parse_bhk(raw['house_type']),
+        'Area': parse_area(raw['house_size']),
+        'Furnishing': raw['Status'],
+        'Rent': parse_rent(raw['price']),
+        'Latitude': lat,
+        'Longitude': lon,
+    }, index=raw.index)
+    # Coordinates are optional: a listing without them still trains the model.
+    return df.dropna(subset=['BHK', 'Area', 'Rent'])
+
+
+def city_for(path, city=None):
+    """`city`, else the city in a raw `Indian_housing_<City>_data` file name, else None."""
+    if city:
+        return city
+    match = RAW_FILE_CITY.search(os.path.basename(path))
+    return match.group(1) if match else None
+
+
+# --- Incremental cache ---
+
+def _file_hash(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _load_manifest(path):
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if manifest.get('pipeline_version') != PIPELINE_VERSION:
+        return {}
+    return manifest.get('files', {})
+
+
+def _is_unchanged(path, entry, cache_file):
+    """Cheap size/mtime check first; only hash the file when those moved."""
+    if not entry or not os.path.exists(cache_file):
+        return False, None
+    st = os.stat(path)
+    if st.st_size == entry['size'] and st.st_mtime_ns == entry['mtime_ns']:
+        return True, entry['sha256']
+    digest = _file_hash(path)
+    return digest == entry['sha256'], digest
+
+
+def process_city(city, filepath, chunksize):
+    """Streams one raw CSV in chunks; returns (cleaned_df, raw_row_count)."""
+    parts, raw_rows = [], 0
+    for raw in pd.read_csv(filepath, usecols=RAW_COLUMNS, dtype=RAW_TEXT_DTYPES,
+                           chunksize=chunksize):
+        raw_rows += len(raw)
+        parts.append(clean_chunk(raw, city))
+    cleaned = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=OUTPUT_COLUMNS)
+    return cleaned, raw_rows
+
+
+def clean_and_merge_data(force=False, chunksize=50_000):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    manifest_path = os.path.join(CACHE_DIR, 'manifest.json')
+    manifest = {} if force else _load_manifest(manifest_path)
+
+    start = time.perf_counter()
+    dfs, new_manifest, raw_total, reprocessed = [], {}, 0, []
+
+    for city, filepath in RAW_FILES.items():
+        if not os.path.exists(filepath):
             print(f"Error: {filepath} not found.")
             return
 
-    if not dfs:
-        print("No data loaded.")
-        return
-
-    # Merge all data
-    combined_df = pd.concat(dfs, ignore_index=True)
-    print(f"Combined Shape: {combined_df.shape}")
-
-    # --- Clean Data ---
-
-    # 1. Extract BHK (integer) from house_type
-    def extract_bhk(text):
-        if not isinstance(text, str):
-            return np.nan
-        match = re.search(r'(\d+)\s*BHK', text, re.IGNORECASE)
-        if match:
-            return int(match.group(1))
-        return np.nan
-
-    combined_df['BHK'] = combined_df['house_type'].apply(extract_bhk)
-
-    # 2. Clean Area (float) from house_size
-    def extract_area(text):
-        if not isinstance(text, str):
-            return np.nan
-        clean_text = text.lower().replace('sq ft', '').replace(',', '').strip()
-        try:
-            return float(clean_text)
-        except ValueError:
-            return np.nan
-
-    combined_df['Area'] = combined_df['house_size'].apply(extract_area)
-
-    # 3. Rename Columns
-    combined_df.rename(columns={
-        'price': 'Rent',
-        'location': 'Locality',
-        'Status': 'Furnishing'
-    }, inplace=True)
-
-    # 4. Standardize Rent
-    if combined_df['Rent'].dtype == object:
-         combined_df['Rent'] = combined_df['Rent'].astype(str).str.replace(',', '').astype(float)
-    
-    # Drop rows with NaN
-    initial_count = len(combined_df)
-    combined_df.dropna(subset=['BHK', 'Area', 'Rent'], inplace=True)
-    final_count = len(combined_df)
-    print(f"Dropped {initial_count - final_count} rows with missing critical data.")
-
-    # Select and Reorder columns
-    cols_to_keep = ['city', 'Locality', 'BHK', 'Area', 'Furnishing', 'Rent']
-    final_df = combined_df[cols_to_keep]
-
-    # Save to CSV
+        cache_file = os.path.join(CACHE_DIR, f'{city}.parquet')
+        unchanged, digest = _is_unchanged(filepath, manifest.get(city), cache_file)
+        st = os.stat(filepath)
+
+        if unchanged:
+            df = pd.read_parquet(cache_file)
+            raw_rows = manifest[city]['raw_rows']
+            print(f"Reused cached {city} data: {df.shape}")
+        else:
+            df, raw_rows = process_city(city, filepath, chunksize)
+            df.to_parquet(cache_file, index=False)
+            digest = digest or _file_hash(filepath)
+            raw_total += raw_rows
+            reprocessed.append(city)
+            print(f"Processed {city} data: {raw_rows} raw rows -> {df.shape}")
+
+        new_manifest[city] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                              'sha256': digest, 'raw_rows': raw_rows, 'rows': len(df)}
+        dfs.append(df)
+
+    final_df = pd.concat(dfs, ignore_index=True)[OUTPUT_COLUMNS]
+    dropped = sum(m['raw_rows'] - m['rows'] for m in new_manifest.values())
+    print(f"Combined Shape: {final_df.shape}")
+    print(f"Dropped {dropped} rows with missing critical data.")
+
+    # Save to CSV + columnar copy
     output_file = os.path.join(PROCESSED_DIR, 'cleaned_rent_data.csv')
     final_df.to_csv(output_file, index=False)
+    final_df.to_parquet(os.path.join(PROCESSED_DIR, 'cleaned_rent_data.parquet'), index=False)
+
+    with open(manifest_path, 'w') as f:
+        json.dump({'pipeline_version': PIPELINE_VERSION, 'files': new_manifest}, f, indent=2)
+
+    elapsed = time.perf_counter() - start
+    rate = raw_total / elapsed if elapsed > 0 else 0.0
+    print(f"Reprocessed: {', '.join(reprocessed) or 'none'} "
+          f"({raw_total} raw rows in {elapsed:.2f}s, {rate:,.0f} rows/sec)")
     print(f"Successfully saved cleaned data to {output_file}")
     print(final_df.head())
+    return final_df
+
 
 if __name__ == "__main__":
-    clean_and_merge_data()
+    import argparse
+    parser = argparse.ArgumentParser(description="Clean and merge raw city listings.")
+    parser.add_argument('--force', action='store_true', help="ignore the cache and reprocess every city")
+    parser.add_argument('--chunksize', type=int, default=50_000)
+    args = parser.parse_args()
+    clean_and_merge_data(force=args.force, chunksize=args.chunksize)
@@ -1,54 +1,182 @@
 import pandas as pd
 import numpy as np
+import hashlib
 import pickle
 import json
+import time
+import sys
 import os
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import GradientBoostingRegressor
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sklearn.model_selection import train_test_split, KFold, ParameterGrid, ParameterSampler
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor
 from sklearn.metrics import r2_score, mean_absolute_error
 
-def train_rent_model_v2():
-    # Paths
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    DATA_PATH = os.path.join(BASE_DIR, 'data', 'processed', 'cleaned_rent_data.csv')
-    MODELS_DIR = os.path.join(BASE_DIR, 'models')
-    
-    # Load data
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from src.data_pipeline import process_city, city_for
+from ml.artifacts import (export_compiled, load_compiled, load_locality_map, file_sha256,
+                          COMPILED_DIRNAME, PICKLE_NAME)
+from ml.surface import RentSurface, SURFACE_DIRNAME
+from ml.inference import BAND_QUANTILES
+
+DATA_PATH = os.path.join(BASE_DIR, 'data', 'processed', 'cleaned_rent_data.csv')
+MODEL_COLUMNS = ['city', 'Locality', 'BHK', 'Area', 'Furnishing', 'Rent']
+MODELS_DIR = os.path.join(BASE_DIR, 'models')
+SEARCH_DIR = os.path.join(MODELS_DIR, 'search')
+
+# Boosting stages appended per incremental update, and the smallest update
+# that gets a hold-out split for the before/after report.
+UPDATE_EXTRA_TREES = 10
+UPDATE_HOLDOUT_MIN_ROWS = 100
+
+ESTIMATORS = {
+    'gbr': GradientBoostingRegressor,
+    'hgb': HistGradientBoostingRegressor,
+}
+
+SEARCH_SPACE = {
+    'gbr': {
+        'n_estimators': [200, 300, 500],
+        'learning_rate': [0.03, 0.05, 0.1],
+        'max_depth': [3, 4, 5, 6],
+        'subsample': [0.8, 1.0],
+        'random_state': [42],
+    },
+    'hgb': {
+        'max_iter': [200, 400, 800],
+        'learning_rate': [0.05, 0.1],
+        'max_depth': [None, 6, 8],
+        'max_leaf_nodes': [31, 63],
+        'l2_regularization': [0.0, 1.0],
+        'early_stopping': [False],
+        'random_state': [42],
+    },
+}
+
+
+def load_training_frame():
     try:
         df = pd.read_csv(DATA_PATH)
         print(f"Data Loaded from {DATA_PATH}: {df.shape}")
     except FileNotFoundError:
         print(f"Error: {DATA_PATH} not found.")
-        return
+        return None
+
+    return model_rows(df)
 
+
+def model_rows(df):
     # --- 1. Filter Extreme Outliers ---
-    df = df[df['Rent'] > 1000].copy()
-    
+    # (coordinates in the cleaned file feed the comparables index, not the model)
+    return df.loc[df['Rent'] > 1000, MODEL_COLUMNS].copy()
+
+
+def encode_rows(df, locality_value_map, global_mean_rent, feature_columns=None):
+    """(X, y) for cleaned rows; `feature_columns` pins the one-hot layout of a fitted model."""
+    df = df.assign(Locality_Value=df['Locality'].map(locality_value_map).fillna(global_mean_rent))
+    df_encoded = pd.get_dummies(df, columns=['city', 'Furnishing'], drop_first=False)
+    df_encoded.drop(columns=['Locality'], inplace=True)
+
+    X = df_encoded.drop(columns=['Rent'])
+    if feature_columns is not None:
+        X = X.reindex(columns=feature_columns, fill_value=False)
+    return X, np.log1p(df_encoded['Rent'])
+
+
+def prepare_features(df):
+    """Target-encodes Locality and one-hot encodes city/Furnishing.
+
+    Returns (X, y, locality_stats, global_mean_rent, locality_dict).
+    """
     # --- 2. Feature Engineering: Target Encoding for Locality ---
     locality_stats = df.groupby('Locality')['Rent'].mean().to_dict()
-    df['Locality_Value'] = df['Locality'].map(locality_stats)
-    
     global_mean_rent = df['Rent'].mean()
-    df['Locality_Value'].fillna(global_mean_rent, inplace=True)
-    
-    # Save Locality Map
+
     locality_dict = {}
-    cities = df['city'].unique()
-    for city in cities:
+    for city in df['city'].unique():
         localities = df[df['city'] == city]['Locality'].unique().tolist()
         locality_dict[city] = sorted(localities)
-    
+
+    # --- 3. Encoding Other Features ---
+    X, y = encode_rows(df, locality_stats, global_mean_rent)
+    return X, y, locality_stats, global_mean_rent, locality_dict
+
+
+def rent_statistics(df):
+    """Sufficient statistics behind the target encoding: Rent [count, sum] per
+    locality plus the totals, so an update can fold in new rows without
+    re-reading the training data."""
+    grouped = df.groupby('Locality')['Rent'].agg(['count', 'sum'])
+    return {'localities': {loc: [int(count), float(total)] for loc, count, total in grouped.itertuples()},
+            'rows': int(len(df)), 'rent_sum': float(df['Rent'].sum())}
+
+
+def save_artifacts(model, locality_stats, global_mean_rent, feature_columns, locality_dict,
+                   band_models=(), training=None, surface=True):
     with open(os.path.join(MODELS_DIR, 'locality_mapping.json'), 'w') as f:
         json.dump(locality_dict, f)
-        
-    # --- 3. Encoding Other Features ---
-    df_encoded = pd.get_dummies(df, columns=['city', 'Furnishing'], drop_first=False)
-    df_encoded.drop(columns=['Locality'], inplace=True)
-    
-    feature_columns = [col for col in df_encoded.columns if col != 'Rent']
-    
-    X = df_encoded.drop(columns=['Rent'])
-    y = np.log1p(df_encoded['Rent']) 
+
+    artifacts = {
+        'model': model,
+        'locality_value_map': locality_stats,
+        'global_mean_rent': global_mean_rent,
+        'feature_columns': feature_columns
+    }
+    if band_models:
+        artifacts['band_models'] = list(band_models)
+        artifacts['band_quantiles'] = list(BAND_QUANTILES)
+    if training is not None:
+        artifacts['training'] = training
+    pickle_path = os.path.join(MODELS_DIR, PICKLE_NAME)
+    with open(pickle_path, 'wb') as f:
+        pickle.dump(artifacts, f)
+    export_compiled(artifacts, os.path.join(MODELS_DIR, COMPILED_DIRNAME), locality_dict,
+                    source_sha256=file_sha256(pickle_path),
+                    locality_sha256=file_sha256(os.path.join(MODELS_DIR, 'locality_mapping.json')))
+    print(f"Saved artifacts to {MODELS_DIR}")
+    if surface:
+        build_surface(locality_dict)
+
+
+def build_surface(locality_dict):
+    """Precomputes the /explore rent surface for the model just saved."""
+    predictor, manifest = load_compiled(os.path.join(MODELS_DIR, COMPILED_DIRNAME))
+    start = time.perf_counter()
+    surface = RentSurface.build(predictor, locality_dict, manifest['version'])
+    path = surface.save(os.path.join(MODELS_DIR, SURFACE_DIRNAME))
+    print(f"Rent surface: {surface.low.size:,} combinations in {time.perf_counter() - start:.1f}s -> {path}")
+
+
+def evaluate(model, X_test, y_test):
+    y_pred = np.expm1(model.predict(X_test))
+    y_test_orig = np.expm1(y_test)
+    return r2_score(y_test_orig, y_pred), mean_absolute_error(y_test_orig, y_pred)
+
+
+def fit_band_models(model, X_train, y_train):
+    """Quantile models at BAND_QUANTILES with the point model's hyperparameters."""
+    quantile_param = 'quantile' if isinstance(model, HistGradientBoostingRegressor) else 'alpha'
+    band_models = []
+    for q in BAND_QUANTILES:
+        params = {**model.get_params(), 'loss': 'quantile', quantile_param: q}
+        band_models.append(type(model)(**params).fit(X_train, y_train))
+    return band_models
+
+
+def evaluate_band(band_models, X_test, y_test):
+    """Share of hold-out rents inside the band, and its median width relative to the rent."""
+    low, high = (np.expm1(m.predict(X_test)) for m in band_models)
+    y_test_orig = np.expm1(np.asarray(y_test))
+    coverage = np.mean((y_test_orig >= low) & (y_test_orig <= high))
+    return float(coverage), float(np.median((high - low) / y_test_orig))
+
+
+def train_rent_model_v2():
+    start = time.perf_counter()
+    df = load_training_frame()
+    if df is None:
+        return
+    X, y, locality_stats, global_mean_rent, locality_dict = prepare_features(df)
 
     print(f"Training Features: {X.columns.tolist()}")
 
@@ -60,26 +188,313 @@ def train_rent_model_v2():
     gbr.fit(X_train, y_train)
 
     # Evaluate
-    y_pred_log = gbr.predict(X_test)
-    y_pred = np.expm1(y_pred_log)
-    y_test_orig = np.expm1(y_test)
-    
-    r2 = r2_score(y_test_orig, y_pred)
-    mae = mean_absolute_error(y_test_orig, y_pred)
-    
+    r2, mae = evaluate(gbr, X_test, y_test)
     print(f"Model V2 Trained. R2 Score: {r2:.4f}, MAE: {mae:.2f}")
 
+    # --- 5. Quantile models for the published range ---
+    band_models = fit_band_models(gbr, X_train, y_train)
+    coverage, width = evaluate_band(band_models, X_test, y_test)
+    print(f"Band {BAND_QUANTILES}: hold-out coverage {coverage:.1%}, median width {width:.1%} of rent")
+    fit_seconds = time.perf_counter() - start
+    print(f"Full retrain fitted in {fit_seconds:.1f}s")
+
     # --- Save Artifacts ---
-    artifacts = {
-        'model': gbr,
-        'locality_value_map': locality_stats,
-        'global_mean_rent': global_mean_rent,
-        'feature_columns': X.columns.tolist() 
-    }
+    training = {**rent_statistics(df), 'full_fit_seconds': fit_seconds, 'updates': []}
+    save_artifacts(gbr, locality_stats, global_mean_rent, X.columns.tolist(), locality_dict,
+                   band_models, training)
+
+
+# --- Incremental update ---
+
+def warm_start(model, X, y, extra_trees):
+    """Appends `extra_trees` boosting stages fitted to (X, y) to a fitted model."""
+    param = 'max_iter' if isinstance(model, HistGradientBoostingRegressor) else 'n_estimators'
+    model.set_params(warm_start=True, **{param: model.get_params()[param] + extra_trees})
+    model.fit(X, y)
+    model.set_params(warm_start=False)
+    return model
+
+
+def fold_rows(training, locality_value_map, df):
+    """Adds cleaned rows to the running statistics and refreshes the encoding of
+    the localities they touch; O(len(df)). Returns the new localities."""
+    added = []
+    for loc, count, total in df.groupby('Locality')['Rent'].agg(['count', 'sum']).itertuples():
+        entry = training['localities'].get(loc)
+        if entry is None:
+            entry = training['localities'][loc] = [0, 0.0]
+            added.append(loc)
+        entry[0] += int(count)
+        entry[1] += float(total)
+        locality_value_map[loc] = entry[1] / entry[0]
+    training['rows']     += int(len(df))
+    training['rent_sum'] += float(df['Rent'].sum())
+    return added
+
+
+def update_rent_model(delta_path, city=None, extra_trees=UPDATE_EXTRA_TREES, force=False):
+    """Folds a file of new listings (raw `Indian_housing_*` CSV format) into the
+    saved model without a full retrain.
+
+    The locality encoding is updated from the running statistics, the point
+    and band models get `extra_trees` warm-started stages fitted on the new
+    rows, and the result is published like a full retrain (the app's model
+    watcher or /admin/model/reload picks it up) minus the rent surface, which
+    the app rebuilds in the background for the new version. Rows for a city or
+    furnishing the model has no column for are skipped: those need a full
+    retrain, which also resets the stage count.
+    """
+    start = time.perf_counter()
+    city = city_for(delta_path, city)
+    if city is None:
+        print(f"Error: no city for {delta_path}; pass --city.")
+        return
+
+    pickle_path = os.path.join(MODELS_DIR, PICKLE_NAME)
+    with open(pickle_path, 'rb') as f:
+        artifacts = pickle.load(f)
+    locality_dict = load_locality_map(os.path.join(MODELS_DIR, 'locality_mapping.json'))
+    training = artifacts.get('training')
+    if training is None:
+        # saved before running statistics existed: seed them with one full pass
+        df = load_training_frame()
+        if df is None:
+            return
+        training = {**rent_statistics(df), 'full_fit_seconds': None, 'updates': []}
+        print(f"Seeded running statistics from {training['rows']} training rows")
+
+    digest = file_sha256(delta_path)
+    if not force and any(u['sha256'] == digest for u in training['updates']):
+        print(f"{delta_path} was already applied; pass --force to apply it again.")
+        return
+
+    cleaned, raw_rows = process_city(city, delta_path, chunksize=50_000)
+    delta = model_rows(cleaned)
+    feature_columns = artifacts['feature_columns']
+    known = (('city_' + delta['city']).isin(feature_columns)
+             & ('Furnishing_' + delta['Furnishing'].astype(str)).isin(feature_columns))
+    if not known.all():
+        print(f"Skipping {int((~known).sum())} rows with a city/furnishing the model has no "
+              f"column for (needs a full retrain)")
+        delta = delta[known]
+    if delta.empty:
+        print(f"No usable rows in {delta_path} ({raw_rows} raw rows)")
+        return
+
+    # Hold out part of the delta to compare the old and updated models on unseen rows;
+    # its rents join the encoding only after the trees are fitted.
+    if len(delta) >= UPDATE_HOLDOUT_MIN_ROWS:
+        fit_rows, holdout = train_test_split(delta, test_size=0.2, random_state=42)
+    else:
+        fit_rows, holdout = delta, delta.iloc[:0]
+
+    old_map, old_mean = artifacts['locality_value_map'], artifacts['global_mean_rent']
+    locality_value_map = dict(old_map)
+    added = fold_rows(training, locality_value_map, fit_rows)
+    global_mean_rent = training['rent_sum'] / training['rows']
+
+    model, band_models = artifacts['model'], artifacts.get('band_models', [])
+    if len(holdout):
+        X_old, y_test = encode_rows(holdout, old_map, old_mean, feature_columns)
+        _, mae_before = evaluate(model, X_old, y_test)
+
+    X, y = encode_rows(fit_rows, locality_value_map, global_mean_rent, feature_columns)
+    for m in [model, *band_models]:
+        warm_start(m, X, y, extra_trees)
+
+    if len(holdout):
+        X_new, _ = encode_rows(holdout, locality_value_map, global_mean_rent, feature_columns)
+        _, mae_after = evaluate(model, X_new, y_test)
+        print(f"Hold-out MAE on {len(holdout)} new rows: {mae_before:.2f} -> {mae_after:.2f}")
+        added += fold_rows(training, locality_value_map, holdout)
+        global_mean_rent = training['rent_sum'] / training['rows']
+    fit_seconds = time.perf_counter() - start
+
+    for c, localities in delta.groupby('city')['Locality']:
+        locality_dict[c] = sorted(set(locality_dict.get(c, [])) | set(localities.dropna()))
+    training['updates'].append({'file': os.path.basename(delta_path), 'sha256': digest,
+                                'rows': int(len(delta)), 'extra_trees': extra_trees,
+                                'fit_seconds': fit_seconds, 'at': time.time()})
+
+    stages = model.get_params()['max_iter' if isinstance(model, HistGradientBoostingRegressor)
+                                else 'n_estimators']
+    full = training['full_fit_seconds']
+    print(f"Update: {len(delta)} rows ({len(added)} new localities) fitted in {fit_seconds:.1f}s; "
+          f"{stages} stages after {len(training['updates'])} update(s)")
+    if full:
+        print(f"Full retrain took {full:.1f}s ({full / fit_seconds:.0f}x slower)")
+    else:
+        print("Full retrain time not recorded (model predates running statistics)")
+
+    save_artifacts(model, locality_value_map, global_mean_rent, feature_columns, locality_dict,
+                   band_models, training, surface=False)
+    print(f"Published in {time.perf_counter() - start - fit_seconds:.1f}s")
+
+
+# --- Hyperparameter search ---
+
+_WORKER = {}
+
+
+def _init_worker(X, y, folds):
+    # One estimator per core: keep HistGB's OpenMP pool from oversubscribing.
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)
+    _WORKER.update(X=X, y=y, folds=folds)
+
+
+def _trial_id(name, params):
+    key = json.dumps([name, params], sort_keys=True, default=str)
+    return hashlib.sha1(key.encode()).hexdigest()[:12]
+
+
+def _run_trial(trial):
+    """Cross-validates one candidate inside a pool worker."""
+    X, y, folds = _WORKER['X'], _WORKER['y'], _WORKER['folds']
+    fit_times, latencies, r2s, maes = [], [], [], []
+    for train_idx, val_idx in folds:
+        model = ESTIMATORS[trial['estimator']](**trial['params'])
+        t0 = time.perf_counter()
+        model.fit(X.iloc[train_idx], y.iloc[train_idx])
+        fit_times.append(time.perf_counter() - t0)
+
+        X_val = X.iloc[val_idx]
+        r2, mae = evaluate(model, X_val, y.iloc[val_idx])
+        r2s.append(r2)
+        maes.append(mae)
+
+        one_row = X_val.iloc[:1]
+        samples = []
+        for _ in range(20):
+            t0 = time.perf_counter()
+            model.predict(one_row)
+            samples.append(time.perf_counter() - t0)
+        latencies.append(np.median(samples))
+
+    return {**trial,
+            'r2': float(np.mean(r2s)), 'mae': float(np.mean(maes)),
+            'fit_time_s': float(np.mean(fit_times)),
+            'predict_latency_ms': float(np.median(latencies) * 1000)}
+
+
+def _load_folds(path, n_rows, n_folds):
+    """Fold indices are cached per data fingerprint so every trial and resume reuses them."""
+    if os.path.exists(path):
+        cached = np.load(path)
+        return [(cached[f'train_{i}'], cached[f'val_{i}']) for i in range(n_folds)]
+    folds = list(KFold(n_splits=n_folds, shuffle=True, random_state=42).split(np.arange(n_rows)))
+    arrays = {}
+    for i, (train_idx, val_idx) in enumerate(folds):
+        arrays[f'train_{i}'] = train_idx
+        arrays[f'val_{i}'] = val_idx
+    np.savez(path, **arrays)
+    return folds
+
+
+def _candidates(n_trials, grid):
+    trials = []
+    for name, space in SEARCH_SPACE.items():
+        params_iter = ParameterGrid(space) if grid else ParameterSampler(space, n_iter=n_trials, random_state=42)
+        for params in params_iter:
+            trials.append({'trial_id': _trial_id(name, params), 'estimator': name, 'params': params})
+    return trials
+
+
+def search_rent_model(n_trials=10, n_folds=3, n_jobs=None, grid=False, fresh=False):
+    """Parallel (random or grid) search over GBR and HistGBR; resumable.
+
+    Every finished trial is appended to trials_<n_folds>.jsonl in a directory
+    keyed by the training data's fingerprint, so an interrupted run picks up
+    where it stopped; scores from a different fold count are never reused. The best candidate is refit and saved in the usual artifact format.
+    """
+    df = load_training_frame()
+    if df is None:
+        return
+    X, y, locality_stats, global_mean_rent, locality_dict = prepare_features(df)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    fingerprint = hashlib.sha1(pd.util.hash_pandas_object(X_train, index=True).values.tobytes()).hexdigest()[:12]
+    run_dir = os.path.join(SEARCH_DIR, fingerprint)
+    os.makedirs(run_dir, exist_ok=True)
+    checkpoint = os.path.join(run_dir, f'trials_{n_folds}.jsonl')
+    if fresh and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    done = {}
+    if os.path.exists(checkpoint):
+        with open(checkpoint, 'r') as f:
+            for line in f:
+                if line.strip():
+                    result = json.loads(line)
+                    done[result['trial_id']] = result
+
+    folds = _load_folds(os.path.join(run_dir, f'folds_{n_folds}.npz'), len(X_train), n_folds)
+    trials = [t for t in _candidates(n_trials, grid) if t['trial_id'] not in done]
+    n_jobs = n_jobs or os.cpu_count()
+    print(f"Search: {len(done)} trials checkpointed, {len(trials)} to run on {n_jobs} processes")
+
+    start = time.perf_counter()
+    if trials:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(X_train, y_train, folds)) as pool, \
+                open(checkpoint, 'a') as out:
+            futures = [pool.submit(_run_trial, t) for t in trials]
+            for future in as_completed(futures):
+                result = future.result()
+                done[result['trial_id']] = result
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+                print(f"  {result['estimator']} {result['trial_id']}: R2 {result['r2']:.4f}, "
+                      f"MAE {result['mae']:.0f}, fit {result['fit_time_s']:.2f}s")
+    print(f"Search finished in {time.perf_counter() - start:.1f}s")
+
+    leaderboard = pd.DataFrame(done.values()).sort_values('mae').reset_index(drop=True)
+    leaderboard['params'] = leaderboard['params'].apply(lambda p: json.dumps(p, sort_keys=True))
+    leaderboard_path = os.path.join(run_dir, f'leaderboard_{n_folds}.csv')
+    leaderboard[['trial_id', 'estimator', 'params', 'r2', 'mae', 'fit_time_s',
+                 'predict_latency_ms']].to_csv(leaderboard_path, index=False)
+    print(leaderboard.head(10).to_string())
+    print(f"Leaderboard written to {leaderboard_path}")
+
+    best = leaderboard.iloc[0]
+    refit_start = time.perf_counter()
+    model = ESTIMATORS[best['estimator']](**json.loads(best['params']))
+    model.fit(X_train, y_train)
+    r2, mae = evaluate(model, X_test, y_test)
+    print(f"Best {best['estimator']} ({best['trial_id']}) on hold-out. R2 Score: {r2:.4f}, MAE: {mae:.2f}")
+
+    band_models = fit_band_models(model, X_train, y_train)
+    refit_seconds = time.perf_counter() - refit_start
+    coverage, width = evaluate_band(band_models, X_test, y_test)
+    print(f"Band {BAND_QUANTILES}: hold-out coverage {coverage:.1%}, median width {width:.1%} of rent")
+
+    training = {**rent_statistics(df), 'full_fit_seconds': refit_seconds, 'updates': []}
+    save_artifacts(model, locality_stats, global_mean_rent, X.columns.tolist(), locality_dict,
+                   band_models, training)
+    return leaderboard
 
-    with open(os.path.join(MODELS_DIR, 'rent_model_artifacts.pkl'), 'wb') as f:
-        pickle.dump(artifacts, f)
-    print(f"Saved artifacts to {MODELS_DIR}")
 
 if __name__ == "__main__":
-    train_rent_model_v2()
+    import argparse
+    parser = argparse.ArgumentParser(description="Train the rent model.")
+    parser.add_argument('--search', action='store_true', help="run the parallel hyperparameter search")
+    parser.add_argument('--grid', action='store_true', help="exhaustive grid instead of random sampling")
+    parser.add_argument('--n-trials', type=int, default=10, help="random trials per estimator")
+    parser.add_argument('--folds', type=int, default=3)
+    parser.add_argument('--n-jobs', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--fresh', action='store_true', help="discard checkpointed trials")
+    parser.add_argument('--update', metavar='LISTINGS_CSV',
+                        help="fold new listings into the saved model instead of retraining")
+    parser.add_argument('--city', help="city of the --update listings (default: from the file name)")
+    parser.add_argument('--extra-trees', type=int, default=UPDATE_EXTRA_TREES,
+                        help="boosting stages added by --update")
+    parser.add_argument('--force', action='store_true', help="re-apply an --update file already applied")
+    args = parser.parse_args()
+
+    if args.update:
+        update_rent_model(args.update, city=args.city, extra_trees=args.extra_trees, force=args.force)
+    elif args.search:
+        search_rent_model(n_trials=args.n_trials, n_folds=args.folds, n_jobs=args.n_jobs,
+                          grid=args.grid, fresh=args.fresh)
+    else:
+        train_rent_model_v2()
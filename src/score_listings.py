@@ -0,0 +1,203 @@
+"""Values whole listing dumps (the raw `Indian_housing_*_data.csv` shape) in bulk.
+
+    python src/score_listings.py data/raw/Indian_housing_Pune_data.csv -o valued.parquet
+
+Input is read in --chunksize row chunks (CSV via pandas, Parquet via
+pyarrow record batches). Each chunk is cleaned with the data_pipeline rules
+(BHK from `house_type`, area from `house_size`, `price`), normalized like
+`_run_model` (stripped strings) and scored with one vectorized forest call in
+a process pool; every worker maps the same compiled model. Output (CSV or
+Parquet, by extension) keeps the input row order and adds fair_rent_low /
+fair_rent / fair_rent_high, `asking_gap` ((price - fair) / fair) and `asking`:
+"over" above the range, "under" below it, "fair" inside it. Rows whose BHK or
+area do not parse are kept, unscored. At most 2 x --workers chunks are in
+flight, so memory stays flat however large the file is.
+"""
+import os
+import sys
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_DIR = os.path.join(BASE_DIR, 'models')
+
+sys.path.insert(0, BASE_DIR)
+from src.data_pipeline import parse_bhk, parse_area, parse_rent, city_for
+from ml.artifacts import ArtifactStore
+
+# Raw listing columns read from the input; `city` is optional.
+INPUT_COLUMNS = ['city', 'location', 'house_type', 'house_size', 'Status', 'price']
+OUTPUT_COLUMNS = ['row', 'city', 'location', 'house_type', 'house_size', 'Status', 'price',
+                  'BHK', 'Area', 'fair_rent_low', 'fair_rent', 'fair_rent_high',
+                  'asking_gap', 'asking']
+
+_bundle = None   # per worker process
+
+
+def _load_model(models_dir):
+    global _bundle
+    _bundle = ArtifactStore(models_dir).load_bundle()
+
+
+def score_chunk(raw, city=None, bundle=None):
+    """Cleans and scores one raw chunk; returns it in OUTPUT_COLUMNS order.
+
+    `city` (one name for the whole file, as data_pipeline assigns it) wins
+    over a per-row `city` column.
+    """
+    bundle = bundle or _bundle
+    n = len(raw)
+    text = lambda col: (raw[col].astype('string').str.strip() if col in raw
+                        else pd.Series(pd.NA, index=raw.index, dtype='string'))
+    out = pd.DataFrame({
+        'row':        raw.index.to_numpy(dtype=np.int64),
+        'city':       pd.Series(city, index=raw.index, dtype='string') if city else text('city'),
+        'location':   text('location'),
+        'house_type': text('house_type'),
+        'house_size': text('house_size'),
+        'Status':     text('Status'),
+        'price':      parse_rent(raw['price']).astype(float) if 'price' in raw else np.nan,
+        'BHK':        parse_bhk(text('house_type').astype(object)),
+        'Area':       parse_area(text('house_size').astype(object)),
+    }, index=raw.index)
+
+    for col in ('fair_rent_low', 'fair_rent', 'fair_rent_high', 'asking_gap'):
+        out[col] = np.nan
+    out['asking'] = pd.Series(pd.NA, index=raw.index, dtype='string')
+
+    ok = (out['BHK'].notna() & out['Area'].notna()).to_numpy()
+    if n and ok.any():
+        scored = out[ok]
+        low, fair, high = bundle.predictor.rent_range(bundle.predictor.predict_raw_batch(
+            scored['city'].fillna('').tolist(), scored['location'].fillna('').tolist(),
+            scored['BHK'].astype(int).tolist(), scored['Area'].tolist(),
+            scored['Status'].fillna('').tolist()))
+        low, fair, high = np.round(low, 0), np.round(fair, 0), np.round(high, 0)
+        out.loc[ok, 'fair_rent_low'], out.loc[ok, 'fair_rent'], out.loc[ok, 'fair_rent_high'] = low, fair, high
+
+        price = scored['price'].to_numpy(dtype=float)
+        priced = ~np.isnan(price)
+        asking = np.where(price > high, 'over', np.where(price < low, 'under', 'fair')).astype(object)
+        asking[~priced] = None
+        out.loc[ok, 'asking'] = asking
+        out.loc[ok, 'asking_gap'] = np.round((price - fair) / fair, 4)
+    return out[OUTPUT_COLUMNS]
+
+
+def _score_worker(raw, city):
+    return score_chunk(raw, city)
+
+
+# ── input / output ───────────────────────────────────────────────────────────
+
+def read_chunks(path, chunksize):
+    """Yields raw DataFrames of at most `chunksize` rows, indexed by input row number."""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        source = pq.ParquetFile(path)
+        columns = [c for c in INPUT_COLUMNS if c in source.schema_arrow.names]
+        start = 0
+        for batch in source.iter_batches(batch_size=chunksize, columns=columns):
+            chunk = batch.to_pandas()
+            chunk.index = pd.RangeIndex(start, start + len(chunk))
+            start += len(chunk)
+            yield chunk
+    else:
+        yield from pd.read_csv(path, usecols=lambda c: c in INPUT_COLUMNS, chunksize=chunksize)
+
+
+class ChunkWriter:
+    """Appends scored chunks to one CSV or Parquet file."""
+
+    def __init__(self, path):
+        self.path    = path
+        self.parquet = path.endswith('.parquet')
+        self._writer = None
+        self._first  = True
+
+    def write(self, df):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        else:
+            df.to_csv(self.path, mode='w' if self._first else 'a', header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        elif self._first:
+            # empty input: still leave a file with the header
+            self._first = False
+            pd.DataFrame(columns=OUTPUT_COLUMNS).to_csv(self.path, index=False)
+
+
+def score_file(input_path, output_path, city=None, chunksize=50_000, workers=None,
+               models_dir=MODELS_DIR, progress=True):
+    """Streams `input_path` through the model into `output_path`; returns a stats dict."""
+    workers = workers or os.cpu_count() or 1
+    city    = city_for(input_path, city)
+    bundle  = ArtifactStore(models_dir).load_bundle()   # also refreshes stale compiled artifacts
+    writer  = ChunkWriter(output_path)
+    rows = scored = over = under = 0
+    start = time.perf_counter()
+
+    def record(out):
+        nonlocal rows, scored, over, under
+        writer.write(out)
+        rows   += len(out)
+        scored += int(out['fair_rent'].notna().sum())
+        over   += int((out['asking'] == 'over').sum())
+        under  += int((out['asking'] == 'under').sum())
+        if progress:
+            elapsed = time.perf_counter() - start
+            print(f"\r{rows:,} rows  {rows / elapsed:,.0f} rows/sec", end='', file=sys.stderr, flush=True)
+
+    try:
+        if workers == 1:
+            for raw in read_chunks(input_path, chunksize):
+                record(score_chunk(raw, city, bundle))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_load_model,
+                                     initargs=(models_dir,)) as pool:
+                pending = deque()
+                for raw in read_chunks(input_path, chunksize):
+                    pending.append(pool.submit(_score_worker, raw, city))
+                    if len(pending) >= 2 * workers:
+                        record(pending.popleft().result())
+                while pending:
+                    record(pending.popleft().result())
+    finally:
+        writer.close()
+        if progress:
+            print(file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    return {'rows': rows, 'scored': scored, 'unscored': rows - scored, 'over': over,
+            'under': under, 'seconds': elapsed, 'rows_per_sec': rows / elapsed if elapsed else 0.0,
+            'workers': workers, 'model_version': bundle.version, 'city': city}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a listings CSV/Parquet file with the rent model.")
+    parser.add_argument('input', help="CSV or .parquet with house_type, house_size, location, Status, price")
+    parser.add_argument('-o', '--output', required=True, help="output .csv or .parquet")
+    parser.add_argument('--city', help="city for every row (default: from the file name, else the city column)")
+    parser.add_argument('--chunksize', type=int, default=50_000)
+    parser.add_argument('--workers', type=int, default=None, help="scoring processes (default: all cores)")
+    args = parser.parse_args()
+
+    stats = score_file(args.input, args.output, city=args.city, chunksize=args.chunksize,
+                       workers=args.workers)
+    print(f"Scored {stats['scored']:,} of {stats['rows']:,} rows ({stats['unscored']:,} unparseable) "
+          f"with model {stats['model_version']} in {stats['seconds']:.1f}s: "
+          f"{stats['rows_per_sec']:,.0f} rows/sec on {stats['workers']} worker(s)")
+    print(f"Asking above the fair range: {stats['over']:,}; below: {stats['under']:,} -> {args.output}")
@@ -0,0 +1,32 @@
+"""Importing the serving entry points stays cheap (see benchmarks/bench_startup.py)."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_startup import BASELINE, DEFERRED_MODULES, IMPORT_BUDGET_RATIO, best_of
+
+RUNS = 3
+
+
+@pytest.fixture(scope="module")
+def baseline_us():
+    return best_of(RUNS, *BASELINE)[0]
+
+
+@pytest.mark.parametrize("module", sorted(IMPORT_BUDGET_RATIO))
+def test_import_defers_heavy_modules(module):
+    _, cumulative, loaded = best_of(1, module)
+    assert loaded == []
+    assert not [m for m in DEFERRED_MODULES if m in cumulative]
+
+
+@pytest.mark.parametrize("module", sorted(IMPORT_BUDGET_RATIO))
+def test_import_time_within_budget(module, baseline_us):
+    total, _, _ = best_of(RUNS, module)
+    budget = IMPORT_BUDGET_RATIO[module]
+    assert total / baseline_us <= budget, (
+        f"import {module}: {total / 1000:.0f} ms, "
+        f"{total / baseline_us:.2f}x the {' + '.join(BASELINE)} baseline (budget {budget}x)")